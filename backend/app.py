@@ -4,18 +4,43 @@ Foodzz Backend - Food Ordering Application
 Author: Foodzz Team
 """
 
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, g, render_template, request, jsonify
 from flask_cors import CORS
+from datetime import datetime, timezone
+from functools import wraps
 import secrets
 import os
 from pathlib import Path
-from werkzeug.utils import secure_filename
+from urllib.parse import urlencode
 
 from connectiondb import (
-    get_db, init_db, get_all_foods, get_food_by_id,
-    get_all_orders, get_order_by_id, create_order,
+    get_pool, init_db, start_checkpointer,
+    get_data_version, get_data_changed_at, get_data_epoch, notify_order_changed,
+    get_orders_page_json, get_order_by_id, create_order, IdempotencyKeyUsed, ORDERS_PAGE_DEFAULT,
+    SEARCH_PAGE_DEFAULT, SEARCH_PAGE_MAX,
+    normalize_order_lines,
     update_order_status, get_admin_stats, add_food_item,
-    delete_food_item, update_food_item, get_featured_food_ids, set_featured
+    delete_food_item, update_food_item, set_featured, get_upload_job
+)
+from menucache import menu_cache
+from metrics import Metrics
+from compression import Compression
+from serializer import CompactJSONProvider
+from health import readiness
+from archive import start_archiver
+from reports import TOP_FOODS_DEFAULT, report_cube, report_range
+from idempotency import (
+    IDEMPOTENCY_HEADER, IDEMPOTENCY_KEY_MAX_LENGTH, idempotency_index, request_fingerprint
+)
+from cartstore import CART_COOKIE, CART_MAX_QUANTITY, CART_TTL, cart_store, cart_lines, new_cart_id
+from orderfeed import order_feed
+from pricing import pricing_engine, to_dollars
+from images import available_formats, generate_variants, remove_variants
+from assets import StaticAssets, build as build_assets
+from uploads import MAX_UPLOAD_BYTES, UploadError, fail_stale_jobs, parse_multipart, submit_job
+from menuio import (
+    FORMATS as MENU_FORMATS, IMPORT_MAX_BYTES, build_variants, export_foods, import_foods, import_format,
+    import_images_path
 )
 
 # Get the absolute path to the backend directory
@@ -24,15 +49,101 @@ ROOT_DIR = BACKEND_DIR.parent
 TEMPLATE_DIR = ROOT_DIR / 'html'
 STATIC_DIR = ROOT_DIR / 'static'
 
-app = Flask(__name__, template_folder=str(TEMPLATE_DIR), static_folder=str(STATIC_DIR))
-CORS(app)
-app.secret_key = secrets.token_hex(16)
+# /static is served by StaticAssets (fingerprinted, precompressed, long-cached)
+app = Flask(__name__, template_folder=str(TEMPLATE_DIR), static_folder=None)
+app.json = CompactJSONProvider(app)
+static_assets = StaticAssets(app, STATIC_DIR)
+CORS(app, expose_headers=['X-Next-Cursor', 'Link'])
+metrics = Metrics(app)
+metrics.registry.add_gauge('foodzz_db_pool_idle_connections', 'Idle pooled SQLite connections',
+                           lambda: get_pool().stats()['idle'])
+metrics.registry.add_gauge('foodzz_db_pool_in_use_connections', 'Checked-out SQLite connections',
+                           lambda: get_pool().stats()['in_use'])
+metrics.registry.add_gauge('foodzz_order_stream_subscribers', 'Open admin order streams',
+                           lambda: order_feed.subscribers)
+# Registered after Metrics so request timings include compression
+compression = Compression(app)
+
+
+def load_secret_key(path=BACKEND_DIR / '.secret_key'):
+    """FOODZZ_SECRET_KEY, else a key generated once and kept in a file
+
+    Every worker process must sign sessions with the same key, so a
+    random per-process key is not an option.
+    """
+    key = os.environ.get('FOODZZ_SECRET_KEY')
+    if key:
+        return key
+    try:
+        fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return path.read_text().strip()
+    with os.fdopen(fd, 'w') as f:
+        f.write(secrets.token_hex(32))
+    return path.read_text().strip()
+
+
+app.secret_key = load_secret_key()
 
 # Upload folder configuration
 UPLOAD_FOLDER = STATIC_DIR / 'images'
 UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = str(UPLOAD_FOLDER)
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+# Hard cap on the whole body; the image itself is capped while streaming
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 1024 * 1024
+VALID_STATUSES = ['pending', 'confirmed', 'preparing', 'ready', 'delivered', 'cancelled']
+
+# Distinguishes ETags if the shared version counters are ever recreated
+ETAG_PREFIX = get_data_epoch()[:8]
+
+
+def revalidate(groups):
+    """Validators for the given data groups, and whether the request's
+    If-None-Match / If-Modified-Since already matches them
+
+    Returns (etag, last_modified, not_modified). Only reads the in-memory
+    data versions, never the database.
+    """
+    etag = ETAG_PREFIX + ''.join(f"-{g}{get_data_version(g)}" for g in groups)
+    last_modified = datetime.fromtimestamp(
+        int(max(get_data_changed_at(g) for g in groups)), tz=timezone.utc
+    )
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        since = request.if_modified_since
+        not_modified = since is not None and last_modified <= since
+    return etag, last_modified, not_modified
+
+
+def set_validators(response, etag, last_modified):
+    """Stamp ETag/Last-Modified and require revalidation on every use"""
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(*groups):
+    """Answer 304 Not Modified from data versions before running the view
+
+    The ETag is built from the versions of the given data groups, so an
+    unchanged resource is confirmed without touching the database.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag, last_modified, not_modified = revalidate(groups)
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            return set_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
 
 @app.route('/')
 def index():
@@ -45,31 +156,103 @@ def about():
     return render_template('about.html')
 
 @app.route('/api/health')
+@app.route('/api/health/live')
 def health():
-    """Health check endpoint"""
+    """Liveness: the process is up and answering (no dependencies checked)"""
     return jsonify({"status": "ok", "message": "Server is running"})
 
+@app.route('/api/health/ready')
+def health_ready():
+    """Readiness: 503 when the database, disk, pool or caches are unhealthy
+
+    Load balancers should route on this so a worker with a locked or
+    slow database sheds traffic before requests start failing.
+    """
+    ready, report = readiness(menu_cache)
+    response = jsonify(report)
+    response.status_code = 200 if ready else 503
+    response.cache_control.no_store = True
+    return response
+
+@app.route('/api/metrics')
+def prometheus_metrics():
+    """Request, SQL and pool metrics for every worker, in Prometheus text format"""
+    return Response(metrics.exposition(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/foods', methods=['GET'])
+@conditional('menu')
 def get_foods():
     """Get all available foods"""
-    foods = get_all_foods()
-    return jsonify(foods)
+    return Response(menu_cache.catalog(), mimetype='application/json')
 
 @app.route('/api/foods/<int:food_id>', methods=['GET'])
+@conditional('menu')
 def get_food(food_id):
     """Get specific food"""
-    food = get_food_by_id(food_id)
+    food = menu_cache.item(food_id)
     
     if not food:
         return jsonify({"error": "Food not found"}), 404
     
-    return jsonify(food)
+    return Response(food, mimetype='application/json')
+
+@app.route('/api/foods/search', methods=['GET'])
+@conditional('menu')
+def search_foods_route():
+    """Ranked menu search with category facets
+
+    Query parameters: q (words, prefix-matched), category, limit, offset.
+    """
+    args = request.args
+    limit = max(1, min(args.get('limit', SEARCH_PAGE_DEFAULT, type=int), SEARCH_PAGE_MAX))
+    payload = menu_cache.search(
+        args.get('q', ''),
+        category=args.get('category') or None,
+        limit=limit,
+        offset=max(0, args.get('offset', 0, type=int)),
+    )
+    return Response(payload, mimetype='application/json')
 
 @app.route('/api/orders', methods=['GET'])
+@conditional('orders')
 def get_orders():
-    """Get all orders"""
-    orders = get_all_orders()
-    return jsonify(orders)
+    """Get a page of orders (see orders_page_response)"""
+    return orders_page_response()
+
+
+def orders_page_response():
+    """Return one page of orders filtered by the request's query string
+
+    Query parameters: limit, cursor, status, since, until. The body stays a
+    plain list; the cursor for the next page is sent in X-Next-Cursor and
+    a Link: rel="next" header.
+    """
+    args = request.args
+    status = args.get('status') or None
+    if status == 'all':
+        status = None
+    if status and status not in VALID_STATUSES:
+        return jsonify({"error": "Invalid status"}), 400
+
+    limit = args.get('limit', ORDERS_PAGE_DEFAULT, type=int)
+    try:
+        payload, next_cursor = get_orders_page_json(
+            limit=limit,
+            after=args.get('cursor') or None,
+            status=status,
+            since=args.get('since') or None,
+            until=args.get('until') or None,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = Response(payload, mimetype='application/json')
+    if next_cursor:
+        next_args = args.to_dict()
+        next_args['cursor'] = next_cursor
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(next_args)}>; rel="next"'
+    return response
 
 @app.route('/admin')
 def admin():
@@ -87,10 +270,20 @@ def order_confirmation():
     return render_template('confirmation.html')
 
 @app.route('/api/admin/orders', methods=['GET'])
+@conditional('orders')
 def admin_get_orders():
-    """Get all orders for admin"""
-    orders = get_all_orders()
-    return jsonify(orders)
+    """Get a page of orders for admin (filterable by status and date)"""
+    return orders_page_response()
+
+@app.route('/api/admin/orders/stream', methods=['GET'])
+def admin_order_stream():
+    """Server-Sent Events feed of new/changed orders and updated stats"""
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    return Response(
+        order_feed.stream(last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/api/admin/orders/<int:order_id>/status', methods=['PUT'])
 def admin_update_order_status(order_id):
@@ -100,8 +293,7 @@ def admin_update_order_status(order_id):
     if not data or 'status' not in data:
         return jsonify({"error": "Missing status"}), 400
     
-    valid_statuses = ['pending', 'confirmed', 'preparing', 'ready', 'delivered', 'cancelled']
-    if data['status'] not in valid_statuses:
+    if data['status'] not in VALID_STATUSES:
         return jsonify({"error": "Invalid status"}), 400
     
     update_order_status(order_id, data['status'])
@@ -109,114 +301,223 @@ def admin_update_order_status(order_id):
     return jsonify({"success": True, "order_id": order_id, "status": data['status']})
 
 @app.route('/api/admin/stats', methods=['GET'])
+@conditional('orders')
 def admin_stats():
     """Get admin statistics"""
     stats = get_admin_stats()
     return jsonify(stats)
 
-def allowed_file(filename):
-    """Check if file extension is allowed"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def report_params():
+    """(since, until, statuses) from the query string; raises ValueError"""
+    args = request.args
+    since, until = report_range(args.get('since') or None, args.get('until') or None)
+    statuses = [s for s in args.get('status', '').split(',') if s] or None
+    if statuses and any(s not in VALID_STATUSES for s in statuses):
+        raise ValueError("Invalid status")
+    return since, until, statuses
+
+@app.route('/api/admin/reports/revenue', methods=['GET'])
+def admin_report_revenue():
+    """Orders and revenue per hour or day
+
+    Query parameters: since, until (ISO timestamps, UTC), granularity
+    (hour|day), status (comma-separated; default all but cancelled).
+    """
+    try:
+        since, until, statuses = report_params()
+        granularity = request.args.get('granularity', 'day')
+        series, totals = report_cube.revenue(since, until, granularity, statuses)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"since": since, "until": until, "granularity": granularity,
+                    "series": series, "totals": totals})
+
+@app.route('/api/admin/reports/top-foods', methods=['GET'])
+def admin_report_top_foods():
+    """Best-selling foods in a range (same parameters as revenue, plus limit)"""
+    try:
+        since, until, statuses = report_params()
+        limit = request.args.get('limit', TOP_FOODS_DEFAULT, type=int)
+        foods = report_cube.top_foods(since, until, statuses, limit, menu=menu_cache)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"since": since, "until": until, "foods": foods})
+
+@app.route('/api/admin/reports/categories', methods=['GET'])
+def admin_report_categories():
+    """Quantity, revenue and revenue share per category in a range"""
+    try:
+        since, until, statuses = report_params()
+        categories = report_cube.category_mix(since, until, statuses, menu=menu_cache)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"since": since, "until": until, "categories": categories})
+
+FOOD_FIELDS = ('name', 'description', 'price', 'category')
+
+
+def validate_food_fields(fields):
+    """Check the food form fields; returns (name, description, price, category)
+
+    Runs from parse_multipart before the image is written to disk.
+    """
+    name = fields.get('name', '').strip()
+    description = fields.get('description', '').strip()
+    price = fields.get('price', '')
+    category = fields.get('category', '').strip()
 
-@app.route('/api/admin/foods', methods=['POST'])
-def add_food_admin():
-    """Add a new food item"""
-    if 'image' not in request.files:
-        return jsonify({"error": "No image provided"}), 400
-    
-    file = request.files['image']
-    if file.filename == '':
-        return jsonify({"error": "No image selected"}), 400
-    
-    if not allowed_file(file.filename):
-        return jsonify({"error": "Invalid file type. Only PNG, JPG, JPEG, GIF allowed"}), 400
-    
-    # Get form data
-    name = request.form.get('name', '').strip()
-    description = request.form.get('description', '').strip()
-    price = request.form.get('price', '')
-    category = request.form.get('category', '').strip()
-    
     if not all([name, description, price, category]):
-        return jsonify({"error": "Missing required fields"}), 400
-    
+        raise UploadError("Missing required fields")
+
     try:
         price = float(price)
     except ValueError:
-        return jsonify({"error": "Invalid price"}), 400
-    
-    # Save file with secure filename
-    filename = secure_filename(file.filename)
-    # Add timestamp to filename to avoid conflicts
-    import time
-    filename = f"{int(time.time())}_{filename}"
+        raise UploadError("Invalid price")
+    return name, description, price, category
+
+
+def process_food_upload(upload, fields, food_id=None):
+    """Background job: store the image, build variants and save the food
+
+    Adds a new food when food_id is None, otherwise updates it. Returns the
+    food ID.
+    """
+    filename, created = upload.commit()
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
-    
-    # Add to database
+    variants = None
     try:
-        food_id = add_food_item(name, description, price, category, filename)
+        # Build resized WebP/AVIF variants (None if Pillow is not installed)
+        variants = generate_variants(filepath)
+        if food_id is None:
+            return add_food_item(*validate_food_fields(fields), filename, variants)
+        update_food_item(food_id, *validate_food_fields(fields), filename, variants)
+        return food_id
+    except Exception:
+        # Delete the stored file unless it was an identical image already in use
+        if created and os.path.exists(filepath):
+            os.remove(filepath)
+            remove_variants(variants, app.config['UPLOAD_FOLDER'])
+        raise
+
+
+@app.errorhandler(UploadError)
+def upload_error(e):
+    return jsonify({"error": str(e)}), e.status
+
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"error": f"Upload exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit"}), 413
+
+
+@app.route('/api/admin/foods', methods=['POST'])
+def add_food_admin():
+    """Add a new food item
+
+    The image is streamed to disk and checked while the request is read;
+    resizing and the database insert run in the background. Answers 202
+    with a job ID to poll at /api/admin/uploads/<job_id>.
+    """
+    fields, upload = parse_multipart(request, app.config['UPLOAD_FOLDER'],
+                                     required=FOOD_FIELDS, validate=validate_food_fields)
+    if upload is None:
+        return jsonify({"error": "No image provided"}), 400
+
+    job_id = submit_job(process_food_upload, upload, fields)
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "status": "pending",
+        "message": "Food item is being processed"
+    }), 202
+
+
+@app.route('/api/admin/foods/<int:food_id>', methods=['PUT'])
+def update_food_admin(food_id):
+    """Update an existing food item
+
+    Without a new image the update is immediate; with one it is processed
+    in the background like add_food_admin and answers 202 with a job ID.
+    """
+    fields, upload = parse_multipart(request, app.config['UPLOAD_FOLDER'],
+                                     required=FOOD_FIELDS, validate=validate_food_fields)
+    if upload is not None:
+        job_id = submit_job(process_food_upload, upload, fields, food_id)
         return jsonify({
             "success": True,
+            "job_id": job_id,
+            "status": "pending",
             "food_id": food_id,
-            "message": "Food item added successfully"
-        }), 201
+            "message": "Food item is being processed"
+        }), 202
+
+    try:
+        update_food_item(food_id, *validate_food_fields(fields))
+        return jsonify({"success": True, "food_id": food_id, "message": "Food item updated successfully"})
     except Exception as e:
-        # Delete the uploaded file if database insert fails
-        if os.path.exists(filepath):
-            os.remove(filepath)
         return jsonify({"error": str(e)}), 500
 
 
-@app.route('/api/admin/foods/<int:food_id>', methods=['PUT'])
-def update_food_admin(food_id):
-    """Update an existing food item"""
-    # If image is present, handle file upload
-    image_filename = None
-    if 'image' in request.files:
-        file = request.files['image']
-        if file and file.filename != '':
-            if not allowed_file(file.filename):
-                return jsonify({"error": "Invalid file type. Only PNG, JPG, JPEG, GIF allowed"}), 400
-            filename = secure_filename(file.filename)
-            import time
-            filename = f"{int(time.time())}_{filename}"
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            image_filename = filename
-
-    # Get form data
-    name = request.form.get('name', '').strip()
-    description = request.form.get('description', '').strip()
-    price = request.form.get('price', '')
-    category = request.form.get('category', '').strip()
+@app.route('/api/admin/uploads/<job_id>', methods=['GET'])
+def admin_upload_job(job_id):
+    """Status of a background upload job: pending, done or failed"""
+    job = get_upload_job(job_id)
+    if not job:
+        return jsonify({"error": "Upload job not found"}), 404
+    return jsonify(job)
 
-    if not all([name, description, price, category]):
-        return jsonify({"error": "Missing required fields"}), 400
 
-    try:
-        price = float(price)
-    except ValueError:
-        return jsonify({"error": "Invalid price"}), 400
+@app.route('/api/admin/foods/import', methods=['POST'])
+def import_foods_admin():
+    """Add or update foods in bulk from a CSV or NDJSON body
 
-    # Update in database
+    The format comes from ?format= or the Content-Type. ?images= names a
+    directory or zip archive under the import root that image columns
+    refer to. Rows are validated as they stream in and saved in batched
+    transactions; invalid rows are skipped and reported. Variants for new
+    images are built in the background (variants_job).
+    """
+    request.max_content_length = IMPORT_MAX_BYTES
     try:
-        update_food_item(food_id, name, description, price, category, image_filename)
-        return jsonify({"success": True, "food_id": food_id, "message": "Food item updated successfully"})
-    except Exception as e:
-        # If upload happened and DB update failed, remove file
-        if image_filename:
-            fp = os.path.join(app.config['UPLOAD_FOLDER'], image_filename)
-            if os.path.exists(fp):
-                os.remove(fp)
-        return jsonify({"error": str(e)}), 500
+        fmt = import_format(request.args.get('format'), request.mimetype)
+        images = import_images_path(request.args.get('images'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    summary, new_images = import_foods(request.stream, fmt, images, app.config['UPLOAD_FOLDER'])
+    if new_images and available_formats():
+        summary['variants_job'] = submit_job(build_variants, new_images, app.config['UPLOAD_FOLDER'])
+    return jsonify(summary)
+
+
+@app.route('/api/admin/foods/export', methods=['GET'])
+@conditional('menu')
+def export_foods_admin():
+    """Stream the whole menu as CSV (default) or NDJSON (?format=ndjson)"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in MENU_FORMATS:
+        return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+    return Response(
+        export_foods(fmt),
+        mimetype=MENU_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="foodzz-menu.{fmt}"'}
+    )
 
 
 @app.route('/api/admin/featured', methods=['GET'])
+@conditional('menu')
 def admin_get_featured():
     """Return list of featured food IDs"""
-    ids = get_featured_food_ids()
-    return jsonify({"featured": ids})
+    return Response(menu_cache.featured(), mimetype='application/json')
+
+
+@app.route('/api/admin/cache', methods=['GET'])
+def admin_cache_stats():
+    """Return menu cache hit/miss counters, cart store size, idempotency key cache,
+    report cube and compression cache"""
+    return jsonify({"menu": menu_cache.stats(), "carts": cart_store.stats(),
+                    "idempotency": idempotency_index.stats(), "reports": report_cube.stats(),
+                    "compression": compression.stats()})
 
 
 @app.route('/api/admin/foods/<int:food_id>/featured', methods=['POST'])
@@ -241,10 +542,47 @@ def delete_food_admin(food_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def request_cart_id(create=False):
+    """Cart ID from the cookie; with create, issue one if there is none"""
+    cart_id = request.cookies.get(CART_COOKIE)
+    if not cart_id and create:
+        cart_id = g.new_cart_id = new_cart_id()
+    return cart_id
+
+@app.after_request
+def set_cart_cookie(response):
+    """Send the cookie for a cart created during this request"""
+    cart_id = g.pop('new_cart_id', None)
+    if cart_id:
+        response.set_cookie(CART_COOKIE, cart_id, max_age=int(CART_TTL), httponly=True, samesite='Lax')
+    return response
+
+def cart_response(items):
+    cart = cart_lines(items, menu_cache)
+    return jsonify({"success": True, "cart": cart, "count": len(cart)})
+
+def cart_quantity(data):
+    """Validate a request quantity; returns an int or None"""
+    quantity = data.get('quantity')
+    if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity > CART_MAX_QUANTITY:
+        return None
+    return quantity
+
+def cart_food_id(data):
+    """Validate a request food_id (an int or a numeric string); returns an int or None"""
+    food_id = data.get('food_id')
+    if isinstance(food_id, bool) or not isinstance(food_id, (int, str)):
+        return None
+    try:
+        return int(food_id)
+    except ValueError:
+        return None
+
 @app.route('/api/cart', methods=['GET'])
 def get_cart():
-    """Get shopping cart from session"""
-    cart = session.get('cart', [])
+    """Get shopping cart, priced from the menu cache"""
+    cart_id = request_cart_id()
+    cart = cart_lines(cart_store.get(cart_id), menu_cache) if cart_id else []
     return jsonify({"items": cart, "count": len(cart)})
 
 @app.route('/api/cart/add', methods=['POST'])
@@ -255,36 +593,20 @@ def add_to_cart():
     if not data or 'food_id' not in data or 'quantity' not in data:
         return jsonify({"error": "Missing required fields"}), 400
     
-    food_id = data['food_id']
-    quantity = data['quantity']
+    food_id = cart_food_id(data)
+    if food_id is None:
+        return jsonify({"error": "Invalid food_id"}), 400
     
-    # Validate food exists
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM foods WHERE id = ?', (food_id,))
-    food = cursor.fetchone()
-    conn.close()
+    quantity = cart_quantity(data)
+    if quantity is None or quantity <= 0:
+        return jsonify({"error": "Invalid quantity"}), 400
     
-    if not food:
+    # Validate food exists
+    if menu_cache.food(food_id) is None:
         return jsonify({"error": "Food not found"}), 404
     
-    cart = session.get('cart', [])
-    
-    # Check if item already in cart
-    existing = next((item for item in cart if item['id'] == food_id), None)
-    if existing:
-        existing['quantity'] += quantity
-    else:
-        cart.append({
-            'id': food_id,
-            'name': food['name'],
-            'price': food['price'],
-            'quantity': quantity,
-            'image': food['image']
-        })
-    
-    session['cart'] = cart
-    return jsonify({"success": True, "cart": cart})
+    items = cart_store.add(request_cart_id(create=True), food_id, quantity)
+    return cart_response(items)
 
 @app.route('/api/cart/remove', methods=['POST'])
 def remove_from_cart():
@@ -294,11 +616,13 @@ def remove_from_cart():
     if not data or 'food_id' not in data:
         return jsonify({"error": "Missing food_id"}), 400
     
-    cart = session.get('cart', [])
-    cart = [item for item in cart if item['id'] != data['food_id']]
-    session['cart'] = cart
+    food_id = cart_food_id(data)
+    if food_id is None:
+        return jsonify({"error": "Invalid food_id"}), 400
     
-    return jsonify({"success": True, "cart": cart})
+    cart_id = request_cart_id()
+    items = cart_store.set(cart_id, food_id, 0) if cart_id else {}
+    return cart_response(items)
 
 @app.route('/api/cart/update', methods=['POST'])
 def update_cart():
@@ -308,73 +632,146 @@ def update_cart():
     if not data or 'food_id' not in data or 'quantity' not in data:
         return jsonify({"error": "Missing required fields"}), 400
     
-    cart = session.get('cart', [])
-    item = next((i for i in cart if i['id'] == data['food_id']), None)
+    food_id = cart_food_id(data)
+    if food_id is None:
+        return jsonify({"error": "Invalid food_id"}), 400
     
-    if not item:
-        return jsonify({"error": "Item not in cart"}), 404
+    quantity = cart_quantity(data)
+    if quantity is None:
+        return jsonify({"error": "Invalid quantity"}), 400
     
-    if data['quantity'] <= 0:
-        cart = [i for i in cart if i['id'] != data['food_id']]
-    else:
-        item['quantity'] = data['quantity']
+    cart_id = request_cart_id()
+    if not cart_id or food_id not in cart_store.get(cart_id):
+        return jsonify({"error": "Item not in cart"}), 404
     
-    session['cart'] = cart
-    return jsonify({"success": True, "cart": cart})
+    items = cart_store.set(cart_id, food_id, quantity)
+    return cart_response(items)
 
 @app.route('/api/cart/clear', methods=['POST'])
 def clear_cart():
     """Clear shopping cart"""
-    session['cart'] = []
+    cart_id = request_cart_id()
+    if cart_id:
+        cart_store.clear(cart_id)
     return jsonify({"success": True})
 
+def stored_cart_items():
+    """The cookie cart as order lines, for checkout without an items list"""
+    cart_id = request_cart_id()
+    if not cart_id:
+        return []
+    return [{'id': food_id, 'quantity': quantity} for food_id, quantity in cart_store.get(cart_id).items()]
+
 @app.route('/api/checkout', methods=['POST'])
 def checkout():
-    """Process checkout"""
+    """Process checkout
+
+    With an Idempotency-Key header, a repeat of a completed checkout gets
+    the original response (and order) back instead of placing another.
+    """
     data = request.get_json()
-    # Accept cart items from request (frontend localStorage) or fall back to session cart
-    cart = data.get('items') if data and data.get('items') is not None else session.get('cart', [])
+    idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+    if idempotency_key is not None:
+        if not idempotency_key or len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return jsonify({"error": f"Invalid {IDEMPOTENCY_HEADER}"}), 400
+        request_hash = request_fingerprint(data)
+        record = idempotency_index.lookup(idempotency_key)
+        if record is not None:
+            response = replay_checkout(record, request_hash)
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+    # Accept cart items from request (frontend localStorage) or fall back to the stored cart
+    cart = data.get('items') if data and data.get('items') is not None else stored_cart_items()
 
     if not cart:
         return jsonify({"error": "Cart is empty"}), 400
     
     required_fields = ['customer_name', 'customer_email', 'delivery_address', 'phone', 'payment_method']
-    if not all(field in data for field in required_fields):
+    if not data or not all(field in data for field in required_fields):
         return jsonify({"error": "Missing required fields"}), 400
     
-    # Calculate totals
-    subtotal = sum(item['price'] * item['quantity'] for item in cart)
-    tax = round(subtotal * 0.08, 2)  # 8% tax
-    delivery_fee = 5.00 if subtotal < 30 else 0
-    total = subtotal + tax + delivery_fee
-    
-    # Create order using helper function from connectiondb
-    from connectiondb import create_order as db_create_order
-    order_id = db_create_order(
-        customer_name=data['customer_name'],
-        customer_email=data['customer_email'],
-        delivery_address=data['delivery_address'],
-        phone=data['phone'],
-        subtotal=subtotal,
-        tax=tax,
-        delivery_fee=delivery_fee,
-        total_price=total,
-        payment_method=data['payment_method'],
-        items=cart
-    )
-    
-    # Clear cart
-    session['cart'] = []
-    
-    return jsonify({
+    # Price lines from the in-memory price table, never from the client cart
+    try:
+        lines = normalize_order_lines(cart)
+        quote = pricing_engine.quote(lines, data.get('promo_code'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    subtotal = to_dollars(quote['subtotal'])
+    discount = to_dollars(quote['discount'])
+    tax = to_dollars(quote['tax'])
+    delivery_fee = to_dollars(quote['delivery_fee'])
+    total = to_dollars(quote['total'])
+    
+    body = {
         "success": True,
-        "order_id": order_id,
         "subtotal": subtotal,
+        "discount": discount,
+        "promo_code": quote['promo_code'],
         "tax": tax,
         "delivery_fee": delivery_fee,
         "total": total,
         "status": "confirmed"
-    }), 201
+    }
+    
+    # Create order using helper function from connectiondb
+    try:
+        order_id = create_order(
+            customer_name=data['customer_name'],
+            customer_email=data['customer_email'],
+            delivery_address=data['delivery_address'],
+            phone=data['phone'],
+            subtotal=subtotal,
+            tax=tax,
+            delivery_fee=delivery_fee,
+            total_price=total,
+            payment_method=data['payment_method'],
+            items=cart,
+            discount=discount,
+            line_prices={food_id: to_dollars(cents) for food_id, cents in quote['unit_prices'].items()},
+            idempotency=(idempotency_index.new_entry(idempotency_key, request_hash, body)
+                         if idempotency_key else None)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except IdempotencyKeyUsed as e:
+        # A concurrent request with this key won; its order keeps the cart
+        response = replay_checkout(e.record, request_hash)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+    
+    # Clear cart
+    cart_id = request_cart_id()
+    if cart_id:
+        cart_store.clear(cart_id)
+    
+    return jsonify(dict(body, order_id=order_id)), 201
+
+def replay_checkout(record, request_hash):
+    """The response recorded for an idempotency key, or 422 if it was used for another request"""
+    if record['request_hash'] != request_hash:
+        return app.make_response((
+            jsonify({"error": f"{IDEMPOTENCY_HEADER} was already used for a different checkout"}), 422
+        ))
+    return app.make_response((jsonify(record['response']), 201))
+
+@app.route('/api/checkout/quote', methods=['POST'])
+def checkout_quote():
+    """Price a cart without placing an order"""
+    data = request.get_json(silent=True) or {}
+    cart = data.get('items') if data.get('items') is not None else stored_cart_items()
+    try:
+        quote = pricing_engine.quote(normalize_order_lines(cart), data.get('promo_code'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "subtotal": to_dollars(quote['subtotal']),
+        "discount": to_dollars(quote['discount']),
+        "promo_code": quote['promo_code'],
+        "tax": to_dollars(quote['tax']),
+        "delivery_fee": to_dollars(quote['delivery_fee']),
+        "total": to_dollars(quote['total'])
+    })
 
 @app.route('/api/orders', methods=['POST'])
 def create_order_legacy():
@@ -384,37 +781,32 @@ def create_order_legacy():
     if not data or 'food_id' not in data or 'quantity' not in data:
         return jsonify({"error": "Missing required fields"}), 400
     
-    food_id = data['food_id']
-    quantity = data['quantity']
-    
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Get food price
-    cursor.execute('SELECT price FROM foods WHERE id = ?', (food_id,))
-    food = cursor.fetchone()
+    try:
+        [(food_id, quantity)] = normalize_order_lines([data])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
+    food = menu_cache.food(food_id)
     if not food:
         return jsonify({"error": "Food not found"}), 404
     
+    # Same locked, retried insert path as checkout
     total_price = food['price'] * quantity
-    
-    # Create simple order
-    cursor.execute(
-        'INSERT INTO orders (customer_name, customer_email, delivery_address, phone, subtotal, tax, delivery_fee, total_price, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
-        ('Guest', 'guest@foodzz.com', 'Not specified', 'N/A', total_price, 0, 0, total_price, 'pending')
-    )
-    
-    order_id = cursor.lastrowid
-    
-    cursor.execute(
-        'INSERT INTO order_items (order_id, food_id, quantity, price) VALUES (?, ?, ?, ?)',
-        (order_id, food_id, quantity, food['price'])
+    order_id = create_order(
+        customer_name='Guest',
+        customer_email='guest@foodzz.com',
+        delivery_address='Not specified',
+        phone='N/A',
+        subtotal=total_price,
+        tax=0,
+        delivery_fee=0,
+        total_price=total_price,
+        payment_method=None,
+        items=[{'food_id': food_id, 'quantity': quantity}],
+        line_prices={food_id: food['price']},
+        status='pending'
     )
     
-    conn.commit()
-    conn.close()
-    
     return jsonify({
         "id": order_id,
         "food_id": food_id,
@@ -424,6 +816,7 @@ def create_order_legacy():
     }), 201
 
 @app.route('/api/orders/<int:order_id>', methods=['GET'])
+@conditional('orders', 'menu')
 def get_order(order_id):
     """Get specific order"""
     order = get_order_by_id(order_id)
@@ -449,9 +842,27 @@ def update_order(order_id):
     
     return jsonify({"id": order_id, "status": data['status']})
 
-if __name__ == '__main__':
-    import os
+def prepare():
+    """One-time startup: migrate, build assets and warm the in-memory caches
+
+    serve.py runs this once in the master process before forking workers,
+    so they start with the menu and price table already loaded.
+    """
     init_db()
+    stale = fail_stale_jobs()
+    if stale:
+        print(f"⚠ Marked {stale} interrupted upload jobs as failed")
+    build_assets(STATIC_DIR)
+    static_assets.reload()
+    menu_cache.catalog()
+    pricing_engine.price_table.prices()
+
+
+if __name__ == '__main__':
+    # Single-process development server; use serve.py in production
+    prepare()
+    start_checkpointer()
+    start_archiver()
     # Allow overriding the port via the PORT environment variable (useful in CI/Codespaces)
     port = int(os.environ.get('PORT', '8000'))
     print(f"🚀 Foodzz Server starting on http://localhost:{port}")
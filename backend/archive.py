@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Foodzz Order Archive
+Moves old delivered/cancelled orders out of the hot orders and
+order_items tables into a separate archive database
+
+Usage: python archive.py [--days 30] [--batch-size 500] [--max-batches N]
+
+Each batch is copied into the archive in one transaction and removed
+from the hot tables in a second one, so a crash in between leaves a
+duplicate (cleaned up by the next run), never a lost order. Lifetime
+counters for the archived orders move to archived_order_stats, so
+get_admin_stats totals do not change when orders are archived.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from connectiondb import DB_PATH, bump_data_version, get_db, retry_on_busy
+
+ARCHIVE_PATH = Path(os.environ.get(
+    'FOODZZ_ARCHIVE_PATH', DB_PATH.with_name(f"{DB_PATH.stem}-archive{DB_PATH.suffix}")
+))
+# Orders in these statuses older than ARCHIVE_AFTER_DAYS get archived
+ARCHIVE_STATUSES = tuple(
+    s.strip() for s in os.environ.get('FOODZZ_ARCHIVE_STATUSES', 'delivered,cancelled').split(',') if s.strip()
+)
+ARCHIVE_AFTER_DAYS = float(os.environ.get('FOODZZ_ARCHIVE_AFTER_DAYS', '30'))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('FOODZZ_ARCHIVE_BATCH_SIZE', '500'))
+# Seconds between background archive runs; 0 disables the thread
+ARCHIVE_INTERVAL = float(os.environ.get('FOODZZ_ARCHIVE_INTERVAL', '3600'))
+# Pause between batches so checkouts get the write lock in between
+ARCHIVE_BATCH_PAUSE = 0.05
+
+ORDER_COLUMNS = (
+    'id', 'customer_name', 'customer_email', 'delivery_address', 'phone', 'subtotal', 'discount',
+    'tax', 'delivery_fee', 'total_price', 'payment_method', 'status', 'created_at',
+)
+ARCHIVABLE_ORDERS_SQL = (
+    f"SELECT id FROM main.orders WHERE status IN ({', '.join('?' * len(ARCHIVE_STATUSES))}) "
+    "AND created_at < ? LIMIT ?"
+)
+
+
+def _archive_schema(cursor, schema='main'):
+    """Archive tables: orders as they were, items with the food name and image at archive time"""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.orders (
+            id INTEGER PRIMARY KEY,
+            customer_name TEXT NOT NULL,
+            customer_email TEXT NOT NULL,
+            delivery_address TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            subtotal REAL NOT NULL,
+            discount REAL NOT NULL DEFAULT 0,
+            tax REAL NOT NULL,
+            delivery_fee REAL NOT NULL,
+            total_price REAL NOT NULL,
+            payment_method TEXT,
+            status TEXT,
+            created_at TIMESTAMP,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.order_items (
+            id INTEGER PRIMARY KEY,
+            order_id INTEGER NOT NULL,
+            food_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            price REAL NOT NULL,
+            food_name TEXT,
+            image TEXT
+        )
+    ''')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_order_items_order_id ON order_items (order_id)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_orders_created_at ON orders (created_at, id)')
+
+
+def archive_cutoff(days=ARCHIVE_AFTER_DAYS, now=None):
+    """created_at bound (UTC, SQLite format) below which orders are archivable"""
+    now = now or datetime.now(timezone.utc)
+    return (now - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+@retry_on_busy
+def _copy_batch(cursor, cutoff, batch_size):
+    """Copy up to batch_size archivable orders and their items; returns their IDs"""
+    cursor.execute('BEGIN')
+    try:
+        cursor.execute(ARCHIVABLE_ORDERS_SQL, ARCHIVE_STATUSES + (cutoff, batch_size))
+        ids = [row[0] for row in cursor.fetchall()]
+        if ids:
+            placeholders = ', '.join('?' * len(ids))
+            columns = ', '.join(ORDER_COLUMNS)
+            # REPLACE: a copy left behind by an interrupted run is refreshed
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO archive.orders ({columns})
+                SELECT {columns} FROM main.orders WHERE id IN ({placeholders})
+            ''', ids)
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO archive.order_items (id, order_id, food_id, quantity, price, food_name, image)
+                SELECT oi.id, oi.order_id, oi.food_id, oi.quantity, oi.price, f.name, f.image
+                FROM main.order_items oi
+                LEFT JOIN main.foods f ON f.id = oi.food_id
+                WHERE oi.order_id IN ({placeholders})
+            ''', ids)
+        cursor.execute('COMMIT')
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+    return ids
+
+
+@retry_on_busy
+def _remove_batch(cursor, ids):
+    """Delete the copied orders from the hot tables; returns how many went
+
+    An order whose status or total changed after it was copied stays hot
+    (and is copied again on the next run).
+    """
+    placeholders = ', '.join('?' * len(ids))
+    statuses = ', '.join('?' * len(ARCHIVE_STATUSES))
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.execute('DROP TABLE IF EXISTS temp.archive_batch')
+        cursor.execute(f'''
+            CREATE TEMP TABLE archive_batch AS
+            SELECT o.id, o.status, o.total_price FROM main.orders o
+            JOIN archive.orders a ON a.id = o.id AND a.status = o.status AND a.total_price = o.total_price
+            WHERE o.id IN ({placeholders}) AND o.status IN ({statuses})
+        ''', ids + list(ARCHIVE_STATUSES))
+        cursor.execute('''
+            INSERT INTO main.archived_order_stats (status, order_count, revenue)
+            SELECT status, COUNT(*), SUM(total_price) FROM temp.archive_batch WHERE 1 GROUP BY status
+            ON CONFLICT (status) DO UPDATE SET
+                order_count = order_count + excluded.order_count,
+                revenue = revenue + excluded.revenue
+        ''')
+        cursor.execute('DELETE FROM main.order_items WHERE order_id IN (SELECT id FROM temp.archive_batch)')
+        # trg_order_stats_delete takes them out of the hot order_stats
+        cursor.execute('DELETE FROM main.orders WHERE id IN (SELECT id FROM temp.archive_batch)')
+        removed = cursor.rowcount
+        cursor.execute('DROP TABLE temp.archive_batch')
+        cursor.execute('COMMIT')
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+    return removed
+
+
+def archive_orders(days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE, max_batches=None):
+    """Archive eligible orders in bounded batches; returns how many were moved"""
+    cutoff = archive_cutoff(days)
+    conn = get_db()
+    moved = 0
+    try:
+        cursor = conn.cursor()
+        cursor.execute('ATTACH DATABASE ? AS archive', (str(ARCHIVE_PATH),))
+        try:
+            _archive_schema(cursor, 'archive')
+            batches = 0
+            while max_batches is None or batches < max_batches:
+                ids = _copy_batch(cursor, cutoff, batch_size)
+                if not ids:
+                    break
+                moved += _remove_batch(cursor, ids)
+                batches += 1
+                if len(ids) < batch_size:
+                    break
+                time.sleep(ARCHIVE_BATCH_PAUSE)
+        finally:
+            cursor.execute('DETACH DATABASE archive')
+    finally:
+        conn.close()
+    if moved:
+        bump_data_version('orders')
+    return moved
+
+
+def get_archived_order(order_id):
+    """Fetch an archived order with its items, or None"""
+    if not ARCHIVE_PATH.exists():
+        return None
+    conn = sqlite3.connect(f"file:{ARCHIVE_PATH}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        order = conn.execute('SELECT * FROM orders WHERE id = ?', (order_id,)).fetchone()
+        if not order:
+            return None
+        items = conn.execute('SELECT * FROM order_items WHERE order_id = ? ORDER BY id', (order_id,)).fetchall()
+    except sqlite3.OperationalError:
+        # Archive file created but its schema not written yet
+        return None
+    finally:
+        conn.close()
+    order_dict = dict(order)
+    order_dict['items'] = [dict(item) for item in items]
+    return order_dict
+
+
+_archiver_stop = threading.Event()
+_archiver_thread = None
+
+
+def _archiver_loop(interval):
+    while not _archiver_stop.wait(interval):
+        try:
+            moved = archive_orders()
+            if moved:
+                print(f"✓ Archived {moved} orders")
+        except sqlite3.Error as e:
+            print(f"⚠ Order archival failed: {e}")
+
+
+def start_archiver(interval=ARCHIVE_INTERVAL):
+    """Start the background thread that archives old orders periodically
+
+    Safe to run in every worker: concurrent runs skip orders another
+    worker already moved.
+    """
+    global _archiver_thread
+    if interval <= 0 or not ARCHIVE_STATUSES:
+        return
+    if _archiver_thread is not None and _archiver_thread.is_alive():
+        return
+    _archiver_stop.clear()
+    _archiver_thread = threading.Thread(
+        target=_archiver_loop, args=(interval,), name='foodzz-order-archiver', daemon=True
+    )
+    _archiver_thread.start()
+
+
+def stop_archiver():
+    """Stop the periodic archive thread"""
+    global _archiver_thread
+    _archiver_stop.set()
+    if _archiver_thread is not None:
+        _archiver_thread.join(timeout=5)
+        _archiver_thread = None
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--days', type=float, default=ARCHIVE_AFTER_DAYS, help='archive orders older than this')
+    parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help='orders per transaction')
+    parser.add_argument('--max-batches', type=int, help='stop after this many batches')
+    args = parser.parse_args(argv)
+
+    from connectiondb import init_db
+    init_db()
+    started = time.perf_counter()
+    moved = archive_orders(args.days, args.batch_size, args.max_batches)
+    print(f"✓ Archived {moved} orders to {ARCHIVE_PATH} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,302 @@
+"""
+Foodzz ASGI Application
+Async entry point with the same routes and response shapes as app.py
+
+Run with: python serve.py --asgi
+
+The order stream, the menu, admin stats and single-order reads are served
+natively on the event loop, with database calls awaited through asyncdb.
+An idle dashboard stream therefore costs a coroutine, not a thread. Every
+other route (checkout, carts, uploads, pages, static files) goes to the
+Flask app on a thread pool through a streaming WSGI bridge. Native
+responses also pass through Flask's after_request hooks, so CORS headers
+and cookies match.
+"""
+
+import asyncio
+import io
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Response, jsonify, request
+from werkzeug.exceptions import ClientDisconnected
+
+import asyncdb
+from app import app, revalidate, set_validators
+from archive import start_archiver
+from connectiondb import start_checkpointer
+from menucache import menu_cache
+from orderfeed import order_feed
+
+# Threads running Flask views for the routes not served natively
+ASGI_THREADS = int(os.environ.get('FOODZZ_ASGI_THREADS', '32'))
+
+_wsgi_executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix='foodzz-wsgi')
+
+
+async def conditional(groups, build):
+    """Async counterpart of app.conditional: 304 before awaiting build()"""
+    etag, last_modified, not_modified = revalidate(groups)
+    if not_modified:
+        return set_validators(Response(status=304), etag, last_modified)
+    response = await build()
+    if response.status_code != 200:
+        return response
+    return set_validators(response, etag, last_modified)
+
+
+async def read_menu(read):
+    """Call a menu cache reader, moving a reload off the event loop"""
+    if menu_cache.is_fresh():
+        return read()
+    return await asyncdb.run_db(read)
+
+
+async def health():
+    return jsonify({"status": "ok", "message": "Server is running"})
+
+
+async def get_foods():
+    async def build():
+        return Response(await read_menu(menu_cache.catalog), mimetype='application/json')
+    return await conditional(('menu',), build)
+
+
+async def get_food(food_id):
+    async def build():
+        food = await read_menu(lambda: menu_cache.item(int(food_id)))
+        if not food:
+            return app.make_response((jsonify({"error": "Food not found"}), 404))
+        return Response(food, mimetype='application/json')
+    return await conditional(('menu',), build)
+
+
+async def get_order(order_id):
+    async def build():
+        order = await asyncdb.get_order_by_id(int(order_id))
+        if not order:
+            return app.make_response((jsonify({"error": "Order not found"}), 404))
+        return jsonify(order)
+    return await conditional(('orders', 'menu'), build)
+
+
+async def admin_stats():
+    async def build():
+        return jsonify(await asyncdb.get_admin_stats())
+    return await conditional(('orders',), build)
+
+
+async def admin_order_stream():
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    # The body is an async generator; send_response streams it
+    return Response(
+        order_feed.astream(last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+# (method, path pattern, handler) served on the event loop
+NATIVE_ROUTES = [
+    ('GET', re.compile(r'/api/health(/live)?'), health),
+    ('GET', re.compile(r'/api/foods'), get_foods),
+    ('GET', re.compile(r'/api/foods/(?P<food_id>\d+)'), get_food),
+    ('GET', re.compile(r'/api/orders/(?P<order_id>\d+)'), get_order),
+    ('GET', re.compile(r'/api/admin/stats'), admin_stats),
+    ('GET', re.compile(r'/api/admin/orders/stream'), admin_order_stream),
+]
+
+
+def match_native(method, path):
+    """Return (handler, params) for a natively served route, or (None, None)"""
+    for route_method, pattern, handler in NATIVE_ROUTES:
+        if route_method == method:
+            match = pattern.fullmatch(path)
+            if match:
+                return handler, match.groupdict()
+    return None, None
+
+
+class RequestBody:
+    """wsgi.input that pulls ASGI body chunks on demand from a worker thread"""
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._buffer = b''
+        self._more = True
+
+    def _pull(self):
+        message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+        if message['type'] == 'http.disconnect':
+            self._more = False
+            raise ClientDisconnected()
+        self._buffer += message.get('body', b'')
+        self._more = message.get('more_body', False)
+
+    def read(self, size=-1):
+        while self._more and (size is None or size < 0 or len(self._buffer) < size):
+            self._pull()
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def readline(self, size=-1):
+        while self._more and b'\n' not in self._buffer and (size < 0 or len(self._buffer) < size):
+            self._pull()
+        end = self._buffer.find(b'\n') + 1 or len(self._buffer)
+        if size >= 0:
+            end = min(end, size)
+        data, self._buffer = self._buffer[:end], self._buffer[end:]
+        return data
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f"HTTP_{name}"
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+def _start_message(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    }
+
+
+async def send_response(send, response):
+    """Send a Flask response, streaming an async generator body"""
+    await send(_start_message(response.status_code, response.headers.items()))
+    body = response.response
+    if hasattr(body, '__aiter__'):
+        try:
+            async for text in body:
+                await send({'type': 'http.response.body', 'body': text.encode('utf-8'), 'more_body': True})
+        finally:
+            await body.aclose()
+    else:
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+
+
+def _call_wsgi(environ, send, loop):
+    """Run the Flask app in a worker thread, relaying output to the loop"""
+    started = []
+
+    def emit(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [int(status.split(' ', 1)[0]), headers]
+
+    result = app(environ, start_response)
+    try:
+        sent_start = False
+        for chunk in result:
+            if not sent_start:
+                emit(_start_message(*started))
+                sent_start = True
+            if chunk:
+                emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        if not sent_start:
+            emit(_start_message(*started))
+        emit({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+
+
+async def _serve_native(handler, params, scope, send):
+    with app.request_context(build_environ(scope, io.BytesIO())):
+        try:
+            response = app.preprocess_request()
+            if response is None:
+                response = await handler(**params)
+            response = app.make_response(response)
+        except Exception as e:
+            try:
+                response = app.make_response(app.handle_user_exception(e))
+            except Exception as e:
+                response = app.handle_exception(e)
+        response = app.process_response(response)
+    await send_response(send, response)
+
+
+async def _serve_until_disconnect(serve, receive):
+    """Run serve() but cancel it when the client goes away (streams)"""
+    task = asyncio.ensure_future(serve)
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    watcher = asyncio.ensure_future(disconnected())
+    done, pending = await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    for future in pending:
+        future.cancel()
+    if task in done:
+        task.result()
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Migrations and asset builds run once in serve.py, not per worker
+            start_checkpointer()
+            start_archiver()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            _wsgi_executor.shutdown(wait=False)
+            asyncdb.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    handler, params = match_native(scope['method'], scope['path'])
+    if handler is not None:
+        # Native handlers are GETs; only the stream needs to watch for the
+        # client disconnecting, the rest finish on their own
+        serve = _serve_native(handler, params, scope, send)
+        if handler is admin_order_stream:
+            return await _serve_until_disconnect(serve, receive)
+        return await serve
+
+    loop = asyncio.get_running_loop()
+    environ = build_environ(scope, RequestBody(receive, loop))
+    await loop.run_in_executor(_wsgi_executor, _call_wsgi, environ, send, loop)
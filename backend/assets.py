@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Foodzz Static Assets
+Content-hashed asset builds, precompressed variants and long-cache serving
+
+Usage: python assets.py   build static/dist and its manifest
+
+brotli is optional; without it only .gz variants are written.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+from pathlib import Path
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+STATIC_DIR = Path(__file__).parent.parent / 'static'
+DIST_DIRNAME = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Source folders fingerprinted by the build (uploads are already hashed)
+BUILD_DIRS = ('css', 'js')
+# Only text formats benefit from precompression
+COMPRESSIBLE_SUFFIXES = {'.css', '.js', '.json', '.svg', '.html', '.txt'}
+HASH_LENGTH = 16
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+# <hash>.ext, <hash>-variant.ext and name.<hash>.ext are safe to cache forever
+FINGERPRINTED = re.compile(r'(^|/|\.)[0-9a-f]{%d}([.-][\w-]+)?\.\w+$' % HASH_LENGTH)
+
+
+def content_hash(data):
+    """Short hex digest used in fingerprinted file names"""
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def fingerprinted_name(relative_path, digest):
+    """css/style.css -> css/style.<digest>.css"""
+    path = Path(relative_path)
+    return str(path.with_name(f"{path.stem}.{digest}{path.suffix}")).replace(os.sep, '/')
+
+
+def _write_compressed(path, data):
+    with open(f"{path}.gz", 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(f"{path}.br", 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build(static_dir=STATIC_DIR):
+    """Fingerprint the CSS/JS into static/dist and write the manifest
+
+    Returns the manifest: {"css/style.css": "dist/css/style.<hash>.css"}.
+    Files from the previous build are kept so workers still running the
+    old manifest during a rolling reload can serve them; anything older
+    is removed.
+    """
+    static_dir = Path(static_dir)
+    dist_dir = static_dir / DIST_DIRNAME
+    previous = load_manifest(static_dir)
+    manifest = {}
+    for folder in BUILD_DIRS:
+        for source in sorted((static_dir / folder).rglob('*')):
+            if not source.is_file():
+                continue
+            relative = source.relative_to(static_dir).as_posix()
+            data = source.read_bytes()
+            target_name = fingerprinted_name(relative, content_hash(data))
+            target = dist_dir / target_name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(data)
+            if source.suffix in COMPRESSIBLE_SUFFIXES:
+                _write_compressed(target, data)
+            manifest[relative] = f"{DIST_DIRNAME}/{target_name}"
+    _prune(dist_dir, set(manifest.values()) | set(previous.values()))
+    # Replace the manifest atomically; workers may be reading it
+    tmp_manifest = dist_dir / f".{MANIFEST_NAME}"
+    tmp_manifest.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    os.replace(tmp_manifest, dist_dir / MANIFEST_NAME)
+    return manifest
+
+
+def _prune(dist_dir, keep):
+    """Delete built files (and their .gz/.br) not listed in keep"""
+    keep_paths = {dist_dir / Path(name).relative_to(DIST_DIRNAME) for name in keep}
+    for path in dist_dir.rglob('*'):
+        if not path.is_file() or path.name == MANIFEST_NAME:
+            continue
+        original = path.with_suffix('') if path.suffix in ('.gz', '.br') else path
+        if original not in keep_paths:
+            path.unlink()
+
+
+def load_manifest(static_dir=STATIC_DIR):
+    """Read the build manifest, or {} if assets have not been built"""
+    try:
+        return json.loads((Path(static_dir) / DIST_DIRNAME / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+class StaticAssets:
+    """Serves /static with fingerprint rewriting, immutable caching and
+    precompressed .br/.gz variants
+
+    Templates keep calling url_for('static', filename='css/style.css');
+    the url_defaults hook swaps in the fingerprinted path from the manifest.
+    """
+
+    def __init__(self, app=None, static_dir=STATIC_DIR):
+        self.static_dir = Path(static_dir)
+        self.manifest = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.reload()
+        app.add_url_rule('/static/<path:filename>', endpoint='static', view_func=self.serve)
+        app.url_defaults(self._rewrite_url)
+
+    def reload(self):
+        """Re-read the manifest after a build"""
+        self.manifest = load_manifest(self.static_dir)
+
+    def _rewrite_url(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = self.manifest.get(values['filename'], values['filename'])
+
+    def serve(self, filename):
+        """Send a static file, preferring a precompressed variant"""
+        immutable = bool(FINGERPRINTED.search(filename))
+        accepted = request.accept_encodings
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if accepted[encoding] and (self.static_dir / f"{filename}{suffix}").is_file():
+                response = send_from_directory(
+                    self.static_dir, f"{filename}{suffix}",
+                    mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                    conditional=True
+                )
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(self.static_dir, filename, conditional=True)
+        response.vary.add('Accept-Encoding')
+        if immutable:
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+
+def main(argv):
+    manifest = build()
+    print(f"✓ {len(manifest)} assets fingerprinted into {STATIC_DIR / DIST_DIRNAME}")
+    if brotli is None:
+        print("⚠ brotli not installed; only .gz variants were written")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,67 @@
+"""
+Foodzz Async Database Access
+Awaitable versions of the connectiondb functions for the ASGI server
+
+sqlite3 has no async API, so each call runs on a dedicated executor with
+one thread per pooled connection. The event loop never blocks on SQLite,
+and no more calls run at once than the pool has connections for.
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import connectiondb
+from connectiondb import POOL_SIZE
+
+_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix='foodzz-db')
+
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking database function on the DB executor and await it"""
+    loop = asyncio.get_running_loop()
+    # Carry context variables over so queries count toward the current request
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+def _awaitable(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_db(func, *args, **kwargs)
+    return wrapper
+
+
+# Menu
+get_all_foods = _awaitable(connectiondb.get_all_foods)
+get_featured_food_ids = _awaitable(connectiondb.get_featured_food_ids)
+get_food_by_id = _awaitable(connectiondb.get_food_by_id)
+add_food_item = _awaitable(connectiondb.add_food_item)
+update_food_item = _awaitable(connectiondb.update_food_item)
+delete_food_item = _awaitable(connectiondb.delete_food_item)
+set_featured = _awaitable(connectiondb.set_featured)
+set_food_image_variants = _awaitable(connectiondb.set_food_image_variants)
+
+# Orders
+get_all_orders = _awaitable(connectiondb.get_all_orders)
+get_orders_page = _awaitable(connectiondb.get_orders_page)
+get_orders_by_ids = _awaitable(connectiondb.get_orders_by_ids)
+get_order_by_id = _awaitable(connectiondb.get_order_by_id)
+create_order = _awaitable(connectiondb.create_order)
+update_order_status = _awaitable(connectiondb.update_order_status)
+get_admin_stats = _awaitable(connectiondb.get_admin_stats)
+
+# Uploads and carts
+get_upload_job = _awaitable(connectiondb.get_upload_job)
+get_cart_items = _awaitable(connectiondb.get_cart_items)
+set_cart_item = _awaitable(connectiondb.set_cart_item)
+delete_cart = _awaitable(connectiondb.delete_cart)
+
+# Maintenance
+checkpoint = _awaitable(connectiondb.checkpoint)
+
+
+def shutdown(wait=True):
+    """Stop the DB executor threads"""
+    _executor.shutdown(wait=wait)
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Foodzz API Load Benchmark
+Seeds a throwaway database and drives a weighted traffic mix at the API
+
+Usage: python bench_api.py [--orders 20000] [--duration 10] [--concurrency 8]
+                           [--mix browse=40,food=10,cart=20,checkout=10,stats=10,orders=10]
+                           [--url http://localhost:8000] [--save run.json]
+                           [--compare baseline.json --threshold 10]
+
+Without --url requests go through Flask's test client in this process, so
+results are reproducible and need no server; with --url they go over
+HTTP to a running server (which uses its own database, not the seeded
+one). --compare exits 1 if any endpoint's p95 latency or throughput is
+more than --threshold percent worse than the saved baseline.
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from bench_checkout import percentile
+
+DEFAULT_MIX = 'browse=40,food=10,cart=20,checkout=10,stats=10,orders=10'
+STATUSES = ('pending', 'confirmed', 'preparing', 'ready', 'delivered', 'cancelled')
+CATEGORIES = ('Pizza', 'Burgers', 'Salads', 'Desserts', 'Drinks', 'Pasta')
+# Sent like a browser would, so responses are measured as served
+ACCEPT_ENCODING = 'gzip, deflate, br'
+CUSTOMER = {
+    'customer_name': 'Bench Customer',
+    'customer_email': 'bench@foodzz.com',
+    'delivery_address': '1 Bench St',
+    'phone': '000',
+    'payment_method': 'cash',
+}
+
+
+def seed(foods, orders, items_per_order, rng):
+    """Top the database up to the requested volumes in one transaction"""
+    from connectiondb import get_db
+
+    conn = get_db()
+    cursor = conn.cursor()
+    existing = cursor.execute('SELECT COUNT(*) FROM foods').fetchone()[0]
+    cursor.executemany(
+        'INSERT INTO foods (name, description, price, category, image) VALUES (?, ?, ?, ?, ?)',
+        [(f"Bench Dish {i}", "Generated for benchmarking", round(rng.uniform(3, 40), 2),
+          rng.choice(CATEGORIES), 'pizza.png') for i in range(existing, foods)]
+    )
+    prices = dict(cursor.execute('SELECT id, price FROM foods').fetchall())
+    food_ids = list(prices)
+
+    # UTC, like CURRENT_TIMESTAMP and every since/until filter in the app
+    start = datetime.now(timezone.utc) - timedelta(days=90)
+    order_rows = []
+    item_rows = []
+    next_id = (cursor.execute('SELECT MAX(id) FROM orders').fetchone()[0] or 0) + 1
+    for order_id in range(next_id, next_id + orders):
+        lines = [(rng.choice(food_ids), rng.randint(1, 3)) for _ in range(rng.randint(1, items_per_order))]
+        subtotal = round(sum(prices[f] * q for f, q in lines), 2)
+        tax = round(subtotal * 0.08, 2)
+        created_at = start + timedelta(seconds=rng.randint(0, 90 * 86400))
+        order_rows.append((order_id, 'Bench Customer', 'bench@foodzz.com', '1 Bench St', '000',
+                           subtotal, tax, 0, round(subtotal + tax, 2), 'cash',
+                           rng.choice(STATUSES), created_at.strftime('%Y-%m-%d %H:%M:%S')))
+        item_rows.extend((order_id, f, q, prices[f]) for f, q in lines)
+    cursor.executemany('''
+        INSERT INTO orders (id, customer_name, customer_email, delivery_address, phone,
+                            subtotal, tax, delivery_fee, total_price, payment_method, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', order_rows)
+    cursor.executemany('INSERT INTO order_items (order_id, food_id, quantity, price) VALUES (?, ?, ?, ?)',
+                       item_rows)
+    conn.commit()
+    conn.close()
+    return food_ids
+
+
+class TestClientTransport:
+    """Requests through Flask's test client; one per simulated user"""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, body=None):
+        """Returns (status, response body bytes)"""
+        response = self._client.open(path, method=method, json=body,
+                                     headers={'Accept-Encoding': ACCEPT_ENCODING})
+        return response.status_code, len(response.get_data())
+
+
+class HTTPTransport:
+    """Requests over HTTP with a per-user cookie jar"""
+
+    def __init__(self, base_url):
+        self._base_url = base_url.rstrip('/')
+        self._opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {'Accept-Encoding': ACCEPT_ENCODING}
+        if data:
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self._base_url + path, data=data, method=method, headers=headers)
+        try:
+            with self._opener.open(req) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, len(e.read())
+
+
+def scenarios(food_ids):
+    """Named user actions: each yields (endpoint label, method, path, body)"""
+    def browse(rng):
+        yield 'GET /api/foods', 'GET', '/api/foods', None
+
+    def food(rng):
+        yield 'GET /api/foods/<id>', 'GET', f"/api/foods/{rng.choice(food_ids)}", None
+
+    def cart(rng):
+        food_id = rng.choice(food_ids)
+        yield 'POST /api/cart/add', 'POST', '/api/cart/add', {'food_id': food_id, 'quantity': 1}
+        yield 'POST /api/cart/update', 'POST', '/api/cart/update', {'food_id': food_id, 'quantity': rng.randint(1, 5)}
+
+    def checkout(rng):
+        for food_id in rng.sample(food_ids, min(3, len(food_ids))):
+            yield 'POST /api/cart/add', 'POST', '/api/cart/add', {'food_id': food_id, 'quantity': rng.randint(1, 3)}
+        yield 'POST /api/checkout', 'POST', '/api/checkout', dict(CUSTOMER)
+
+    def stats(rng):
+        yield 'GET /api/admin/stats', 'GET', '/api/admin/stats', None
+
+    def orders(rng):
+        status = rng.choice(('all',) + STATUSES)
+        yield 'GET /api/admin/orders', 'GET', f"/api/admin/orders?limit=50&status={status}", None
+
+    return {'browse': browse, 'food': food, 'cart': cart, 'checkout': checkout,
+            'stats': stats, 'orders': orders}
+
+
+def parse_mix(text, available):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in available:
+            raise SystemExit(f"Unknown scenario '{name}'; choose from {', '.join(available)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run_load(make_transport, actions, mix, concurrency, duration, seed_value):
+    """Run simulated users for duration seconds; returns (samples, errors, sizes, elapsed)"""
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    sizes = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    names, weights = list(mix), list(mix.values())
+
+    def user(index):
+        rng = random.Random(seed_value + index)
+        transport = make_transport()
+        local_samples = defaultdict(list)
+        local_errors = defaultdict(int)
+        local_sizes = defaultdict(int)
+        while time.perf_counter() < deadline:
+            scenario = actions[rng.choices(names, weights)[0]]
+            for label, method, path, body in scenario(rng):
+                start = time.perf_counter()
+                status, size = transport.request(method, path, body)
+                local_samples[label].append((time.perf_counter() - start) * 1000)
+                local_sizes[label] += size
+                if status >= 400:
+                    local_errors[label] += 1
+        with lock:
+            for label, values in local_samples.items():
+                samples[label].extend(values)
+            for label, count in local_errors.items():
+                errors[label] += count
+            for label, size in local_sizes.items():
+                sizes[label] += size
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, errors, sizes, time.perf_counter() - started
+
+
+def summarize(samples, errors, sizes, elapsed):
+    """Per-endpoint throughput, latency percentiles and mean response size"""
+    results = {}
+    for label in sorted(samples):
+        values = samples[label]
+        results[label] = {
+            'requests': len(values),
+            'errors': errors.get(label, 0),
+            'rps': round(len(values) / elapsed, 1),
+            'mean_ms': round(statistics.mean(values), 3),
+            'p50_ms': round(percentile(values, 50), 3),
+            'p95_ms': round(percentile(values, 95), 3),
+            'p99_ms': round(percentile(values, 99), 3),
+            'mean_bytes': round(sizes.get(label, 0) / len(values)),
+        }
+    return results
+
+
+def print_results(results):
+    print(f"{'endpoint':<24} {'reqs':>7} {'errs':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'bytes':>8}")
+    for label, row in results.items():
+        print(f"{label:<24} {row['requests']:>7} {row['errors']:>5} {row['rps']:>8.1f} "
+              f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['mean_bytes']:>8}")
+
+
+def compare(results, baseline, threshold):
+    """Print regressions against a baseline run; returns True if any"""
+    regressed = False
+    for label, row in results.items():
+        base = baseline.get(label)
+        if not base:
+            continue
+        p95_change = (row['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100 if base['p95_ms'] else 0
+        rps_change = (row['rps'] - base['rps']) / base['rps'] * 100 if base['rps'] else 0
+        bad = p95_change > threshold or rps_change < -threshold
+        regressed = regressed or bad
+        mark = '⚠' if bad else '✓'
+        print(f"{mark} {label:<24} p95 {p95_change:+6.1f}%  rps {rps_change:+6.1f}%")
+    return regressed
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--foods', type=int, default=50, help='foods on the menu after seeding')
+    parser.add_argument('--orders', type=int, default=20000, help='historical orders to seed')
+    parser.add_argument('--items-per-order', type=int, default=4, help='max lines per seeded order')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='scenario=weight list')
+    parser.add_argument('--concurrency', type=int, default=8, help='simulated users')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load')
+    parser.add_argument('--warmup', type=float, default=1, help='seconds of unmeasured load first')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for data and traffic')
+    parser.add_argument('--url', help='benchmark a running server instead of the in-process app')
+    parser.add_argument('--save', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON from an earlier --save')
+    parser.add_argument('--threshold', type=float, default=10, help='allowed regression in percent')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    if args.url:
+        base_url = args.url
+        with urllib.request.urlopen(f"{base_url.rstrip('/')}/api/foods") as response:
+            food_ids = [food['id'] for food in json.load(response)]
+        make_transport = lambda: HTTPTransport(base_url)
+    else:
+        workdir = tempfile.mkdtemp(prefix='foodzz-bench-')
+        os.environ['FOODZZ_DB_PATH'] = str(Path(workdir) / 'bench.db')
+        os.environ.setdefault('FOODZZ_SECRET_KEY', 'bench')
+        from connectiondb import init_db
+        init_db()
+        started = time.perf_counter()
+        food_ids = seed(args.foods, args.orders, args.items_per_order, rng)
+        print(f"✓ Seeded {len(food_ids)} foods and {args.orders} orders in {time.perf_counter() - started:.1f}s")
+        from app import app
+        make_transport = lambda: TestClientTransport(app)
+
+    actions = scenarios(food_ids)
+    mix = parse_mix(args.mix, actions)
+    if args.warmup > 0:
+        run_load(make_transport, actions, mix, args.concurrency, args.warmup, args.seed + 1000)
+    samples, errors, sizes, elapsed = run_load(
+        make_transport, actions, mix, args.concurrency, args.duration, args.seed
+    )
+    results = summarize(samples, errors, sizes, elapsed)
+    print_results(results)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps({
+            'settings': {k: v for k, v in vars(args).items() if k not in ('save', 'compare')},
+            'results': results,
+        }, indent=2, sort_keys=True))
+        print(f"✓ Results saved to {args.save}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())['results']
+        if compare(results, baseline, args.threshold):
+            print(f"⚠ Regression beyond {args.threshold}% against {args.compare}")
+            return 1
+        print(f"✓ No regression beyond {args.threshold}% against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
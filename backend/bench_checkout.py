@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Foodzz Checkout Benchmark
+Measures create_order latency as the number of order lines grows
+
+Usage: python bench_checkout.py [--lines 1,10,100,500,1000] [--repeat 50]
+
+Runs against a throwaway database in a temp directory, never foodzz.db.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--lines', default='1,10,100,500,1000',
+                        help='comma-separated order line counts to measure')
+    parser.add_argument('--repeat', type=int, default=50, help='orders per line count')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='foodzz-bench-')
+    os.environ['FOODZZ_DB_PATH'] = str(Path(workdir) / 'bench.db')
+    from connectiondb import init_db, create_order, get_all_foods
+
+    init_db()
+    food_ids = [food['id'] for food in get_all_foods()]
+
+    print(f"{'lines':>7} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9} {'us/line':>9}")
+    for count in (int(n) for n in args.lines.split(',')):
+        items = [{'id': food_ids[i % len(food_ids)], 'quantity': 1 + i % 3} for i in range(count)]
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            create_order('Bench', 'bench@foodzz.com', 'Bench St', '000',
+                         0, 0, 0, 0, 'cash', items)
+            samples.append((time.perf_counter() - start) * 1000)
+        mean = statistics.mean(samples)
+        print(f"{count:>7} {percentile(samples, 50):>9.3f} {percentile(samples, 95):>9.3f} "
+              f"{mean:>9.3f} {mean * 1000 / count:>9.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
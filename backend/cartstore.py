@@ -0,0 +1,168 @@
+"""
+Foodzz Cart Store
+Server-side carts keyed by a random cart ID cookie, holding food_id -> quantity
+
+FOODZZ_CART_STORE selects the backend: 'memory' (default, per process) or
+'sqlite' (shared by every worker through foodzz.db).
+"""
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from connectiondb import delete_cart, get_cart_items, purge_expired_carts, set_cart_item
+
+CART_STORE = os.environ.get('FOODZZ_CART_STORE', 'memory').lower()
+# Idle seconds before a cart is dropped
+CART_TTL = float(os.environ.get('FOODZZ_CART_TTL', str(7 * 24 * 3600)))
+# Cap on carts held by the memory store; least recently used go first
+CART_MAX_CARTS = int(os.environ.get('FOODZZ_CART_MAX_CARTS', '100000'))
+CART_MAX_QUANTITY = 99
+CART_COOKIE = 'foodzz_cart'
+# How often the SQLite store sweeps expired carts
+PURGE_INTERVAL = 600
+
+
+def new_cart_id():
+    """Unguessable cart ID for the cookie"""
+    return secrets.token_urlsafe(18)
+
+
+class MemoryCartStore:
+    """Carts in a dict ordered by last use, evicted by TTL and size
+
+    Every operation is O(1): lookups are dict hits and eviction pops
+    from the least recently used end.
+    """
+
+    def __init__(self, ttl=CART_TTL, max_carts=CART_MAX_CARTS):
+        self.ttl = ttl
+        self.max_carts = max_carts
+        self._lock = threading.Lock()
+        self._carts = OrderedDict()  # cart_id -> (expires_at, {food_id: quantity})
+
+    def _evict(self, now):
+        while self._carts:
+            cart_id, (expires_at, _) = next(iter(self._carts.items()))
+            if expires_at > now and len(self._carts) <= self.max_carts:
+                break
+            del self._carts[cart_id]
+
+    def _touch(self, cart_id, now):
+        entry = self._carts.pop(cart_id, None)
+        items = entry[1] if entry and entry[0] > now else {}
+        self._carts[cart_id] = (now + self.ttl, items)
+        return items
+
+    def get(self, cart_id):
+        """Return a copy of the cart's {food_id: quantity}"""
+        with self._lock:
+            entry = self._carts.get(cart_id)
+            if not entry or entry[0] <= time.time():
+                return {}
+            return dict(entry[1])
+
+    def add(self, cart_id, food_id, quantity):
+        """Add quantity of a food (a negative total removes it)"""
+        with self._lock:
+            now = time.time()
+            items = self._touch(cart_id, now)
+            total = items.get(food_id, 0) + quantity
+            if total > 0:
+                items[food_id] = total
+            else:
+                items.pop(food_id, None)
+            self._evict(now)
+            return dict(items)
+
+    def set(self, cart_id, food_id, quantity):
+        """Set a food's quantity; zero or less removes it"""
+        with self._lock:
+            now = time.time()
+            items = self._touch(cart_id, now)
+            if quantity > 0:
+                items[food_id] = quantity
+            else:
+                items.pop(food_id, None)
+            self._evict(now)
+            return dict(items)
+
+    def clear(self, cart_id):
+        """Drop the cart"""
+        with self._lock:
+            self._carts.pop(cart_id, None)
+
+    def stats(self):
+        return {"backend": "memory", "carts": len(self._carts)}
+
+
+class SQLiteCartStore:
+    """Carts in the carts/cart_items tables, shared across processes"""
+
+    def __init__(self, ttl=CART_TTL):
+        self.ttl = ttl
+        self._next_purge = 0.0
+
+    def _maybe_purge(self, now):
+        if now >= self._next_purge:
+            self._next_purge = now + PURGE_INTERVAL
+            purge_expired_carts(now)
+
+    def get(self, cart_id):
+        """Return the cart's {food_id: quantity}"""
+        return get_cart_items(cart_id, time.time())
+
+    def add(self, cart_id, food_id, quantity):
+        """Add quantity of a food (a negative total removes it)"""
+        now = time.time()
+        set_cart_item(cart_id, food_id, quantity, now + self.ttl, increment=True)
+        self._maybe_purge(now)
+        return self.get(cart_id)
+
+    def set(self, cart_id, food_id, quantity):
+        """Set a food's quantity; zero or less removes it"""
+        now = time.time()
+        set_cart_item(cart_id, food_id, quantity, now + self.ttl)
+        self._maybe_purge(now)
+        return self.get(cart_id)
+
+    def clear(self, cart_id):
+        """Drop the cart"""
+        delete_cart(cart_id)
+
+    def stats(self):
+        return {"backend": "sqlite"}
+
+
+def create_cart_store(backend=CART_STORE):
+    """Build the cart store named by FOODZZ_CART_STORE"""
+    if backend == 'memory':
+        return MemoryCartStore()
+    if backend == 'sqlite':
+        return SQLiteCartStore()
+    raise ValueError(f"Unknown cart store: {backend}")
+
+
+def cart_lines(items, menu):
+    """Price a {food_id: quantity} map from the menu cache at read time
+
+    Foods removed from the menu since they were added are left out.
+    """
+    lines = []
+    for food_id, quantity in items.items():
+        food = menu.food(food_id)
+        if food is None:
+            continue
+        lines.append({
+            'id': food_id,
+            'name': food['name'],
+            'price': food['price'],
+            'quantity': quantity,
+            'image': food['image'],
+        })
+    return lines
+
+
+cart_store = create_cart_store()
@@ -3,110 +3,640 @@ Foodzz Database Connection and Initialization
 Handles all SQLite database operations and setup
 """
 
+import atexit
+import base64
+import functools
+import json
+import mmap
+import os
+import random
+import re
 import sqlite3
+import struct
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
 # Database file path
-DB_PATH = Path(__file__).parent / "foodzz.db"
+DB_PATH = Path(os.environ.get('FOODZZ_DB_PATH', Path(__file__).parent / "foodzz.db"))
 
+# Connection pool configuration
+POOL_SIZE = int(os.environ.get('FOODZZ_DB_POOL_SIZE', '8'))
+POOL_HEALTH_CHECK_INTERVAL = float(os.environ.get('FOODZZ_DB_HEALTH_CHECK_INTERVAL', '30'))
 
-def get_db():
-    """Get database connection with row factory"""
-    conn = sqlite3.connect(str(DB_PATH))
+# Storage tuning, applied to every new connection
+DB_JOURNAL_MODE = os.environ.get('FOODZZ_DB_JOURNAL_MODE', 'WAL').upper()
+DB_SYNCHRONOUS = os.environ.get('FOODZZ_DB_SYNCHRONOUS', 'NORMAL').upper()
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('FOODZZ_DB_BUSY_TIMEOUT_MS', '5000'))
+DB_CACHE_SIZE_KB = int(os.environ.get('FOODZZ_DB_CACHE_SIZE_KB', '16384'))
+DB_MMAP_SIZE = int(os.environ.get('FOODZZ_DB_MMAP_SIZE', str(64 * 1024 * 1024)))
+DB_CHECKPOINT_INTERVAL = float(os.environ.get('FOODZZ_DB_CHECKPOINT_INTERVAL', '60'))
+
+# Retry policy for writes that hit "database is locked"
+WRITE_RETRIES = int(os.environ.get('FOODZZ_DB_WRITE_RETRIES', '5'))
+WRITE_RETRY_BASE_DELAY = float(os.environ.get('FOODZZ_DB_WRITE_RETRY_DELAY', '0.02'))
+
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+CHECKPOINT_MODES = {'PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'}
+
+if DB_JOURNAL_MODE not in JOURNAL_MODES:
+    raise ValueError(f"Invalid FOODZZ_DB_JOURNAL_MODE: {DB_JOURNAL_MODE}")
+if DB_SYNCHRONOUS not in SYNCHRONOUS_MODES:
+    raise ValueError(f"Invalid FOODZZ_DB_SYNCHRONOUS: {DB_SYNCHRONOUS}")
+
+
+def _apply_pragmas(conn):
+    """Apply the storage tuning PRAGMAs to a fresh connection"""
+    conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+    try:
+        conn.execute(f'PRAGMA journal_mode = {DB_JOURNAL_MODE}')
+    except sqlite3.OperationalError:
+        # Switching journal mode needs a moment without other writers; the
+        # mode is persistent, so another connection has usually set it already.
+        pass
+    conn.execute(f'PRAGMA synchronous = {DB_SYNCHRONOUS}')
+    conn.execute(f'PRAGMA cache_size = {-DB_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {DB_MMAP_SIZE}')
+
+
+def _connect():
+    """Open a new SQLite connection with row factory"""
+    conn = sqlite3.connect(str(DB_PATH), check_same_thread=False,
+                           timeout=DB_BUSY_TIMEOUT_MS / 1000)
     conn.row_factory = sqlite3.Row
+    _apply_pragmas(conn)
     return conn
 
 
-def init_db():
-    """Initialize SQLite database with tables and sample data"""
+def _is_busy_error(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def retry_on_busy(func):
+    """Retry a write with exponential backoff while the database is locked"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = WRITE_RETRY_BASE_DELAY
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not _is_busy_error(e) or attempt == WRITE_RETRIES:
+                    raise
+            time.sleep(delay + random.uniform(0, delay))
+            delay *= 2
+    return wrapper
+
+
+# Receives query timings when set (see set_query_observer)
+_query_observer = None
+
+
+def set_query_observer(observer):
+    """Route query timings to observer.query(sql, seconds) and
+    observer.rows(count); None turns instrumentation off entirely"""
+    global _query_observer
+    _query_observer = observer
+
+
+class TimedCursor:
+    """Cursor wrapper that reports statement time and fetched rows"""
+
+    __slots__ = ('_cursor', '_observer')
+
+    def __init__(self, cursor, observer):
+        self._cursor = cursor
+        self._observer = observer
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _timed(self, method, sql, *args):
+        start = time.perf_counter()
+        try:
+            method(sql, *args)
+        finally:
+            self._observer.query(sql, time.perf_counter() - start)
+        return self
+
+    def execute(self, sql, parameters=()):
+        return self._timed(self._cursor.execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(self._cursor.executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql):
+        return self._timed(self._cursor.executescript, sql)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._observer.rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size if size is not None else self._cursor.arraysize)
+        self._observer.rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._observer.rows(len(rows))
+        return rows
+
+    def __iter__(self):
+        count = 0
+        try:
+            for row in self._cursor:
+                count += 1
+                yield row
+        finally:
+            self._observer.rows(count)
+
+
+class PooledConnection:
+    """Connection handle that goes back to the pool on close()"""
+
+    __slots__ = ('_conn', '_pool')
+
+    def __init__(self, conn, pool):
+        self._conn = conn
+        self._pool = pool
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed connection.")
+        return getattr(self._conn, name)
+
+    def cursor(self):
+        """A cursor, timed when a query observer is set"""
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed connection.")
+        cursor = self._conn.cursor()
+        observer = _query_observer
+        return TimedCursor(cursor, observer) if observer is not None else cursor
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        """Return the underlying connection to the pool"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __del__(self):
+        # A handle dropped without close() (e.g. on an exception path)
+        # still gives its connection back instead of leaking a slot.
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._conn is not None:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable SQLite connections
+
+    Keeps up to ``size`` idle connections around. When every pooled
+    connection is busy a new one is opened rather than blocking; it is
+    closed again on release if the pool is already full.
+    """
+
+    def __init__(self, connect, size=POOL_SIZE, health_check_interval=POOL_HEALTH_CHECK_INTERVAL):
+        self._connect = connect
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self._idle = []  # list of (connection, released_at)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.in_use = 0
+        self.created = 0
+
+    def acquire(self):
+        """Check out a healthy connection"""
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Connection pool is closed")
+                item = self._idle.pop() if self._idle else None
+                self.in_use += 1
+            if item is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self.in_use -= 1
+                    raise
+                with self._lock:
+                    self.created += 1
+                return PooledConnection(conn, self)
+            conn, released_at = item
+            if time.monotonic() - released_at < self.health_check_interval or self._is_healthy(conn):
+                return PooledConnection(conn, self)
+            self._discard(conn)
+            with self._lock:
+                self.in_use -= 1
+
+    def release(self, conn):
+        """Return a connection, rolling back anything left uncommitted"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            with self._lock:
+                self.in_use -= 1
+            return
+        with self._lock:
+            self.in_use -= 1
+            if not self._closed and len(self._idle) < self.size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        self._discard(conn)
+
+    def close_all(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def drain(self):
+        """Close every idle connection but keep the pool open"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """Return current pool usage counters"""
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "in_use": self.in_use,
+                "created": self.created,
+            }
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+_pool = ConnectionPool(_connect)
+
+# SQLite connections must not cross fork(); a preforking server's workers
+# open their own after the master has drained its idle connections
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_pool.drain)
+
+
+def get_db():
+    """Get a pooled database connection with row factory
+
+    Callers close() it as before; the connection is returned to the pool.
+    """
+    return _pool.acquire()
+
+
+def get_pool():
+    """Return the process-wide connection pool"""
+    return _pool
+
+
+def checkpoint(mode='PASSIVE'):
+    """Run a WAL checkpoint; returns (busy, wal_pages, checkpointed_pages)"""
+    mode = mode.upper()
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"Invalid checkpoint mode: {mode}")
+    conn = get_db()
+    try:
+        return tuple(conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone())
+    finally:
+        conn.close()
+
+
+def probe_database(lock_timeout_ms):
+    """Time a cheap read and a write-lock acquisition on a pooled connection
+
+    Returns (query_ms, lock_wait_ms). The write lock is taken with
+    BEGIN IMMEDIATE and released at once; waiting longer than
+    lock_timeout_ms raises sqlite3.OperationalError ("database is locked").
+    """
+    conn = get_db()
+    try:
+        start = time.perf_counter()
+        conn.execute('SELECT id FROM foods LIMIT 1').fetchone()
+        query_ms = (time.perf_counter() - start) * 1000
+
+        conn.execute(f'PRAGMA busy_timeout = {int(lock_timeout_ms)}')
+        try:
+            start = time.perf_counter()
+            conn.execute('BEGIN IMMEDIATE')
+            lock_wait_ms = (time.perf_counter() - start) * 1000
+            conn.rollback()
+        finally:
+            conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+        return query_ms, lock_wait_ms
+    finally:
+        conn.close()
+
+
+_checkpoint_stop = threading.Event()
+_checkpoint_thread = None
+
+
+def _checkpoint_loop(interval):
+    while not _checkpoint_stop.wait(interval):
+        try:
+            checkpoint('PASSIVE')
+        except sqlite3.Error as e:
+            print(f"⚠ WAL checkpoint failed: {e}")
+
+
+def start_checkpointer(interval=DB_CHECKPOINT_INTERVAL):
+    """Start the background thread that checkpoints the WAL periodically"""
+    global _checkpoint_thread
+    if interval <= 0 or DB_JOURNAL_MODE != 'WAL':
+        return
+    if _checkpoint_thread is not None and _checkpoint_thread.is_alive():
+        return
+    _checkpoint_stop.clear()
+    _checkpoint_thread = threading.Thread(
+        target=_checkpoint_loop, args=(interval,), name='foodzz-wal-checkpoint', daemon=True
+    )
+    _checkpoint_thread.start()
+
+
+def stop_checkpointer():
+    """Stop the periodic checkpoint thread"""
+    global _checkpoint_thread
+    _checkpoint_stop.set()
+    if _checkpoint_thread is not None:
+        _checkpoint_thread.join(timeout=5)
+        _checkpoint_thread = None
+
+
+def close_pool():
+    """Close all pooled connections (called at interpreter exit)
+
+    The WAL is only checkpointed if this process opened the database:
+    merely importing this module must not create or convert foodzz.db.
+    """
+    stop_checkpointer()
+    if DB_JOURNAL_MODE == 'WAL' and _pool.stats()['created']:
+        try:
+            checkpoint('TRUNCATE')
+        except sqlite3.Error:
+            pass
+    _pool.close_all()
+
+
+atexit.register(close_pool)
+
+
+# Data version counters, bumped after every committed write so caches and
+# HTTP validators can tell when a group of tables has changed. They live in
+# a small memory-mapped file next to the database so every worker process
+# (and the CLI tools) share them.
+DATA_GROUPS = ('menu', 'orders')
+VERSIONS_PATH = Path(f"{DB_PATH}-versions")
+
+
+class SharedVersions:
+    """Versions and change times for DATA_GROUPS in a shared mmap'd file
+
+    Layout: an 8-byte random epoch written when the file is created, then
+    an int64 version and float64 change time per group. Reads are plain
+    memory loads; bumps serialize on a thread lock plus a POSIX record
+    lock. Without fcntl (Windows) the counters are process-local.
+    """
+
+    HEADER = struct.Struct('<8s')
+    SLOT = struct.Struct('<qd')
+
+    def __init__(self, path=VERSIONS_PATH, groups=DATA_GROUPS):
+        self._offsets = {
+            name: self.HEADER.size + i * self.SLOT.size for i, name in enumerate(groups)
+        }
+        size = self.HEADER.size + len(groups) * self.SLOT.size
+        self._lock = threading.Lock()
+        self._fd = None
+        if fcntl is None:
+            self._buf = bytearray(size)
+            self._initialize()
+            return
+        self._fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            fresh = os.fstat(self._fd).st_size < size
+            if fresh:
+                os.ftruncate(self._fd, size)
+            self._buf = mmap.mmap(self._fd, size)
+            if fresh:
+                self._initialize()
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _initialize(self):
+        self.HEADER.pack_into(self._buf, 0, os.urandom(8))
+        now = time.time()
+        for offset in self._offsets.values():
+            self.SLOT.pack_into(self._buf, offset, 0, now)
+
+    @property
+    def epoch(self):
+        """Hex ID of this counter file; changes only if it is recreated"""
+        return self.HEADER.unpack_from(self._buf, 0)[0].hex()
+
+    def get(self, name):
+        """Return (version, changed_at) for a group"""
+        return self.SLOT.unpack_from(self._buf, self._offsets[name])
+
+    def bump(self, name):
+        """Increment a group's version and return the new value"""
+        offset = self._offsets[name]
+        with self._lock:
+            if self._fd is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                version = self.SLOT.unpack_from(self._buf, offset)[0] + 1
+                self.SLOT.pack_into(self._buf, offset, version, time.time())
+            finally:
+                if self._fd is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        return version
+
+
+_versions = SharedVersions()
+
+
+def get_data_version(name):
+    """Return the current version of a data group ('menu' or 'orders')"""
+    return _versions.get(name)[0]
+
+
+def get_data_changed_at(name):
+    """Return the Unix time a data group was last changed"""
+    return _versions.get(name)[1]
+
+
+def get_data_epoch():
+    """ID of the shared version counters, for prefixing ETags"""
+    return _versions.epoch
+
+
+def bump_data_version(name):
+    """Mark a data group as changed (in every process) and return its new version"""
+    return _versions.bump(name)
+
+
+# Callbacks run with the order ID after an order is created or changed
+_order_listeners = []
+
+
+def add_order_listener(callback):
+    """Register callback(order_id) to run after an order is written"""
+    _order_listeners.append(callback)
+
+
+def notify_order_changed(order_id):
+    """Bump the 'orders' version and tell listeners which order changed"""
+    bump_data_version('orders')
+    for callback in _order_listeners:
+        callback(order_id)
+
+
+def init_db(reset=False):
+    """Bring the database schema up to date, keeping existing data
+
+    Pass reset=True to drop every table first (the old fresh-start
+    behaviour); the migrations then recreate the schema and sample menu.
+    """
+    from migrations import migrate, reset as reset_schema
+
     conn = get_db()
-    cursor = conn.cursor()
     print("✓ DB connected")
-    
-    # Drop existing tables (for fresh start)
-    cursor.execute('DROP TABLE IF EXISTS order_items')
-    cursor.execute('DROP TABLE IF EXISTS orders')
-    cursor.execute('DROP TABLE IF EXISTS foods')
-    
-    # Create foods table
-    cursor.execute('''
-        CREATE TABLE foods (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            price REAL NOT NULL,
-            category TEXT,
-            image TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create orders table
-    cursor.execute('''
-        CREATE TABLE orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            customer_name TEXT NOT NULL,
-            customer_email TEXT NOT NULL,
-            delivery_address TEXT NOT NULL,
-            phone TEXT NOT NULL,
-            subtotal REAL NOT NULL,
-            tax REAL NOT NULL,
-            delivery_fee REAL NOT NULL,
-            total_price REAL NOT NULL,
-            payment_method TEXT,
-            status TEXT DEFAULT 'pending',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create order_items table
-    cursor.execute('''
-        CREATE TABLE order_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id INTEGER NOT NULL,
-            food_id INTEGER NOT NULL,
-            quantity INTEGER NOT NULL,
-            price REAL NOT NULL,
-            FOREIGN KEY (order_id) REFERENCES orders(id),
-            FOREIGN KEY (food_id) REFERENCES foods(id)
-        )
-    ''')
-    
-    # Insert sample foods with image filenames
-    sample_foods = [
-        ('Pizza', 'Delicious cheese pizza with fresh ingredients', 12.99, 'Pizza', 'pizza.png'),
-        ('Burger', 'Beef patty with cheese and veggies', 10.99, 'Burgers', 'burger.png'),
-        ('Fried Chicken', 'Crispy fried chicken pieces', 9.99, 'Chicken', 'fried-chicken.png'),
-        ('Sandwich', 'Fresh sandwich with layers of goodness', 8.99, 'Sandwiches', 'sandwich.png'),
-        ('Spring Roll', 'Crispy spring rolls with dipping sauce', 6.99, 'Appetizers', 'spring-roll.png'),
-        ('Chicken Roll', 'Tender chicken wrapped perfectly', 7.99, 'Rolls', 'chicken-roll.png'),
-        ('Momo', 'Steamed dumplings with filling', 8.49, 'Dumplings', 'momo.png'),
-        ('Spaghetti', 'Classic Italian spaghetti with sauce', 11.99, 'Pasta', 'spaghetti.png'),
-        ('Lasagna', 'Layered pasta with cheese and sauce', 13.99, 'Pasta', 'lasagna.png'),
-        ('Ice Cream', 'Refreshing ice cream dessert', 4.99, 'Desserts', 'icecream.png'),
-    ]
-    
-    for name, desc, price, category, image in sample_foods:
-        cursor.execute(
-            'INSERT INTO foods (name, description, price, category, image) VALUES (?, ?, ?, ?, ?)',
-            (name, desc, price, category, image)
-        )
-    
-    conn.commit()
-    conn.close()
+    try:
+        if reset:
+            reset_schema(conn)
+            print("✓ Existing tables dropped")
+        migrate(conn)
+    finally:
+        conn.close()
+    _json_object_sql.clear()
+    bump_data_version('menu')
+    bump_data_version('orders')
     print(f"✓ Database initialized at {DB_PATH}")
 
 
+def _food_dict(row):
+    """Convert a foods row to a dict, decoding the image_variants JSON"""
+    food = dict(row)
+    if food.get('image_variants'):
+        food['image_variants'] = json.loads(food['image_variants'])
+    return food
+
+
 def get_all_foods():
     """Fetch all foods from database"""
     conn = get_db()
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM foods')
-    foods = [dict(row) for row in cursor.fetchall()]
+    foods = [_food_dict(row) for row in cursor.fetchall()]
     conn.close()
     return foods
 
 
+SEARCH_PAGE_DEFAULT = 20
+SEARCH_PAGE_MAX = 100
+_SEARCH_TERM = re.compile(r'\w+')
+# Search queries, formatted with a FROM source (FTS match or the whole menu)
+SEARCH_MATCH_SOURCE = 'foods_fts JOIN foods f ON f.id = foods_fts.rowid WHERE foods_fts MATCH ?'
+SEARCH_MATCH_ORDER = 'bm25(foods_fts, 10.0, 1.0, 4.0), f.id'
+SEARCH_FACETS_SQL = 'SELECT f.category, COUNT(*) FROM {source} GROUP BY f.category ORDER BY f.category'
+SEARCH_PAGE_SQL = 'SELECT f.* FROM {source} ORDER BY {order} LIMIT ? OFFSET ?'
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query: every word, as a prefix, must match
+
+    Only word characters reach FTS5, so user input can't inject query syntax.
+    Returns None if the text has no searchable words.
+    """
+    terms = _SEARCH_TERM.findall(text.lower())
+    return ' '.join(f'"{term}"*' for term in terms) or None
+
+
+def search_foods(text, category=None, limit=SEARCH_PAGE_DEFAULT, offset=0):
+    """Ranked full-text search over food name, description and category
+
+    Name matches outrank category matches, which outrank description
+    matches. Returns (foods, total, facets): one page of foods, the number
+    of matches in ``category`` (or overall), and {category: matches} across
+    all categories so the storefront can show counts next to each filter.
+    Without search words it lists the menu (optionally one category) by name.
+    """
+    limit = max(1, min(int(limit), SEARCH_PAGE_MAX))
+    offset = max(0, int(offset))
+    query = fts_query(text or '')
+    conn = get_db()
+    cursor = conn.cursor()
+    if query:
+        source = SEARCH_MATCH_SOURCE
+        params = [query]
+        order = SEARCH_MATCH_ORDER
+    else:
+        source = 'foods f WHERE 1'
+        params = []
+        order = 'f.name, f.id'
+    counts = cursor.execute(SEARCH_FACETS_SQL.format(source=source), params).fetchall()
+    # Uncategorized foods count toward the total but get no facet
+    facets = {row[0]: row[1] for row in counts if row[0] is not None}
+    if category:
+        source += ' AND f.category = ?'
+        params.append(category)
+        total = facets.get(category, 0)
+    else:
+        total = sum(row[1] for row in counts)
+    cursor.execute(SEARCH_PAGE_SQL.format(source=source, order=order), params + [limit, offset])
+    foods = [_food_dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return foods, total, facets
+
+
 def get_featured_food_ids():
     """Return a list of featured food IDs (creates table if missing)"""
     conn = get_db()
@@ -129,18 +659,22 @@ def set_featured(food_id, featured=True):
         cursor.execute('DELETE FROM featured WHERE food_id = ?', (food_id,))
     conn.commit()
     conn.close()
+    bump_data_version('menu')
+
 
+def update_food_item(food_id, name, description, price, category, image=None, image_variants=None):
+    """Update an existing food item. If image is None, don't change it.
 
-def update_food_item(food_id, name, description, price, category, image=None):
-    """Update an existing food item. If image is None, don't change it."""
+    A new image replaces the stored variants with ``image_variants``.
+    """
     conn = get_db()
     cursor = conn.cursor()
     if image:
         cursor.execute('''
             UPDATE foods
-            SET name = ?, description = ?, price = ?, category = ?, image = ?
+            SET name = ?, description = ?, price = ?, category = ?, image = ?, image_variants = ?
             WHERE id = ?
-        ''', (name, description, price, category, image, food_id))
+        ''', (name, description, price, category, image, _encode_variants(image_variants), food_id))
     else:
         cursor.execute('''
             UPDATE foods
@@ -149,16 +683,35 @@ def update_food_item(food_id, name, description, price, category, image=None):
         ''', (name, description, price, category, food_id))
     conn.commit()
     conn.close()
+    bump_data_version('menu')
+
+
+def _encode_variants(image_variants):
+    return json.dumps(image_variants, sort_keys=True) if image_variants else None
+
+
+def set_food_image_variants(food_id, image_variants):
+    """Store the generated image variants for a food"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('UPDATE foods SET image_variants = ? WHERE id = ?',
+                   (_encode_variants(image_variants), food_id))
+    conn.commit()
+    conn.close()
+    bump_data_version('menu')
+
+
+FOOD_BY_ID_SQL = 'SELECT * FROM foods WHERE id = ?'
 
 
 def get_food_by_id(food_id):
     """Fetch a single food by ID"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM foods WHERE id = ?', (food_id,))
+    cursor.execute(FOOD_BY_ID_SQL, (food_id,))
     food = cursor.fetchone()
     conn.close()
-    return dict(food) if food else None
+    return _food_dict(food) if food else None
 
 
 def get_all_orders():
@@ -171,24 +724,157 @@ def get_all_orders():
     return orders
 
 
+ORDERS_PAGE_DEFAULT = 50
+ORDERS_PAGE_MAX = 500
+# Formatted with the WHERE clause from orders_page_filter and the selected columns
+ORDERS_PAGE_SQL = 'SELECT {columns} FROM orders {where} ORDER BY created_at DESC, id DESC LIMIT ?'
+
+
+def encode_order_cursor(order):
+    """Build an opaque keyset cursor pointing just after the given order"""
+    raw = f"{order['created_at']}|{order['id']}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_order_cursor(cursor):
+    """Decode a cursor into (created_at, id); raises ValueError if invalid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, order_id = base64.urlsafe_b64decode(padded).decode('utf-8').rsplit('|', 1)
+        return normalize_timestamp(created_at), int(order_id)
+    except (ValueError, UnicodeDecodeError, base64.binascii.Error):
+        raise ValueError("Invalid cursor")
+
+
+def normalize_timestamp(value):
+    """Parse an ISO date/datetime into the 'YYYY-MM-DD HH:MM:SS' form SQLite stores"""
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid timestamp: {value}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def orders_page_filter(after=None, status=None, since=None, until=None):
+    """WHERE clause and parameters shared by the orders page queries"""
+    clauses = []
+    params = []
+    if status:
+        clauses.append('status = ?')
+        params.append(status)
+    if since:
+        clauses.append('created_at >= ?')
+        params.append(normalize_timestamp(since))
+    if until:
+        clauses.append('created_at < ?')
+        params.append(normalize_timestamp(until))
+    if after:
+        created_at, order_id = decode_order_cursor(after)
+        clauses.append('(created_at < ? OR (created_at = ? AND id < ?))')
+        params.extend([created_at, created_at, order_id])
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    return where, params
+
+
+def get_orders_page(limit=ORDERS_PAGE_DEFAULT, after=None, status=None, since=None, until=None):
+    """Fetch one page of orders, newest first, using keyset pagination
+
+    ``after`` is the cursor returned with the previous page; ``since`` (inclusive) and
+    ``until`` (exclusive) bound created_at. Returns (orders, next_cursor),
+    where next_cursor is None on the last page.
+    """
+    limit = max(1, min(int(limit), ORDERS_PAGE_MAX))
+    where, params = orders_page_filter(after, status, since, until)
+
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(ORDERS_PAGE_SQL.format(columns='*', where=where), params + [limit + 1])
+    rows = cursor.fetchall()
+    conn.close()
+
+    orders = [dict(row) for row in rows[:limit]]
+    next_cursor = encode_order_cursor(orders[-1]) if len(rows) > limit else None
+    return orders, next_cursor
+
+
+_json_object_sql = {}  # table -> expression; cleared by init_db when the schema may change
+
+
+def json_object_sql(cursor, table):
+    """SQLite expression encoding a row of table as a JSON object, keys sorted like jsonify
+
+    Text is written as UTF-8, like serializer.dumps; REAL columns get
+    SQLite's 15 significant digits, exact for the cent amounts stored.
+    """
+    expression = _json_object_sql.get(table)
+    if expression is None:
+        cursor.execute(f'PRAGMA table_info({table})')
+        pairs = (f"'{name}', {name}" for name in sorted(row[1] for row in cursor.fetchall()))
+        expression = _json_object_sql[table] = f"json_object({', '.join(pairs)})"
+    return expression
+
+
+def get_orders_page_json(limit=ORDERS_PAGE_DEFAULT, after=None, status=None, since=None, until=None):
+    """get_orders_page, but with the page already encoded as a JSON array
+
+    SQLite writes each order's JSON itself, so no Row or dict is built per
+    order. Returns (payload bytes, next_cursor).
+    """
+    limit = max(1, min(int(limit), ORDERS_PAGE_MAX))
+    where, params = orders_page_filter(after, status, since, until)
+
+    conn = get_db()
+    cursor = conn.cursor()
+    columns = f'{json_object_sql(cursor, "orders")}, created_at, id'
+    cursor.execute(ORDERS_PAGE_SQL.format(columns=columns, where=where), params + [limit + 1])
+    rows = cursor.fetchall()
+    conn.close()
+
+    page = rows[:limit]
+    next_cursor = encode_order_cursor(page[-1]) if len(rows) > limit else None
+    payload = f"[{','.join(row[0] for row in page)}]".encode('utf-8')
+    return payload, next_cursor
+
+
+def get_orders_by_ids(order_ids):
+    """Fetch several orders (without items) in one query"""
+    order_ids = list(order_ids)
+    if not order_ids:
+        return []
+    conn = get_db()
+    cursor = conn.cursor()
+    placeholders = ', '.join('?' * len(order_ids))
+    cursor.execute(f'SELECT * FROM orders WHERE id IN ({placeholders})', order_ids)
+    orders = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return orders
+
+
+ORDER_BY_ID_SQL = 'SELECT * FROM orders WHERE id = ?'
+ORDER_ITEMS_SQL = '''
+    SELECT oi.*, f.name as food_name, f.image
+    FROM order_items oi
+    JOIN foods f ON oi.food_id = f.id
+    WHERE oi.order_id = ?
+'''
+
+
 def get_order_by_id(order_id):
-    """Fetch a single order with its items"""
+    """Fetch a single order with its items, from the archive if it was moved there"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM orders WHERE id = ?', (order_id,))
+    cursor.execute(ORDER_BY_ID_SQL, (order_id,))
     order = cursor.fetchone()
     
     if not order:
         conn.close()
-        return None
+        from archive import get_archived_order
+        return get_archived_order(order_id)
     
     # Get order items
-    cursor.execute('''
-        SELECT oi.*, f.name as food_name, f.image
-        FROM order_items oi
-        JOIN foods f ON oi.food_id = f.id
-        WHERE oi.order_id = ?
-    ''', (order_id,))
+    cursor.execute(ORDER_ITEMS_SQL, (order_id,))
     items = [dict(row) for row in cursor.fetchall()]
     conn.close()
     
@@ -197,49 +883,174 @@ def get_order_by_id(order_id):
     return order_dict
 
 
+def normalize_order_lines(items):
+    """Validate cart items into a list of (food_id, quantity) pairs
+
+    Accepts the cart shapes used by the storefront ({'id': ...}) and the
+    API ({'food_id': ...}); raises ValueError on a malformed line.
+    """
+    lines = []
+    for item in items:
+        try:
+            food_id = int(item.get('id') or item.get('food_id'))
+            quantity = int(item.get('quantity', 1))
+        except (AttributeError, TypeError, ValueError):
+            raise ValueError(f"Invalid order line: {item!r}")
+        if quantity < 1:
+            raise ValueError(f"Invalid quantity for food {food_id}: {quantity}")
+        lines.append((food_id, quantity))
+    return lines
+
+
+def fetch_food_prices(cursor, food_ids):
+    """Look up current prices for a set of food IDs with one IN (...) query"""
+    food_ids = list(set(food_ids))
+    if not food_ids:
+        return {}
+    placeholders = ', '.join('?' * len(food_ids))
+    cursor.execute(f'SELECT id, price FROM foods WHERE id IN ({placeholders})', food_ids)
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+class IdempotencyKeyUsed(Exception):
+    """create_order found its idempotency key already recorded"""
+
+    def __init__(self, record):
+        super().__init__(f"Idempotency key already used for order {record['order_id']}")
+        self.record = record
+
+
+@retry_on_busy
 def create_order(customer_name, customer_email, delivery_address, phone, 
-                 subtotal, tax, delivery_fee, total_price, payment_method, items):
-    """Create a new order with items"""
+                 subtotal, tax, delivery_fee, total_price, payment_method, items,
+                 discount=0, line_prices=None, idempotency=None, status='confirmed'):
+    """Create a new order with items
+
+    Line prices come from ``line_prices`` ({food_id: price}, as resolved
+    by the pricing engine) or else from the foods table, never from the
+    client cart. All lines are written with a single executemany. Raises
+    ValueError for malformed lines or unknown foods.
+
+    ``idempotency`` is (key, request_hash, response, expires_at): the key
+    is stored in the same transaction as the order, with ``response`` plus
+    the new order_id. If the key is already stored, nothing is inserted
+    and IdempotencyKeyUsed is raised with the stored record.
+    """
+    lines = normalize_order_lines(items)
+    
     conn = get_db()
     cursor = conn.cursor()
     
-    # Insert order
-    cursor.execute('''
-        INSERT INTO orders (customer_name, customer_email, delivery_address, phone, 
-                          subtotal, tax, delivery_fee, total_price, payment_method, status)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        customer_name,
-        customer_email,
-        delivery_address,
-        phone,
-        subtotal,
-        tax,
-        delivery_fee,
-        total_price,
-        payment_method,
-        'confirmed'
-    ))
-    
-    order_id = cursor.lastrowid
-    
-    # Insert order items
-    for item in items:
-        food_id = item.get('id') or item.get('food_id')
-        quantity = item.get('quantity', 1)
-        price = item.get('price', 0)
+    try:
+        # Take the write lock up front so concurrent checkouts queue on
+        # busy_timeout instead of failing on a read-to-write upgrade
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        if idempotency is not None:
+            # A retry that queued behind the original request finds its key
+            # here; an expired one that was not purged yet is replaced
+            now = time.time()
+            cursor.execute('DELETE FROM idempotency_keys WHERE key = ? AND expires_at <= ?',
+                           (idempotency[0], now))
+            existing = _idempotency_record(cursor, idempotency[0], now)
+            if existing is not None:
+                conn.rollback()
+                raise IdempotencyKeyUsed(existing)
         
+        if line_prices is None:
+            prices = fetch_food_prices(cursor, (food_id for food_id, _ in lines))
+        else:
+            prices = line_prices
+        missing = sorted({food_id for food_id, _ in lines if food_id not in prices})
+        if missing:
+            raise ValueError(f"Unknown food id(s): {', '.join(map(str, missing))}")
+        
+        # Insert order
         cursor.execute('''
+            INSERT INTO orders (customer_name, customer_email, delivery_address, phone, 
+                              subtotal, discount, tax, delivery_fee, total_price, payment_method, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            customer_name,
+            customer_email,
+            delivery_address,
+            phone,
+            subtotal,
+            discount,
+            tax,
+            delivery_fee,
+            total_price,
+            payment_method,
+            status
+        ))
+        
+        order_id = cursor.lastrowid
+        
+        # Insert order items in one batch
+        cursor.executemany('''
             INSERT INTO order_items (order_id, food_id, quantity, price)
             VALUES (?, ?, ?, ?)
-        ''', (order_id, food_id, quantity, price))
+        ''', [(order_id, food_id, quantity, prices[food_id]) for food_id, quantity in lines])
+        
+        if idempotency is not None:
+            key, request_hash, response, expires_at = idempotency
+            cursor.execute('''
+                INSERT INTO idempotency_keys (key, request_hash, order_id, response, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (key, request_hash, order_id, json.dumps(dict(response, order_id=order_id)), expires_at))
+        
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
     
+    notify_order_changed(order_id)
+    return order_id
+
+
+IDEMPOTENCY_RECORD_SQL = '''
+    SELECT request_hash, order_id, response, expires_at FROM idempotency_keys
+    WHERE key = ? AND expires_at > ?
+'''
+
+
+def _idempotency_record(cursor, key, now):
+    cursor.execute(IDEMPOTENCY_RECORD_SQL, (key, now))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return {
+        "request_hash": row['request_hash'],
+        "order_id": row['order_id'],
+        "response": json.loads(row['response']),
+        "expires_at": row['expires_at'],
+    }
+
+
+def get_idempotency_record(key, now):
+    """Return {request_hash, order_id, response, expires_at} for an unexpired key, or None"""
+    conn = get_db()
+    try:
+        return _idempotency_record(conn.cursor(), key, now)
+    finally:
+        conn.close()
+
+
+@retry_on_busy
+def purge_expired_idempotency_keys(now):
+    """Delete idempotency keys that expired before now; returns how many"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM idempotency_keys WHERE expires_at <= ?', (now,))
+    purged = cursor.rowcount
     conn.commit()
     conn.close()
-    
-    return order_id
+    return purged
 
 
+@retry_on_busy
 def update_order_status(order_id, status):
     """Update order status"""
     conn = get_db()
@@ -247,31 +1058,46 @@ def update_order_status(order_id, status):
     cursor.execute('UPDATE orders SET status = ? WHERE id = ?', (status, order_id))
     conn.commit()
     conn.close()
+    notify_order_changed(order_id)
+
+
+ADMIN_STATUS_STATS_SQL = '''
+    SELECT status, SUM(order_count) AS order_count, SUM(revenue) AS revenue
+    FROM (
+        SELECT status, order_count, revenue FROM order_stats
+        UNION ALL
+        SELECT status, order_count, revenue FROM archived_order_stats
+    )
+    GROUP BY status HAVING SUM(order_count) > 0
+'''
+RECENT_ORDERS_SQL = 'SELECT * FROM orders ORDER BY created_at DESC LIMIT 5'
 
 
 def get_admin_stats():
-    """Get admin dashboard statistics"""
+    """Get admin dashboard statistics
+
+    Counters come from the trigger-maintained order_stats table (one row
+    per status) plus archived_order_stats for archived orders, so the cost
+    does not grow with order history.
+    """
     conn = get_db()
     cursor = conn.cursor()
     
-    # Total orders
-    cursor.execute('SELECT COUNT(*) as count FROM orders')
-    total_orders = cursor.fetchone()['count']
-    
-    # Total revenue
-    cursor.execute('SELECT SUM(total_price) as total FROM orders')
-    total_revenue = cursor.fetchone()['total'] or 0
-    
-    # Orders by status
-    cursor.execute('SELECT status, COUNT(*) as count FROM orders GROUP BY status')
-    orders_by_status = {row['status']: row['count'] for row in cursor.fetchall()}
+    # Orders and revenue by status
+    cursor.execute(ADMIN_STATUS_STATS_SQL)
+    rows = cursor.fetchall()
+    orders_by_status = {row['status']: row['order_count'] for row in rows}
+    total_orders = sum(orders_by_status.values())
+    total_revenue = sum(row['revenue'] for row in rows)
     
     # Pending orders count (all orders that are not delivered)
-    cursor.execute("SELECT COUNT(*) as count FROM orders WHERE status != 'delivered'")
-    pending_orders = cursor.fetchone()['count']
+    pending_orders = sum(
+        count for status, count in orders_by_status.items()
+        if status is not None and status != 'delivered'
+    )
     
     # Recent orders
-    cursor.execute('SELECT * FROM orders ORDER BY created_at DESC LIMIT 5')
+    cursor.execute(RECENT_ORDERS_SQL)
     recent_orders = [dict(row) for row in cursor.fetchall()]
     
     conn.close()
@@ -285,20 +1111,59 @@ def get_admin_stats():
     }
 
 
-def add_food_item(name, description, price, category, image):
+def reconcile_order_stats(fix=False):
+    """Compare order_stats with a full recount of orders
+
+    Returns {status: (stored, actual)} for every status whose
+    (count, revenue) pair drifted. With fix=True the table is rebuilt from
+    scratch in the same transaction.
+    """
+    from migrations import rebuild_order_stats
+
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('SELECT status, order_count, revenue FROM order_stats WHERE order_count != 0')
+        stored = {row['status']: (row['order_count'], round(row['revenue'], 2)) for row in cursor.fetchall()}
+        cursor.execute('''
+            SELECT status, COUNT(*) AS order_count, COALESCE(SUM(total_price), 0) AS revenue
+            FROM orders GROUP BY status
+        ''')
+        actual = {row['status']: (row['order_count'], round(row['revenue'], 2)) for row in cursor.fetchall()}
+        drift = {
+            status: (stored.get(status, (0, 0)), actual.get(status, (0, 0)))
+            for status in set(stored) | set(actual)
+            if stored.get(status, (0, 0)) != actual.get(status, (0, 0))
+        }
+        if fix:
+            rebuild_order_stats(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    if fix and drift:
+        bump_data_version('orders')
+    return drift
+
+
+def add_food_item(name, description, price, category, image, image_variants=None):
     """Add a new food item to database"""
     conn = get_db()
     cursor = conn.cursor()
     
     try:
         cursor.execute('''
-            INSERT INTO foods (name, description, price, category, image)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (name, description, price, category, image))
+            INSERT INTO foods (name, description, price, category, image, image_variants)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (name, description, price, category, image, _encode_variants(image_variants)))
         
         conn.commit()
         food_id = cursor.lastrowid
         conn.close()
+        bump_data_version('menu')
         return food_id
     except Exception as e:
         conn.close()
@@ -314,7 +1179,205 @@ def delete_food_item(food_id):
         cursor.execute('DELETE FROM foods WHERE id = ?', (food_id,))
         conn.commit()
         conn.close()
+        bump_data_version('menu')
     except Exception as e:
         conn.close()
         raise Exception(f"Failed to delete food item: {str(e)}")
 
+
+def get_foods_after(after_id=0, limit=500):
+    """A batch of foods with id > after_id in id order, with their featured flag"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT f.id, f.name, f.description, f.price, f.category, f.image,
+               fe.food_id IS NOT NULL AS featured
+        FROM foods f
+        LEFT JOIN featured fe ON fe.food_id = f.id
+        WHERE f.id > ?
+        ORDER BY f.id
+        LIMIT ?
+    ''', (after_id, limit))
+    foods = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return foods
+
+
+@retry_on_busy
+def import_food_batch(rows):
+    """Insert or update a batch of foods in one transaction
+
+    Each row is (food_id, name, description, price, category, image,
+    featured). A food_id of None inserts a new food; otherwise that food is
+    updated, keeping its image when image is None. A new image clears the
+    stored variants. featured None leaves the flag as it is. Returns the
+    food ID of each row, None where the food to update does not exist.
+    The caller bumps the menu version once the import is done.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    ids = []
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        for food_id, name, description, price, category, image, featured in rows:
+            if food_id is None:
+                cursor.execute('''
+                    INSERT INTO foods (name, description, price, category, image) VALUES (?, ?, ?, ?, ?)
+                ''', (name, description, price, category, image))
+                food_id = cursor.lastrowid
+            else:
+                cursor.execute('''
+                    UPDATE foods
+                    SET name = :name, description = :description, price = :price, category = :category,
+                        image_variants = CASE WHEN :image IS NULL OR :image = image THEN image_variants END,
+                        image = IFNULL(:image, image)
+                    WHERE id = :id
+                ''', {'name': name, 'description': description, 'price': price, 'category': category,
+                      'image': image, 'id': food_id})
+                if cursor.rowcount == 0:
+                    ids.append(None)
+                    continue
+            if featured:
+                cursor.execute('INSERT OR IGNORE INTO featured (food_id) VALUES (?)', (food_id,))
+            elif featured is not None:
+                cursor.execute('DELETE FROM featured WHERE food_id = ?', (food_id,))
+            ids.append(food_id)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return ids
+
+
+def create_upload_job(job_id):
+    """Record a queued background upload job"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO upload_jobs (id, status) VALUES (?, 'pending')", (job_id,))
+    conn.commit()
+    conn.close()
+
+
+def finish_upload_job(job_id, food_id=None, error=None):
+    """Mark an upload job done (with its food ID) or failed (with an error)"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE upload_jobs
+        SET status = ?, food_id = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', ('failed' if error else 'done', food_id, error, job_id))
+    conn.commit()
+    conn.close()
+
+
+@retry_on_busy
+def fail_stale_upload_jobs(max_age_seconds):
+    """Mark jobs pending for longer than max_age_seconds as failed; returns how many
+
+    A job whose worker was killed before it finished never updates its
+    row, so without this its status would stay 'pending' forever.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE upload_jobs
+        SET status = 'failed', error = 'Processing was interrupted; please upload again',
+            finished_at = CURRENT_TIMESTAMP
+        WHERE status = 'pending' AND created_at < datetime('now', ?)
+    ''', (f'-{int(max_age_seconds)} seconds',))
+    failed = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return failed
+
+
+def get_upload_job(job_id):
+    """Fetch an upload job's status"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM upload_jobs WHERE id = ?', (job_id,))
+    job = cursor.fetchone()
+    conn.close()
+    return dict(job) if job else None
+
+
+CART_ITEMS_SQL = '''
+    SELECT ci.food_id, ci.quantity
+    FROM carts c JOIN cart_items ci ON ci.cart_id = c.id
+    WHERE c.id = ? AND c.expires_at > ?
+'''
+
+
+def get_cart_items(cart_id, now):
+    """Return {food_id: quantity} for a cart, or {} if missing or expired"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(CART_ITEMS_SQL, (cart_id, now))
+    items = {row['food_id']: row['quantity'] for row in cursor.fetchall()}
+    conn.close()
+    return items
+
+
+@retry_on_busy
+def set_cart_item(cart_id, food_id, quantity, expires_at, increment=False):
+    """Set (or with increment, add to) one cart line and extend the cart's expiry
+
+    A resulting quantity of zero or less removes the line. Lines of an
+    already expired cart are dropped first.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('''
+            DELETE FROM cart_items WHERE cart_id = ?
+            AND cart_id IN (SELECT id FROM carts WHERE id = ? AND expires_at <= ?)
+        ''', (cart_id, cart_id, time.time()))
+        cursor.execute('''
+            INSERT INTO carts (id, expires_at) VALUES (?, ?)
+            ON CONFLICT(id) DO UPDATE SET expires_at = excluded.expires_at
+        ''', (cart_id, expires_at))
+        cursor.execute('''
+            INSERT INTO cart_items (cart_id, food_id, quantity) VALUES (?, ?, ?)
+            ON CONFLICT(cart_id, food_id) DO UPDATE SET quantity = {}
+        '''.format('quantity + excluded.quantity' if increment else 'excluded.quantity'),
+            (cart_id, food_id, quantity))
+        cursor.execute('DELETE FROM cart_items WHERE cart_id = ? AND food_id = ? AND quantity <= 0',
+                       (cart_id, food_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+@retry_on_busy
+def delete_cart(cart_id):
+    """Remove a cart and all its lines"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM cart_items WHERE cart_id = ?', (cart_id,))
+    cursor.execute('DELETE FROM carts WHERE id = ?', (cart_id,))
+    conn.commit()
+    conn.close()
+
+
+@retry_on_busy
+def purge_expired_carts(now):
+    """Delete every cart that expired before now; returns how many"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        DELETE FROM cart_items
+        WHERE cart_id IN (SELECT id FROM carts WHERE expires_at <= ?)
+    ''', (now,))
+    cursor.execute('DELETE FROM carts WHERE expires_at <= ?', (now,))
+    purged = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return purged
+
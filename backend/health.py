@@ -0,0 +1,83 @@
+"""
+Foodzz Health Checks
+Readiness probe: database latency, write-lock wait, disk space, pool
+saturation and cache warmness against configurable thresholds
+"""
+
+import os
+import shutil
+import sqlite3
+import time
+
+from connectiondb import DB_PATH, get_pool, probe_database
+
+# Readiness thresholds; any one exceeded marks the worker unready
+READY_MAX_QUERY_MS = float(os.environ.get('FOODZZ_READY_MAX_QUERY_MS', '250'))
+READY_MAX_LOCK_WAIT_MS = float(os.environ.get('FOODZZ_READY_MAX_LOCK_WAIT_MS', '1000'))
+READY_MIN_FREE_MB = float(os.environ.get('FOODZZ_READY_MIN_FREE_MB', '100'))
+# Connections in use as a multiple of the pool size (above 1 means overflow)
+READY_MAX_POOL_USAGE = float(os.environ.get('FOODZZ_READY_MAX_POOL_USAGE', '1.5'))
+
+
+def _check(ok, **details):
+    return dict(details, ok=ok)
+
+
+def check_database():
+    try:
+        query_ms, lock_wait_ms = probe_database(READY_MAX_LOCK_WAIT_MS)
+    except sqlite3.Error as e:
+        return _check(False, error=str(e))
+    return _check(
+        query_ms <= READY_MAX_QUERY_MS and lock_wait_ms <= READY_MAX_LOCK_WAIT_MS,
+        query_ms=round(query_ms, 3),
+        lock_wait_ms=round(lock_wait_ms, 3),
+        max_query_ms=READY_MAX_QUERY_MS,
+        max_lock_wait_ms=READY_MAX_LOCK_WAIT_MS,
+    )
+
+
+def check_disk():
+    directory = DB_PATH.parent
+    free_mb = shutil.disk_usage(directory).free / (1024 * 1024)
+    writable = os.access(directory, os.W_OK)
+    return _check(
+        writable and free_mb >= READY_MIN_FREE_MB,
+        free_mb=round(free_mb, 1),
+        min_free_mb=READY_MIN_FREE_MB,
+        writable=writable,
+    )
+
+
+def check_pool():
+    stats = get_pool().stats()
+    usage = stats['in_use'] / stats['size'] if stats['size'] else 0.0
+    return _check(usage <= READY_MAX_POOL_USAGE, usage=round(usage, 3),
+                  max_usage=READY_MAX_POOL_USAGE, **stats)
+
+
+def check_caches(menu_cache):
+    # A stale cache reloads on the next read; one never loaded means the
+    # worker skipped warm-up and its first requests would pay for it
+    stats = menu_cache.stats()
+    loaded = stats['version'] is not None
+    return _check(loaded, loaded=loaded, fresh=menu_cache.is_fresh(), **stats)
+
+
+def readiness(menu_cache):
+    """Run every check; returns (ready, report)"""
+    started = time.perf_counter()
+    checks = {
+        'database': check_database(),
+        'disk': check_disk(),
+        'pool': check_pool(),
+        'cache': check_caches(menu_cache),
+    }
+    failing = sorted(name for name, result in checks.items() if not result['ok'])
+    report = {
+        'status': 'unready' if failing else 'ready',
+        'failing': failing,
+        'checks': checks,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+    }
+    return not failing, report
@@ -0,0 +1,87 @@
+"""
+Foodzz Checkout Idempotency
+Idempotency-Key index: a repeated checkout gets the original response
+instead of a second order
+
+Keys are stored in idempotency_keys in the same transaction as the order
+they produced (see connectiondb.create_order), so a key is never recorded
+without its order or the other way round. Recorded keys never change, so
+each worker also keeps recently seen ones in memory and answers repeats
+without touching the database.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from connectiondb import get_idempotency_record, purge_expired_idempotency_keys
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+# Seconds a key is honoured after its order was placed
+IDEMPOTENCY_TTL = float(os.environ.get('FOODZZ_IDEMPOTENCY_TTL', str(24 * 3600)))
+# Keys remembered in memory per worker; least recently used go first
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('FOODZZ_IDEMPOTENCY_CACHE_SIZE', '10000'))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# How often expired keys are swept from the database
+PURGE_INTERVAL = 600
+
+
+def request_fingerprint(data):
+    """Stable hash of a request body, to catch a key reused for another request"""
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class IdempotencyIndex:
+    """Recorded checkout keys: memory LRU in front of the idempotency_keys table"""
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL, max_keys=IDEMPOTENCY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._records = OrderedDict()  # key -> record
+        self._next_purge = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        """Return the record for a key ({request_hash, order_id, response}), or None"""
+        now = time.time()
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None and record['expires_at'] > now:
+                self._records.move_to_end(key)
+                self.hits += 1
+                return record
+        self.misses += 1
+        record = get_idempotency_record(key, now)
+        if record is not None:
+            self._remember(key, record)
+        return record
+
+    def _remember(self, key, record):
+        with self._lock:
+            self._records[key] = record
+            self._records.move_to_end(key)
+            while len(self._records) > self.max_keys:
+                self._records.popitem(last=False)
+
+    def new_entry(self, key, request_hash, response):
+        """The idempotency argument for connectiondb.create_order"""
+        now = time.time()
+        self._maybe_purge(now)
+        return key, request_hash, response, now + self.ttl
+
+    def _maybe_purge(self, now):
+        if now >= self._next_purge:
+            self._next_purge = now + PURGE_INTERVAL
+            purge_expired_idempotency_keys(now)
+
+    def stats(self):
+        return {"keys": len(self._records), "hits": self.hits, "misses": self.misses}
+
+
+idempotency_index = IdempotencyIndex()
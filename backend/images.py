@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Foodzz Image Pipeline
+Builds size-bounded WebP/AVIF variants of menu images
+
+Needs Pillow (AVIF requires Pillow 11.2+ or pillow-avif-plugin). Without
+Pillow uploads are stored as-is and no variants are produced.
+
+Usage: python images.py [--force]   convert every existing menu image
+"""
+
+import os
+import sys
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+IMAGES_DIR = Path(__file__).parent.parent / 'static' / 'images'
+
+# Longest edge in pixels for each variant
+VARIANT_SIZES = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1200,
+}
+
+# Encoder settings per output format
+FORMAT_OPTIONS = {
+    'avif': {'format': 'AVIF', 'quality': 55, 'speed': 8},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+}
+
+
+def available_formats():
+    """Output formats the installed Pillow can encode, best first"""
+    if Image is None:
+        return []
+    formats = []
+    for name in FORMAT_OPTIONS:
+        try:
+            supported = features.check(name)
+        except ValueError:
+            supported = False
+        if not supported and name == 'avif':
+            try:
+                import pillow_avif  # noqa: F401  registers the AVIF plugin
+                supported = True
+            except ImportError:
+                pass
+        if supported:
+            formats.append(name)
+    return formats
+
+
+def variant_filename(source_name, variant, fmt):
+    """Name of one variant file, e.g. burger.png -> burger-card.webp"""
+    return f"{Path(source_name).stem}-{variant}.{fmt}"
+
+
+def generate_variants(source_path, output_dir=None):
+    """Write every size/format variant of an image next to it
+
+    Returns {variant: {"width": px, "height": px, <fmt>: filename, ...}},
+    or None when Pillow or every modern encoder is unavailable. Raises
+    ValueError if the file is not an image Pillow can read.
+    """
+    formats = available_formats()
+    if not formats:
+        return None
+    source_path = Path(source_path)
+    output_dir = Path(output_dir) if output_dir else source_path.parent
+
+    try:
+        original = Image.open(source_path)
+    except OSError:
+        raise ValueError(f"Not a readable image: {source_path.name}")
+
+    with original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode in ('LA', 'P'):
+            image = image.convert('RGBA')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+
+        variants = {}
+        for variant, max_edge in VARIANT_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            entry = {"width": resized.width, "height": resized.height}
+            for fmt in formats:
+                name = variant_filename(source_path.name, variant, fmt)
+                resized.save(output_dir / name, **FORMAT_OPTIONS[fmt])
+                entry[fmt] = name
+            variants[variant] = entry
+    return variants
+
+
+def remove_variants(variants, output_dir=IMAGES_DIR):
+    """Delete the files listed in a variants mapping"""
+    for entry in (variants or {}).values():
+        for fmt in FORMAT_OPTIONS:
+            name = entry.get(fmt)
+            if name:
+                path = Path(output_dir) / name
+                if path.exists():
+                    os.remove(path)
+
+
+def convert_library(force=False, images_dir=IMAGES_DIR):
+    """Generate variants for every food whose image has none yet
+
+    Returns (converted, skipped, missing) counts.
+    """
+    from connectiondb import get_all_foods, set_food_image_variants
+
+    if not available_formats():
+        raise RuntimeError("Pillow with WebP or AVIF support is required")
+
+    converted = skipped = missing = 0
+    for food in get_all_foods():
+        if not food['image'] or (food.get('image_variants') and not force):
+            skipped += 1
+            continue
+        source = Path(images_dir) / food['image']
+        if not source.exists():
+            print(f"⚠ {food['name']}: {food['image']} not found")
+            missing += 1
+            continue
+        set_food_image_variants(food['id'], generate_variants(source, images_dir))
+        converted += 1
+        print(f"✓ {food['name']}: variants written for {food['image']}")
+    return converted, skipped, missing
+
+
+def main(argv):
+    converted, skipped, missing = convert_library(force='--force' in argv)
+    print(f"✓ {converted} converted, {skipped} skipped, {missing} missing")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,131 @@
+"""
+Foodzz Menu Cache
+Keeps the serialized menu in memory until a menu write bumps its data version
+"""
+
+import threading
+from collections import OrderedDict
+
+from connectiondb import fts_query, get_all_foods, get_featured_food_ids, get_data_version, search_foods
+from serializer import dumps
+
+# Distinct search result pages kept per menu version
+SEARCH_CACHE_SIZE = 512
+
+
+class MenuCache:
+    """Versioned, pre-serialized copy of the foods catalog and featured list
+
+    Every read compares the cached version with the 'menu' data version in
+    connectiondb. Writes through add_food_item, update_food_item,
+    delete_food_item and set_featured bump that version, so the next read
+    reloads from the database; every other read is served from memory.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._catalog = None
+        self._items = {}
+        self._foods = {}
+        self._featured = None
+        self._searches = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _ensure_fresh(self):
+        version = get_data_version('menu')
+        if self._version == version:
+            self.hits += 1
+            return
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            version = get_data_version('menu')
+            if self._version == version:
+                self.hits += 1
+                return
+            self.misses += 1
+            # Read the version before loading: a write that lands mid-load
+            # bumps it again and forces another reload on the next read.
+            foods = get_all_foods()
+            featured = get_featured_food_ids()
+            self._foods = {food['id']: food for food in foods}
+            self._items = {food['id']: dumps(food) for food in foods}
+            self._catalog = dumps(foods)
+            self._featured = dumps({"featured": featured})
+            self._searches = OrderedDict()
+            self._version = version
+
+    def is_fresh(self):
+        """True if the next read will be served from memory"""
+        return self._version == get_data_version('menu')
+
+    @property
+    def version(self):
+        """Menu data version the cached payloads were built from"""
+        self._ensure_fresh()
+        return self._version
+
+    def catalog(self):
+        """Return the serialized list of all foods"""
+        self._ensure_fresh()
+        return self._catalog
+
+    def item(self, food_id):
+        """Return one serialized food, or None if it does not exist"""
+        self._ensure_fresh()
+        return self._items.get(food_id)
+
+    def food(self, food_id):
+        """Return one food as a dict (treat as read-only), or None"""
+        self._ensure_fresh()
+        return self._foods.get(food_id)
+
+    def featured(self):
+        """Return the serialized featured-IDs payload"""
+        self._ensure_fresh()
+        return self._featured
+
+    def search(self, text, category=None, limit=20, offset=0):
+        """Return a serialized search results page (see connectiondb.search_foods)
+
+        Pages are cached until the menu changes; queries that differ only
+        in case or punctuation share an entry.
+        """
+        self._ensure_fresh()
+        version = self._version
+        key = (fts_query(text or ''), category, limit, offset)
+        with self._lock:
+            payload = self._searches.get(key)
+            if payload is not None:
+                self._searches.move_to_end(key)
+                return payload
+        foods, total, facets = search_foods(text, category=category, limit=limit, offset=offset)
+        payload = dumps({"results": foods, "total": total, "facets": {"category": facets}})
+        with self._lock:
+            # Don't file results under a newer version than they were read at
+            if self._version == version:
+                self._searches[key] = payload
+                if len(self._searches) > SEARCH_CACHE_SIZE:
+                    self._searches.popitem(last=False)
+        return payload
+
+    def invalidate(self):
+        """Drop the cached payloads so the next read reloads them"""
+        with self._lock:
+            self._version = None
+
+    def stats(self):
+        """Return hit/miss counters for the cache"""
+        total = self.hits + self.misses
+        return {
+            "version": self._version,
+            "items": len(self._items),
+            "searches": len(self._searches),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+menu_cache = MenuCache()
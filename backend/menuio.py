@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Foodzz Menu Import/Export
+Bulk menu transfer as CSV or NDJSON, streamed in both directions
+
+Usage: python menuio.py export [--format csv|ndjson] [--output FILE]
+       python menuio.py import FILE [--format csv|ndjson] [--images DIR_OR_ZIP]
+
+Imports are read and validated one row at a time and written in
+transactions of FOODZZ_IMPORT_BATCH_SIZE rows, so memory stays flat
+whatever the file size. A row with an id updates that food, one without
+adds a new food; invalid rows are skipped and reported by line. Image
+names resolve against a directory or zip archive (and are copied into
+static/images under their content hash), else against images already
+stored there. Exports read the menu in id-ordered batches.
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import math
+import os
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+from werkzeug.utils import secure_filename
+
+from connectiondb import bump_data_version, get_foods_after, import_food_batch, set_food_image_variants
+from images import IMAGES_DIR, available_formats, generate_variants
+from serializer import dumps
+from uploads import (
+    CHUNK_SIZE, IMAGE_SIGNATURES, MAX_UPLOAD_BYTES, SIGNATURE_BYTES, StagedUpload, UploadError, check_signature
+)
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+# Content types accepted for import besides the ones above
+FORMAT_ALIASES = {
+    'application/csv': 'csv',
+    'application/jsonl': 'ndjson',
+    'application/x-jsonlines': 'ndjson',
+}
+EXPORT_COLUMNS = ('id', 'name', 'description', 'price', 'category', 'image', 'featured')
+EXPORT_BATCH_SIZE = 500
+IMPORT_BATCH_SIZE = int(os.environ.get('FOODZZ_IMPORT_BATCH_SIZE', '500'))
+# Largest import body accepted over HTTP
+IMPORT_MAX_BYTES = int(float(os.environ.get('FOODZZ_IMPORT_MAX_MB', '64')) * 1024 * 1024)
+# Directories and zip archives named by the import API's images parameter live here
+IMPORT_IMAGES_ROOT = Path(os.environ.get('FOODZZ_IMPORT_IMAGES_ROOT', Path(__file__).parent.parent / 'imports'))
+# Row errors listed in an import summary; the rest are only counted
+IMPORT_MAX_ERRORS = 100
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'no', 'n'}
+
+
+def import_format(requested=None, mimetype=None):
+    """Format name for an import, from ?format= or the Content-Type; raises ValueError"""
+    fmt = requested or FORMAT_ALIASES.get(mimetype) or next(
+        (name for name, known in FORMATS.items() if known == mimetype), None
+    )
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {requested or mimetype or 'none given'}; use csv or ndjson")
+    return fmt
+
+
+def import_images_path(name):
+    """Resolve the import API's images parameter inside IMPORT_IMAGES_ROOT; raises ValueError"""
+    if not name:
+        return None
+    root = IMPORT_IMAGES_ROOT.resolve()
+    path = (root / name).resolve()
+    if not path.is_relative_to(root) or not path.exists():
+        raise ValueError(f"Image source not found: {name}")
+    return path
+
+
+def export_foods(fmt='csv', batch_size=EXPORT_BATCH_SIZE):
+    """Yield the whole menu as CSV or NDJSON text, one batch of foods per chunk"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if fmt == 'csv':
+        writer.writerow(EXPORT_COLUMNS)
+    after_id = 0
+    while True:
+        foods = get_foods_after(after_id, batch_size)
+        if not foods:
+            break
+        after_id = foods[-1]['id']
+        for food in foods:
+            if fmt == 'csv':
+                writer.writerow([int(food[c]) if c == 'featured' else food[c] for c in EXPORT_COLUMNS])
+            else:
+                food['featured'] = bool(food['featured'])
+                buffer.write(dumps(food).decode('utf-8'))
+                buffer.write('\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def read_records(stream, fmt):
+    """Yield (line, record, error) for each row of a binary CSV/NDJSON stream
+
+    record is a dict, or None with error set when the line can't be parsed.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            record.pop(None, None)  # cells beyond the header
+            yield reader.line_num, record, None
+        return
+    for line, raw in enumerate(text, 1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as e:
+            yield line, None, f"Invalid JSON: {e}"
+            continue
+        if isinstance(record, dict):
+            yield line, record, None
+        else:
+            yield line, None, "Expected a JSON object"
+
+
+def _text(record, key):
+    value = record.get(key)
+    return '' if value is None else str(value).strip()
+
+
+def food_from_record(record):
+    """Validate one import row; returns the import_food_batch tuple or raises ValueError
+
+    Required fields match the admin form: name, description, price, category.
+    """
+    food_id = _text(record, 'id')
+    if food_id:
+        try:
+            food_id = int(food_id)
+        except ValueError:
+            raise ValueError(f"Invalid id: {food_id}")
+        if food_id < 1:
+            raise ValueError(f"Invalid id: {food_id}")
+    else:
+        food_id = None
+
+    name, description, category = _text(record, 'name'), _text(record, 'description'), _text(record, 'category')
+    price = _text(record, 'price')
+    missing = [field for field, value in (('name', name), ('description', description), ('price', price),
+                                          ('category', category)) if not value]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    try:
+        price = float(price)
+    except ValueError:
+        raise ValueError(f"Invalid price: {price}")
+    if not math.isfinite(price) or price < 0:
+        raise ValueError(f"Invalid price: {price}")
+
+    featured = _text(record, 'featured').lower()
+    if featured in TRUE_VALUES:
+        featured = True
+    elif featured in FALSE_VALUES:
+        featured = False
+    elif featured:
+        raise ValueError(f"Invalid featured flag: {featured}")
+    else:
+        featured = None
+
+    return food_id, name, description, price, category, _text(record, 'image') or None, featured
+
+
+class ImageResolver:
+    """Turns image references from import rows into stored file names
+
+    A reference is looked up in the source (a directory or zip archive)
+    first and copied into the upload folder under its content hash, with
+    the same type checks as uploads; otherwise it must name a file already
+    stored there. Each distinct reference is resolved once per import.
+    """
+
+    def __init__(self, upload_dir=IMAGES_DIR, source=None):
+        self.upload_dir = Path(upload_dir)
+        self.source = Path(source) if source else None
+        self._zip = zipfile.ZipFile(self.source) if self.source and zipfile.is_zipfile(self.source) else None
+        self._resolved = {}
+        self.stored = set()  # file names this import wrote
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+
+    def resolve(self, reference):
+        """Stored file name for a reference; raises ValueError if it can't be found or isn't an image"""
+        if reference not in self._resolved:
+            self._resolved[reference] = self._resolve(reference)
+        filename = self._resolved[reference]
+        if isinstance(filename, ValueError):
+            raise filename
+        return filename
+
+    def _resolve(self, reference):
+        try:
+            source = self._open_source(reference)
+            if source is not None:
+                with source:
+                    return self._store(reference, source)
+        except (UploadError, OSError, zipfile.BadZipFile) as e:
+            return ValueError(f"Image {reference}: {e}")
+        except ValueError as e:
+            return e
+        if reference == secure_filename(reference) and (self.upload_dir / reference).is_file():
+            return reference
+        return ValueError(f"Image not found: {reference}")
+
+    def _open_source(self, reference):
+        if self._zip is not None:
+            try:
+                return self._zip.open(reference.lstrip('/'))
+            except KeyError:
+                return None
+        if self.source is not None:
+            root = self.source.resolve()
+            path = (root / reference).resolve()
+            if path.is_relative_to(root) and path.is_file():
+                return open(path, 'rb')
+        return None
+
+    def _store(self, reference, source):
+        extension = reference.rsplit('.', 1)[-1].lower() if '.' in reference else ''
+        if extension not in IMAGE_SIGNATURES:
+            raise ValueError(f"Image {reference}: only PNG, JPG, JPEG, GIF allowed")
+        upload = StagedUpload(self.upload_dir, 'image', secure_filename(reference), extension)
+        try:
+            head = b''
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if upload.size + len(chunk) > MAX_UPLOAD_BYTES:
+                    raise ValueError(f"Image {reference} exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit")
+                if len(head) < SIGNATURE_BYTES:
+                    head += chunk[:SIGNATURE_BYTES - len(head)]
+                upload.write(chunk)
+            if upload.size == 0:
+                raise ValueError(f"Image {reference} is empty")
+            check_signature(head, extension)
+        except BaseException:
+            upload.discard()
+            raise
+        filename, created = upload.commit()
+        if created:
+            self.stored.add(filename)
+        return filename
+
+
+def import_foods(stream, fmt, images=None, upload_dir=IMAGES_DIR, batch_size=IMPORT_BATCH_SIZE):
+    """Import foods from a binary CSV/NDJSON stream in batched transactions
+
+    Returns (summary, new_images): summary counts inserted, updated and
+    failed rows and lists the first IMPORT_MAX_ERRORS errors;
+    new_images is [(food_id, filename)] for images this import stored,
+    which still need variants.
+    """
+    summary = {"inserted": 0, "updated": 0, "failed": 0, "batches": 0, "errors": []}
+    new_images = []
+    resolver = ImageResolver(upload_dir, images)
+    batch = []  # (line, food)
+
+    def fail(line, message):
+        summary['failed'] += 1
+        if len(summary['errors']) < IMPORT_MAX_ERRORS:
+            summary['errors'].append({"line": line, "error": message})
+
+    def flush():
+        ids = import_food_batch([food for _, food in batch])
+        summary['batches'] += 1
+        for (line, food), food_id in zip(batch, ids):
+            if food_id is None:
+                fail(line, f"Food {food[0]} not found")
+                continue
+            summary['updated' if food[0] is not None else 'inserted'] += 1
+            if food[5] in resolver.stored:
+                new_images.append((food_id, food[5]))
+        batch.clear()
+
+    try:
+        for line, record, error in read_records(stream, fmt):
+            if error is None:
+                try:
+                    food = food_from_record(record)
+                    if food[5] is not None:
+                        food = food[:5] + (resolver.resolve(food[5]),) + food[6:]
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                fail(line, error)
+                continue
+            batch.append((line, food))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    except (csv.Error, UnicodeDecodeError) as e:
+        # The rest of the file can't be read reliably; keep what was committed
+        summary['errors'].append({"line": None, "error": f"Unreadable input: {e}"})
+    finally:
+        resolver.close()
+        if summary['batches']:
+            bump_data_version('menu')
+    return summary, new_images
+
+
+def build_variants(new_images, upload_dir=IMAGES_DIR):
+    """Background job: resized variants for imported images, one pass per distinct file"""
+    variants = {}
+    unreadable = set()
+    for food_id, filename in new_images:
+        if filename in unreadable:
+            continue
+        if filename not in variants:
+            try:
+                variants[filename] = generate_variants(Path(upload_dir) / filename, upload_dir)
+            except ValueError:
+                unreadable.add(filename)
+                continue
+        set_food_image_variants(food_id, variants[filename])
+    if unreadable:
+        raise ValueError(f"No variants for unreadable images: {', '.join(sorted(unreadable))}")
+
+
+def _format_from_name(path, fmt):
+    if fmt:
+        return fmt
+    suffix = Path(path).suffix.lower().lstrip('.')
+    return 'ndjson' if suffix in ('ndjson', 'jsonl') else 'csv'
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help='write the menu to a file or stdout')
+    export_parser.add_argument('--format', choices=FORMATS, help='default: from the file name, else csv')
+    export_parser.add_argument('--output', help='file to write instead of stdout')
+    import_parser = commands.add_parser('import', help='add or update foods from a file')
+    import_parser.add_argument('file')
+    import_parser.add_argument('--format', choices=FORMATS, help='default: from the file name')
+    import_parser.add_argument('--images', help='directory or zip archive the image names refer to')
+    import_parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='rows per transaction')
+    args = parser.parse_args(argv)
+
+    from connectiondb import init_db
+    # Keep stdout clean for exports written there
+    with contextlib.redirect_stdout(sys.stderr):
+        init_db()
+    started = time.perf_counter()
+    if args.command == 'export':
+        fmt = _format_from_name(args.output or '', args.format)
+        output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+        try:
+            for chunk in export_foods(fmt):
+                output.write(chunk)
+        finally:
+            if args.output:
+                output.close()
+        if args.output:
+            print(f"✓ Menu exported to {args.output} in {time.perf_counter() - started:.1f}s")
+        return 0
+
+    with open(args.file, 'rb') as stream:
+        summary, new_images = import_foods(stream, _format_from_name(args.file, args.format), args.images,
+                                           batch_size=args.batch_size)
+    for error in summary['errors']:
+        print(f"⚠ line {error['line']}: {error['error']}")
+    if new_images and available_formats():
+        build_variants(new_images)
+    print(f"✓ {summary['inserted']} added, {summary['updated']} updated, {summary['failed']} failed "
+          f"in {time.perf_counter() - started:.1f}s")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
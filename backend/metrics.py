@@ -0,0 +1,286 @@
+"""
+Foodzz Metrics
+Per-route latency histograms, per-request SQL accounting and a Prometheus
+text exposition for /api/metrics
+
+Each worker process keeps its own counters and writes a snapshot to
+FOODZZ_METRICS_DIR every few seconds; a scrape merges the snapshots of all
+live workers, so one /api/metrics answer covers the whole server.
+"""
+
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from connectiondb import DB_PATH
+
+# Statements slower than this are logged and counted
+SLOW_SQL_MS = float(os.environ.get('FOODZZ_SLOW_SQL_MS', '100'))
+METRICS_DIR = Path(os.environ.get('FOODZZ_METRICS_DIR', f"{DB_PATH}-metrics"))
+# Seconds between snapshot writes per worker
+FLUSH_INTERVAL = 5.0
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HELP = {
+    'foodzz_http_request_duration_seconds': ('histogram', 'Time to response headers by route'),
+    'foodzz_http_request_queries': ('histogram', 'SQL statements run per request by route'),
+    'foodzz_http_request_db_seconds_total': ('counter', 'Time spent in SQL by route'),
+    'foodzz_db_query_duration_seconds': ('histogram', 'SQL statement execution time'),
+    'foodzz_db_rows_fetched_total': ('counter', 'Rows fetched from SQL results'),
+    'foodzz_db_slow_queries_total': ('counter', f'SQL statements slower than {SLOW_SQL_MS:g} ms'),
+}
+
+
+class RequestStats:
+    """SQL work done on behalf of the current request"""
+
+    __slots__ = ('started', 'queries', 'rows', 'db_seconds')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.rows = 0
+        self.db_seconds = 0.0
+
+
+_current = contextvars.ContextVar('foodzz_request_stats', default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    """Counters, gauges and fixed-bucket histograms keyed by label set"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # name -> {label_key: [bucket counts..., sum, count]}
+        self._counters = {}    # name -> {label_key: value}
+        self._buckets = {}
+        self._gauges = []  # (name, help, read)
+        self._last_flush = 0.0
+
+    def observe(self, name, buckets, value, labels=None):
+        key = _label_key(labels or {})
+        index = bisect_left(buckets, value)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            row = series.get(key)
+            if row is None:
+                self._buckets[name] = buckets
+                row = series[key] = [0] * (len(buckets) + 2)
+            if index < len(buckets):
+                row[index] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def inc(self, name, amount=1, labels=None):
+        key = _label_key(labels or {})
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def add_gauge(self, name, help_text, read):
+        """Register a gauge whose value read() returns at snapshot time"""
+        self._gauges.append((name, help_text, read))
+
+    def snapshot(self):
+        """Plain-data copy of every series, gauges included"""
+        with self._lock:
+            # Label tuples become JSON strings so snapshots can be stored
+            histograms = {name: {json.dumps(k): list(v) for k, v in series.items()}
+                          for name, series in self._histograms.items()}
+            counters = {name: {json.dumps(k): v for k, v in series.items()}
+                        for name, series in self._counters.items()}
+            buckets = dict(self._buckets)
+        gauges = {name: {'help': help_text, 'value': read()} for name, help_text, read in self._gauges}
+        return {'histograms': histograms, 'buckets': buckets, 'counters': counters, 'gauges': gauges}
+
+    def flush(self, force=False):
+        """Write this process's snapshot for other workers' scrapes"""
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        try:
+            METRICS_DIR.mkdir(exist_ok=True)
+            path = METRICS_DIR / f"{os.getpid()}.json"
+            tmp = METRICS_DIR / f".{os.getpid()}.json"
+            tmp.write_text(json.dumps(self.snapshot()))
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠ Metrics snapshot failed: {e}")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect_snapshots(registry):
+    """This process's live snapshot merged with every other live worker's"""
+    registry.flush(force=True)
+    snapshots = []
+    for path in METRICS_DIR.glob('*.json'):
+        pid = int(path.stem) if path.stem.isdigit() else None
+        if pid is None:
+            continue
+        if pid != os.getpid() and not _pid_alive(pid):
+            path.unlink(missing_ok=True)
+            continue
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return snapshots or [registry.snapshot()]
+
+
+def merge(snapshots):
+    """Sum histograms, counters and gauges across process snapshots"""
+    merged = {'histograms': {}, 'buckets': {}, 'counters': {}, 'gauges': {}}
+    for snap in snapshots:
+        merged['buckets'].update(snap['buckets'])
+        for name, series in snap['histograms'].items():
+            target = merged['histograms'].setdefault(name, {})
+            for key, row in series.items():
+                if key in target:
+                    target[key] = [a + b for a, b in zip(target[key], row)]
+                else:
+                    target[key] = list(row)
+        for name, series in snap['counters'].items():
+            target = merged['counters'].setdefault(name, {})
+            for key, value in series.items():
+                target[key] = target.get(key, 0) + value
+        for name, gauge in snap['gauges'].items():
+            target = merged['gauges'].setdefault(name, {'help': gauge['help'], 'value': 0})
+            target['value'] += gauge['value']
+    return merged
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(key, extra=None):
+    pairs = [tuple(pair) for pair in json.loads(key)] + (extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(merged):
+    """Prometheus text exposition format 0.0.4"""
+    lines = []
+    for name in sorted(merged['histograms']):
+        kind, help_text = HELP.get(name, ('histogram', name))
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        buckets = merged['buckets'][name]
+        for key, row in sorted(merged['histograms'][name].items()):
+            cumulative = 0
+            for bound, count in zip(buckets, row):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(key, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(key, [('le', '+Inf')])} {row[-1]}")
+            lines.append(f"{name}_sum{_labels(key)} {_number(row[-2])}")
+            lines.append(f"{name}_count{_labels(key)} {row[-1]}")
+    for name in sorted(merged['counters']):
+        kind, help_text = HELP.get(name, ('counter', name))
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for key, value in sorted(merged['counters'][name].items()):
+            lines.append(f"{name}{_labels(key)} {_number(value)}")
+    for name in sorted(merged['gauges']):
+        gauge = merged['gauges'][name]
+        lines += [f"# HELP {name} {gauge['help']}", f"# TYPE {name} gauge",
+                  f"{name} {_number(gauge['value'])}"]
+    return '\n'.join(lines) + '\n'
+
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class QueryObserver:
+    """connectiondb query observer feeding the registry and request stats"""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def query(self, sql, seconds):
+        self.registry.observe('foodzz_db_query_duration_seconds', LATENCY_BUCKETS, seconds)
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += seconds
+        if seconds * 1000 >= SLOW_SQL_MS:
+            self.registry.inc('foodzz_db_slow_queries_total')
+            statement = _WHITESPACE.sub(' ', sql).strip()[:200]
+            print(f"⚠ Slow SQL ({seconds * 1000:.1f} ms): {statement}")
+
+    def rows(self, count):
+        if count:
+            self.registry.inc('foodzz_db_rows_fetched_total', count)
+            stats = _current.get()
+            if stats is not None:
+                stats.rows += count
+
+
+class Metrics:
+    """Flask extension: times every request and serves nothing itself"""
+
+    def __init__(self, app=None, registry=None):
+        self.registry = registry or Registry()
+        self.observer = QueryObserver(self.registry)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from connectiondb import set_query_observer
+        set_query_observer(self.observer)
+        app.before_request(self._before)
+        app.after_request(self._after)
+
+    def _before(self):
+        from flask import g
+        g.metrics_token = _current.set(RequestStats())
+
+    def _after(self, response):
+        from flask import g, request
+        stats = _current.get()
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        labels = {'method': request.method, 'route': route, 'status': str(response.status_code)}
+        self.registry.observe('foodzz_http_request_duration_seconds', LATENCY_BUCKETS, elapsed, labels)
+        route_labels = {'route': route}
+        self.registry.observe('foodzz_http_request_queries', QUERY_COUNT_BUCKETS, stats.queries, route_labels)
+        if stats.db_seconds:
+            self.registry.inc('foodzz_http_request_db_seconds_total', stats.db_seconds, route_labels)
+        response.headers['Server-Timing'] = (
+            f'app;dur={elapsed * 1000:.2f}, db;dur={stats.db_seconds * 1000:.2f};desc="{stats.queries} queries"'
+        )
+        token = g.pop('metrics_token', None)
+        if token is not None:
+            _current.reset(token)
+        self.registry.flush()
+        return response
+
+    def exposition(self):
+        """Prometheus text for every live worker"""
+        return render(merge(collect_snapshots(self.registry)))
@@ -0,0 +1,521 @@
+"""
+Foodzz Schema Migrations
+Versioned, non-destructive schema upgrades and query-plan checks
+"""
+
+import sqlite3
+import sys
+
+# Sample menu inserted into a brand-new database
+SAMPLE_FOODS = [
+    ('Pizza', 'Delicious cheese pizza with fresh ingredients', 12.99, 'Pizza', 'pizza.png'),
+    ('Burger', 'Beef patty with cheese and veggies', 10.99, 'Burgers', 'burger.png'),
+    ('Fried Chicken', 'Crispy fried chicken pieces', 9.99, 'Chicken', 'fried-chicken.png'),
+    ('Sandwich', 'Fresh sandwich with layers of goodness', 8.99, 'Sandwiches', 'sandwich.png'),
+    ('Spring Roll', 'Crispy spring rolls with dipping sauce', 6.99, 'Appetizers', 'spring-roll.png'),
+    ('Chicken Roll', 'Tender chicken wrapped perfectly', 7.99, 'Rolls', 'chicken-roll.png'),
+    ('Momo', 'Steamed dumplings with filling', 8.49, 'Dumplings', 'momo.png'),
+    ('Spaghetti', 'Classic Italian spaghetti with sauce', 11.99, 'Pasta', 'spaghetti.png'),
+    ('Lasagna', 'Layered pasta with cheese and sauce', 13.99, 'Pasta', 'lasagna.png'),
+    ('Ice Cream', 'Refreshing ice cream dessert', 4.99, 'Desserts', 'icecream.png'),
+]
+
+
+def _initial_schema(cursor):
+    """Base tables; IF NOT EXISTS adopts databases created before migrations"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS foods (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            price REAL NOT NULL,
+            category TEXT,
+            image TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_name TEXT NOT NULL,
+            customer_email TEXT NOT NULL,
+            delivery_address TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            subtotal REAL NOT NULL,
+            tax REAL NOT NULL,
+            delivery_fee REAL NOT NULL,
+            total_price REAL NOT NULL,
+            payment_method TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            food_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            price REAL NOT NULL,
+            FOREIGN KEY (order_id) REFERENCES orders(id),
+            FOREIGN KEY (food_id) REFERENCES foods(id)
+        )
+    ''')
+    cursor.execute('CREATE TABLE IF NOT EXISTS featured (food_id INTEGER PRIMARY KEY)')
+
+    cursor.execute('SELECT COUNT(*) FROM foods')
+    if cursor.fetchone()[0] == 0:
+        cursor.executemany(
+            'INSERT INTO foods (name, description, price, category, image) VALUES (?, ?, ?, ?, ?)',
+            SAMPLE_FOODS
+        )
+
+
+def _order_indexes(cursor):
+    """Indexes behind order listing, status filters and order detail"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders (created_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_status_created_at ON orders (status, created_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items (order_id)')
+
+
+def _order_stats(cursor):
+    """Per-status order counters kept current by triggers on orders"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_stats (
+            status TEXT PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_order_stats_insert AFTER INSERT ON orders
+        BEGIN
+            INSERT INTO order_stats (status, order_count, revenue)
+            VALUES (NEW.status, 1, NEW.total_price)
+            ON CONFLICT (status) DO UPDATE SET
+                order_count = order_count + 1,
+                revenue = revenue + excluded.revenue;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_order_stats_update
+        AFTER UPDATE OF status, total_price ON orders
+        BEGIN
+            UPDATE order_stats
+            SET order_count = order_count - 1, revenue = revenue - OLD.total_price
+            WHERE status = OLD.status;
+            INSERT INTO order_stats (status, order_count, revenue)
+            VALUES (NEW.status, 1, NEW.total_price)
+            ON CONFLICT (status) DO UPDATE SET
+                order_count = order_count + 1,
+                revenue = revenue + excluded.revenue;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_order_stats_delete AFTER DELETE ON orders
+        BEGIN
+            UPDATE order_stats
+            SET order_count = order_count - 1, revenue = revenue - OLD.total_price
+            WHERE status = OLD.status;
+        END
+    ''')
+    rebuild_order_stats(cursor)
+
+
+def rebuild_order_stats(cursor):
+    """Recompute order_stats from scratch with one pass over orders"""
+    cursor.execute('DELETE FROM order_stats')
+    cursor.execute('''
+        INSERT INTO order_stats (status, order_count, revenue)
+        SELECT status, COUNT(*), COALESCE(SUM(total_price), 0)
+        FROM orders GROUP BY status
+    ''')
+
+
+def _order_discount(cursor):
+    """Promotion discount applied to an order"""
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(orders)').fetchall()}
+    if 'discount' not in columns:
+        cursor.execute('ALTER TABLE orders ADD COLUMN discount REAL NOT NULL DEFAULT 0')
+
+
+def _food_image_variants(cursor):
+    """JSON map of resized/re-encoded image files for each food"""
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(foods)').fetchall()}
+    if 'image_variants' not in columns:
+        cursor.execute('ALTER TABLE foods ADD COLUMN image_variants TEXT')
+
+
+def _upload_jobs(cursor):
+    """Status of background image processing jobs, shared by all workers"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS upload_jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'pending',
+            food_id INTEGER,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+
+
+def _carts(cursor):
+    """Server-side carts: one row per cart, one per (cart, food) line"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS carts (
+            id TEXT PRIMARY KEY,
+            expires_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cart_items (
+            cart_id TEXT NOT NULL,
+            food_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY (cart_id, food_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_carts_expires_at ON carts(expires_at)')
+
+
+def _foods_search(cursor):
+    """FTS5 index over food name, description and category
+
+    External-content table: the text lives in foods only, and triggers keep
+    the index in step inside the same transaction as every foods write.
+    """
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS foods_fts USING fts5(
+            name, description, category,
+            content='foods', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_foods_fts_insert AFTER INSERT ON foods
+        BEGIN
+            INSERT INTO foods_fts (rowid, name, description, category)
+            VALUES (NEW.id, NEW.name, NEW.description, NEW.category);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_foods_fts_update
+        AFTER UPDATE OF name, description, category ON foods
+        BEGIN
+            INSERT INTO foods_fts (foods_fts, rowid, name, description, category)
+            VALUES ('delete', OLD.id, OLD.name, OLD.description, OLD.category);
+            INSERT INTO foods_fts (rowid, name, description, category)
+            VALUES (NEW.id, NEW.name, NEW.description, NEW.category);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_foods_fts_delete AFTER DELETE ON foods
+        BEGIN
+            INSERT INTO foods_fts (foods_fts, rowid, name, description, category)
+            VALUES ('delete', OLD.id, OLD.name, OLD.description, OLD.category);
+        END
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_foods_category ON foods (category)')
+    rebuild_foods_search(cursor)
+
+
+def rebuild_foods_search(cursor):
+    """Reindex every food from the foods table"""
+    cursor.execute("INSERT INTO foods_fts (foods_fts) VALUES ('rebuild')")
+
+
+def _archived_order_stats(cursor):
+    """Per-status counters for orders moved to the archive database"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archived_order_stats (
+            status TEXT PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0
+        )
+    ''')
+
+
+def _idempotency_keys(cursor):
+    """Checkout idempotency keys and the response first returned for each"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            request_hash TEXT NOT NULL,
+            order_id INTEGER NOT NULL,
+            response TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys (expires_at)')
+
+
+def _report_rollups(cursor):
+    """Hourly order and daily per-food summaries behind /api/admin/reports
+
+    Triggers keep them current in the same transaction as each order
+    write (a NULL status is filed as ''). There is no delete trigger:
+    archived orders stay in the reports.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_hourly (
+            bucket TEXT NOT NULL,
+            status TEXT NOT NULL,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket, status)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_food_daily (
+            day TEXT NOT NULL,
+            status TEXT NOT NULL,
+            food_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, status, food_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_reports_order_insert AFTER INSERT ON orders
+        BEGIN
+            INSERT INTO report_hourly (bucket, status, order_count, revenue)
+            VALUES (strftime('%Y-%m-%d %H:00:00', NEW.created_at), IFNULL(NEW.status, ''), 1, NEW.total_price)
+            ON CONFLICT (bucket, status) DO UPDATE SET
+                order_count = order_count + 1,
+                revenue = revenue + excluded.revenue;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_reports_item_insert AFTER INSERT ON order_items
+        BEGIN
+            INSERT INTO report_food_daily (day, status, food_id, quantity, revenue)
+            SELECT date(o.created_at), IFNULL(o.status, ''), NEW.food_id, NEW.quantity, NEW.quantity * NEW.price
+            FROM orders o WHERE o.id = NEW.order_id
+            ON CONFLICT (day, status, food_id) DO UPDATE SET
+                quantity = quantity + excluded.quantity,
+                revenue = revenue + excluded.revenue;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_reports_order_update
+        AFTER UPDATE OF status, total_price, created_at ON orders
+        WHEN OLD.status IS NOT NEW.status OR OLD.total_price IS NOT NEW.total_price
+             OR OLD.created_at IS NOT NEW.created_at
+        BEGIN
+            UPDATE report_hourly
+            SET order_count = order_count - 1, revenue = revenue - OLD.total_price
+            WHERE bucket = strftime('%Y-%m-%d %H:00:00', OLD.created_at) AND status = IFNULL(OLD.status, '');
+            INSERT INTO report_hourly (bucket, status, order_count, revenue)
+            VALUES (strftime('%Y-%m-%d %H:00:00', NEW.created_at), IFNULL(NEW.status, ''), 1, NEW.total_price)
+            ON CONFLICT (bucket, status) DO UPDATE SET
+                order_count = order_count + 1,
+                revenue = revenue + excluded.revenue;
+            INSERT INTO report_food_daily (day, status, food_id, quantity, revenue)
+            SELECT date(OLD.created_at), IFNULL(OLD.status, ''), food_id, -SUM(quantity), -SUM(quantity * price)
+            FROM order_items WHERE order_id = OLD.id GROUP BY food_id
+            ON CONFLICT (day, status, food_id) DO UPDATE SET
+                quantity = quantity + excluded.quantity,
+                revenue = revenue + excluded.revenue;
+            INSERT INTO report_food_daily (day, status, food_id, quantity, revenue)
+            SELECT date(NEW.created_at), IFNULL(NEW.status, ''), food_id, SUM(quantity), SUM(quantity * price)
+            FROM order_items WHERE order_id = NEW.id GROUP BY food_id
+            ON CONFLICT (day, status, food_id) DO UPDATE SET
+                quantity = quantity + excluded.quantity,
+                revenue = revenue + excluded.revenue;
+        END
+    ''')
+    rebuild_reports(cursor)
+
+
+def rebuild_reports(cursor, schemas=('main',)):
+    """Recompute the report rollups from the orders tables in each schema
+
+    Pass ('main', 'archive') with the archive database attached to
+    include archived orders.
+    """
+    cursor.execute('DELETE FROM main.report_hourly')
+    cursor.execute('DELETE FROM main.report_food_daily')
+    for schema in schemas:
+        # An order copied to the archive but not yet removed counts once
+        hot_only = '' if schema == 'main' else 'AND o.id NOT IN (SELECT id FROM main.orders)'
+        cursor.execute(f'''
+            INSERT INTO main.report_hourly (bucket, status, order_count, revenue)
+            SELECT strftime('%Y-%m-%d %H:00:00', o.created_at), IFNULL(o.status, ''), COUNT(*), SUM(o.total_price)
+            FROM {schema}.orders o WHERE 1 {hot_only}
+            GROUP BY 1, 2
+            ON CONFLICT (bucket, status) DO UPDATE SET
+                order_count = order_count + excluded.order_count,
+                revenue = revenue + excluded.revenue
+        ''')
+        cursor.execute(f'''
+            INSERT INTO main.report_food_daily (day, status, food_id, quantity, revenue)
+            SELECT date(o.created_at), IFNULL(o.status, ''), oi.food_id, SUM(oi.quantity), SUM(oi.quantity * oi.price)
+            FROM {schema}.order_items oi JOIN {schema}.orders o ON o.id = oi.order_id
+            WHERE 1 {hot_only}
+            GROUP BY 1, 2, 3
+            ON CONFLICT (day, status, food_id) DO UPDATE SET
+                quantity = quantity + excluded.quantity,
+                revenue = revenue + excluded.revenue
+        ''')
+
+
+# (version, description, function) — append only, never edit a shipped entry
+MIGRATIONS = [
+    (1, 'initial schema and sample menu', _initial_schema),
+    (2, 'order indexes', _order_indexes),
+    (3, 'incrementally maintained order stats', _order_stats),
+    (4, 'order discount column', _order_discount),
+    (5, 'food image variants', _food_image_variants),
+    (6, 'upload job status', _upload_jobs),
+    (7, 'server-side carts', _carts),
+    (8, 'full-text menu search', _foods_search),
+    (9, 'archived order stats', _archived_order_stats),
+    (10, 'checkout idempotency keys', _idempotency_keys),
+    (11, 'report rollups', _report_rollups),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """Return the schema version recorded in PRAGMA user_version"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """Apply pending migrations in order, each in its own transaction
+
+    Returns the list of versions applied.
+    """
+    applied = []
+    current = get_schema_version(conn)
+    for version, description, upgrade in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            upgrade(cursor)
+            cursor.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"✓ Migration {version} applied: {description}")
+        applied.append(version)
+    return applied
+
+
+def reset(conn):
+    """Drop all application tables and the recorded schema version"""
+    cursor = conn.cursor()
+    rows = cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()
+    for (name,) in rows:
+        cursor.execute(f'DROP TABLE IF EXISTS "{name}"')
+    cursor.execute('PRAGMA user_version = 0')
+    conn.commit()
+
+
+def query_plan_checks():
+    """Hot queries that must be served by an index, as (name, sql, params, allowed)
+
+    The SQL is the code's own (connectiondb, archive and reports constants);
+    parameters are placeholders. ``allowed`` lists plan lines accepted
+    despite a scan or sort: reads of the small stats and rollup tables, and
+    ranking the FTS matches.
+    """
+    import archive
+    import connectiondb as db
+    import reports
+
+    def orders_page(**filters):
+        where, params = db.orders_page_filter(**filters)
+        return db.ORDERS_PAGE_SQL.format(columns='*', where=where), tuple(params) + (50,)
+
+    cursor = db.encode_order_cursor({'created_at': '2024-01-01 00:00:00', 'id': 1})
+    search = {'source': db.SEARCH_MATCH_SOURCE, 'order': db.SEARCH_MATCH_ORDER}
+    return [
+        ('orders page', *orders_page(), ()),
+        ('orders page after cursor', *orders_page(after=cursor), ()),
+        ('orders page by status', *orders_page(status='pending'), ()),
+        ('orders page by date range', *orders_page(since='2024-01-01', until='2024-02-01'), ()),
+        ('recent orders', db.RECENT_ORDERS_SQL, (), ()),
+        ('order by id', db.ORDER_BY_ID_SQL, (1,), ()),
+        ('order items with food', db.ORDER_ITEMS_SQL, (1,), ()),
+        ('food by id', db.FOOD_BY_ID_SQL, (1,), ()),
+        ('search facets', db.SEARCH_FACETS_SQL.format(**search), ('"pizza"*',),
+         ('USE TEMP B-TREE FOR GROUP BY',)),
+        ('search page', db.SEARCH_PAGE_SQL.format(**search), ('"pizza"*', 20, 0),
+         ('USE TEMP B-TREE FOR ORDER BY',)),
+        ('cart items', db.CART_ITEMS_SQL, ('cart', 0), ()),
+        ('idempotency key', db.IDEMPOTENCY_RECORD_SQL, ('key', 0), ()),
+        ('admin stats by status', db.ADMIN_STATUS_STATS_SQL, (),
+         ('SCAN order_stats', 'SCAN archived_order_stats', 'USE TEMP B-TREE FOR GROUP BY')),
+        ('hourly report rollup', reports.REPORT_HOURLY_SQL, (), ('SCAN report_hourly',)),
+        ('daily food report rollup', reports.REPORT_FOOD_DAILY_SQL, (), ('SCAN report_food_daily',)),
+        ('archivable orders', archive.ARCHIVABLE_ORDERS_SQL,
+         archive.ARCHIVE_STATUSES + ('2024-01-01 00:00:00', 500), ()),
+    ]
+
+
+def plan_problems(detail):
+    """Return a reason if an EXPLAIN QUERY PLAN line is a full scan or sort"""
+    # Subquery results and FTS index lookups are not table scans
+    if detail.startswith('SCAN ') and not detail.startswith('SCAN (') \
+            and ' USING ' not in detail and ' VIRTUAL TABLE INDEX ' not in detail:
+        return 'full table scan'
+    if 'USE TEMP B-TREE' in detail:
+        return 'temporary sort'
+    return None
+
+
+def check_query_plans(conn, checks=None):
+    """EXPLAIN every hot query; return a list of (name, detail, reason) failures"""
+    failures = []
+    for name, sql, params, allowed in checks if checks is not None else query_plan_checks():
+        for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall():
+            detail = row[3]
+            reason = plan_problems(detail)
+            if reason and detail not in allowed:
+                failures.append((name, detail, reason))
+    return failures
+
+
+def main(argv):
+    """Command line: migrate (optionally --reset first), --check-plans or --reconcile-stats"""
+    from connectiondb import DB_PATH, init_db, reconcile_order_stats
+
+    if '--reconcile-stats' in argv:
+        drift = reconcile_order_stats(fix=True)
+        for status, (stored, actual) in drift.items():
+            print(f"✗ {status}: stored {stored}, actual {actual}")
+        print(f"✓ Order stats rebuilt ({len(drift)} status rows had drifted)")
+        return 1 if drift else 0
+
+    if '--check-plans' in argv:
+        # Check against a scratch in-memory copy of the schema, so no data is needed
+        checks = query_plan_checks()
+        conn = sqlite3.connect(':memory:')
+        migrate(conn)
+        failures = check_query_plans(conn, checks)
+        conn.close()
+        for name, detail, reason in failures:
+            print(f"✗ {name}: {reason} ({detail})")
+        if failures:
+            return 1
+        print(f"✓ {len(checks)} query plans use indexes")
+        return 0
+
+    init_db(reset='--reset' in argv)
+    conn = sqlite3.connect(str(DB_PATH))
+    print(f"✓ Schema version {get_schema_version(conn)} at {DB_PATH}")
+    conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,190 @@
+"""
+Foodzz Order Feed
+Pushes new and changed orders plus dashboard counters to admin dashboards
+"""
+
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+
+from connectiondb import add_order_listener, get_orders_by_ids, get_admin_stats, get_data_version
+
+# Number of past events kept so reconnecting dashboards can catch up
+FEED_BACKLOG = int(os.environ.get('FOODZZ_FEED_BACKLOG', '256'))
+# Seconds between keep-alive comments on idle streams
+FEED_HEARTBEAT = float(os.environ.get('FOODZZ_FEED_HEARTBEAT', '15'))
+# Seconds between checks for orders written by other worker processes
+FEED_POLL_INTERVAL = float(os.environ.get('FOODZZ_FEED_POLL_INTERVAL', '1'))
+
+
+class OrderFeed:
+    """Fan-out of order changes to any number of stream subscribers
+
+    Writers only record the changed order ID. A single publisher thread
+    coalesces pending IDs, loads those orders and the stats once, and
+    appends one event that every subscriber reads from memory, so database
+    work grows with the write rate rather than the number of open tabs.
+
+    Orders written by other worker processes only show up as a moved
+    'orders' data version; the publisher polls for that and tells
+    subscribers to resync.
+    """
+
+    def __init__(self, backlog=FEED_BACKLOG):
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=backlog)
+        self._pending = set()
+        self._last_id = 0
+        self._subscribers = 0
+        self._publisher = None
+        self._waiters = set()  # (event loop, asyncio.Event) per async subscriber
+        self._seen_version = get_data_version('orders')
+
+    @property
+    def last_id(self):
+        """ID of the most recent event"""
+        return self._last_id
+
+    @property
+    def subscribers(self):
+        """Number of currently connected streams"""
+        return self._subscribers
+
+    def order_changed(self, order_id):
+        """Listener hook: queue an order for the next event"""
+        with self._cond:
+            # Only a version exactly one ahead is ours alone; anything else
+            # is left for the publisher's poll to turn into a resync
+            version = get_data_version('orders')
+            if version == self._seen_version + 1:
+                self._seen_version = version
+            if not self._subscribers:
+                return
+            self._pending.add(order_id)
+            self._cond.notify_all()
+
+    def _publish_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    if not self._cond.wait(FEED_POLL_INTERVAL):
+                        self._check_foreign_writes()
+                order_ids, self._pending = self._pending, set()
+            try:
+                payload = {
+                    "orders": get_orders_by_ids(order_ids),
+                    "stats": get_admin_stats(),
+                }
+            except Exception as e:
+                print(f"⚠ Order feed publish failed: {e}")
+                continue
+            with self._cond:
+                self._append('orders', json.dumps(payload, sort_keys=True))
+
+    def _append(self, name, data):
+        # Caller holds self._cond
+        self._last_id += 1
+        self._events.append((self._last_id, name, data))
+        self._cond.notify_all()
+        for loop, wakeup in self._waiters:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:  # loop already closed
+                pass
+
+    def _check_foreign_writes(self):
+        # Caller holds self._cond
+        version = get_data_version('orders')
+        if version != self._seen_version:
+            self._seen_version = version
+            if self._subscribers:
+                self._append('resync', '{}')
+
+    def _ensure_publisher(self):
+        if self._publisher is None or not self._publisher.is_alive():
+            self._seen_version = get_data_version('orders')
+            self._publisher = threading.Thread(
+                target=self._publish_loop, name='foodzz-order-feed', daemon=True
+            )
+            self._publisher.start()
+
+    def events_after(self, event_id, timeout):
+        """Wait up to timeout seconds for events newer than event_id
+
+        Returns a list of (id, name, data) events, or None if event_id has fallen
+        out of the backlog and the subscriber must reload its state.
+        """
+        with self._cond:
+            if event_id > self._last_id:
+                return None
+            if self._last_id == event_id:
+                self._cond.wait_for(lambda: self._last_id > event_id, timeout)
+            if self._events and self._events[0][0] > event_id + 1:
+                return None
+            return [event for event in self._events if event[0] > event_id]
+
+    def _subscribe(self, last_event_id):
+        with self._cond:
+            self._subscribers += 1
+            self._ensure_publisher()
+            return self._last_id if last_event_id is None else last_event_id
+
+    def _unsubscribe(self):
+        with self._cond:
+            self._subscribers -= 1
+
+    def _format(self, cursor, events):
+        """Turn an events_after() result into SSE text; returns (cursor, text)"""
+        if events is None:
+            cursor = self._last_id
+            return cursor, f"id: {cursor}\nevent: resync\ndata: {{}}\n\n"
+        if not events:
+            return cursor, ": keep-alive\n\n"
+        text = ''.join(f"id: {event_id}\nevent: {name}\ndata: {data}\n\n" for event_id, name, data in events)
+        return events[-1][0], text
+
+    def stream(self, last_event_id=None):
+        """Yield Server-Sent Events for one subscriber"""
+        cursor = self._subscribe(last_event_id)
+        try:
+            yield f"retry: 3000\nid: {cursor}\nevent: hello\ndata: {{}}\n\n"
+            while True:
+                cursor, text = self._format(cursor, self.events_after(cursor, FEED_HEARTBEAT))
+                yield text
+        finally:
+            self._unsubscribe()
+
+    async def astream(self, last_event_id=None):
+        """Async twin of stream() for the ASGI server
+
+        Waits on an asyncio.Event the publisher sets, so an idle subscriber
+        holds no thread.
+        """
+        wakeup = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), wakeup)
+        with self._cond:
+            self._waiters.add(waiter)
+        cursor = self._subscribe(last_event_id)
+        try:
+            yield f"retry: 3000\nid: {cursor}\nevent: hello\ndata: {{}}\n\n"
+            while True:
+                wakeup.clear()
+                events = self.events_after(cursor, 0)
+                if events == []:
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), FEED_HEARTBEAT)
+                        continue
+                    except asyncio.TimeoutError:
+                        pass
+                cursor, text = self._format(cursor, events)
+                yield text
+        finally:
+            with self._cond:
+                self._waiters.discard(waiter)
+            self._unsubscribe()
+
+
+order_feed = OrderFeed()
+add_order_listener(order_feed.order_changed)
@@ -0,0 +1,138 @@
+"""
+Foodzz Pricing Engine
+Authoritative checkout totals from an in-memory price table, in integer cents
+"""
+
+import json
+import os
+import threading
+
+from connectiondb import get_all_foods, get_data_version
+
+# Tax and delivery rules (cents and basis points; 800 bp = 8%)
+TAX_RATE_BP = int(os.environ.get('FOODZZ_TAX_RATE_BP', '800'))
+DELIVERY_FEE_CENTS = int(os.environ.get('FOODZZ_DELIVERY_FEE_CENTS', '500'))
+FREE_DELIVERY_THRESHOLD_CENTS = int(os.environ.get('FOODZZ_FREE_DELIVERY_THRESHOLD_CENTS', '3000'))
+
+# Promotions as a JSON list, e.g.
+# [{"code": "WELCOME10", "percent_off": 10, "min_subtotal_cents": 2000},
+#  {"code": "FLAT5", "amount_off_cents": 500}]
+PROMOTIONS_JSON = os.environ.get('FOODZZ_PROMOTIONS', '[]')
+
+
+class PricingError(ValueError):
+    """Raised when a cart cannot be priced (unknown food, bad promo code)"""
+
+
+def to_cents(amount):
+    """Convert a dollar float from the database to integer cents"""
+    return int(round(amount * 100))
+
+
+def to_dollars(cents):
+    """Convert integer cents back to a dollar float for JSON responses"""
+    return cents / 100
+
+
+def _percent_of(cents, basis_points):
+    # Round half up without going through floats
+    return (cents * basis_points + 5000) // 10000
+
+
+class Promotion:
+    """A promo code worth a percentage or a fixed amount off the subtotal"""
+
+    __slots__ = ('code', 'percent_off', 'amount_off_cents', 'min_subtotal_cents')
+
+    def __init__(self, code, percent_off=0, amount_off_cents=0, min_subtotal_cents=0):
+        self.code = code.upper()
+        self.percent_off = percent_off
+        self.amount_off_cents = int(amount_off_cents)
+        self.min_subtotal_cents = int(min_subtotal_cents)
+
+    def discount(self, subtotal_cents):
+        """Return the discount in cents for a subtotal (0 if not eligible)"""
+        if subtotal_cents < self.min_subtotal_cents:
+            return 0
+        off = _percent_of(subtotal_cents, int(round(self.percent_off * 100))) + self.amount_off_cents
+        return min(off, subtotal_cents)
+
+
+class PriceTable:
+    """{food_id: price_cents} rebuilt whenever the menu data version moves"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._prices = {}
+
+    def prices(self):
+        """Return the current price mapping"""
+        version = get_data_version('menu')
+        if self._version != version:
+            with self._lock:
+                version = get_data_version('menu')
+                if self._version != version:
+                    self._prices = {food['id']: to_cents(food['price']) for food in get_all_foods()}
+                    self._version = version
+        return self._prices
+
+
+class PricingEngine:
+    """Computes totals for (food_id, quantity) lines under configurable rules"""
+
+    def __init__(self, price_table, tax_rate_bp=TAX_RATE_BP, delivery_fee_cents=DELIVERY_FEE_CENTS,
+                 free_delivery_threshold_cents=FREE_DELIVERY_THRESHOLD_CENTS, promotions=()):
+        self.price_table = price_table
+        self.tax_rate_bp = tax_rate_bp
+        self.delivery_fee_cents = delivery_fee_cents
+        self.free_delivery_threshold_cents = free_delivery_threshold_cents
+        self.promotions = {promo.code: promo for promo in promotions}
+
+    def quote(self, lines, promo_code=None):
+        """Price a cart; returns a dict of integer-cent amounts
+
+        Keys: subtotal, discount, tax, delivery_fee, total (all cents),
+        unit_prices ({food_id: cents}) and promo_code. Raises PricingError
+        for unknown foods or promo codes.
+        """
+        prices = self.price_table.prices()
+        subtotal = 0
+        try:
+            for food_id, quantity in lines:
+                subtotal += prices[food_id] * quantity
+        except KeyError as e:
+            raise PricingError(f"Unknown food id: {e.args[0]}")
+
+        discount = 0
+        if promo_code is not None and not isinstance(promo_code, str):
+            raise PricingError(f"Invalid promo code: {promo_code!r}")
+        if promo_code:
+            promo = self.promotions.get(promo_code.strip().upper())
+            if promo is None:
+                raise PricingError(f"Unknown promo code: {promo_code}")
+            discount = promo.discount(subtotal)
+            promo_code = promo.code
+
+        taxable = subtotal - discount
+        tax = _percent_of(taxable, self.tax_rate_bp)
+        delivery_fee = self.delivery_fee_cents if subtotal < self.free_delivery_threshold_cents else 0
+
+        return {
+            "subtotal": subtotal,
+            "discount": discount,
+            "tax": tax,
+            "delivery_fee": delivery_fee,
+            "total": taxable + tax + delivery_fee,
+            "unit_prices": {food_id: prices[food_id] for food_id, _ in lines},
+            "promo_code": promo_code or None,
+        }
+
+
+def load_promotions(raw=PROMOTIONS_JSON):
+    """Parse the FOODZZ_PROMOTIONS JSON into Promotion objects"""
+    return [Promotion(**entry) for entry in json.loads(raw or '[]')]
+
+
+price_table = PriceTable()
+pricing_engine = PricingEngine(price_table, promotions=load_promotions())
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Foodzz Reports
+Revenue, top-selling foods and category mix over any time range
+
+Usage: python reports.py --rebuild    recompute the rollups, archive included
+
+Triggers keep two rollup tables current (migration 11): report_hourly
+(orders and revenue per hour and status) and report_food_daily (quantity
+and revenue per day, status and food). Each worker loads them into a
+columnar cube of running totals over the buckets that have orders, so
+memory follows the rollup rows rather than foods x days, and any range
+costs two binary searches per series, whatever its length. Neither the orders tables nor the rollups
+are read per request. The cube reloads when orders change, at most every
+FOODZZ_REPORT_REFRESH_INTERVAL seconds. Times are UTC; revenue is
+bucketed by hour, and food and category reports by whole days.
+"""
+
+import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+from connectiondb import get_data_version, get_db, normalize_timestamp
+
+GRANULARITIES = ('hour', 'day')
+# Statuses left out unless asked for explicitly
+EXCLUDED_STATUSES = ('cancelled',)
+DEFAULT_RANGE_DAYS = 30
+TOP_FOODS_DEFAULT = 10
+TOP_FOODS_MAX = 100
+# Most seconds a report may lag behind new orders
+REPORT_REFRESH_INTERVAL = float(os.environ.get('FOODZZ_REPORT_REFRESH_INTERVAL', '5'))
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+# The cube loads both rollups whole, in bucket order
+REPORT_HOURLY_SQL = 'SELECT bucket, status, order_count, revenue FROM report_hourly ORDER BY bucket'
+REPORT_FOOD_DAILY_SQL = 'SELECT day, status, quantity, revenue, food_id FROM report_food_daily ORDER BY day'
+
+
+def report_range(since=None, until=None):
+    """Normalize since (inclusive) and until (exclusive); defaults to the last 30 days"""
+    until = normalize_timestamp(until) if until else (
+        datetime.now(timezone.utc) + HOUR
+    ).strftime('%Y-%m-%d %H:00:00')
+    if since:
+        since = normalize_timestamp(since)
+    else:
+        since = (datetime.fromisoformat(until) - timedelta(days=DEFAULT_RANGE_DAYS)).strftime('%Y-%m-%d %H:%M:%S')
+    if since >= until:
+        raise ValueError("since must be before until")
+    return since, until
+
+
+def _cumulative(values):
+    """Running totals with a leading zero: sum(values[i:j]) == out[j] - out[i]"""
+    return array('d', accumulate(values, initial=0))
+
+
+class _Series:
+    """Running totals of one series, stored only at the buckets that have data"""
+
+    __slots__ = ('buckets', 'counts', 'amounts')
+
+    def __init__(self):
+        self.buckets = array('l')
+        self.counts = array('d')
+        self.amounts = array('d')
+
+    def add(self, index, count, amount):
+        # Rows arrive in bucket order
+        if self.buckets and self.buckets[-1] == index:
+            self.counts[-1] += count
+            self.amounts[-1] += amount
+        else:
+            self.buckets.append(index)
+            self.counts.append(count)
+            self.amounts.append(amount)
+
+    def freeze(self):
+        self.counts = _cumulative(self.counts)
+        self.amounts = _cumulative(self.amounts)
+        return self
+
+    def span(self, start, end):
+        """Positions of the buckets in [start, end)"""
+        return bisect_left(self.buckets, start), bisect_left(self.buckets, end)
+
+    def total(self, start, end):
+        """(count, amount) summed over buckets [start, end)"""
+        lo, hi = self.span(start, end)
+        return self.counts[hi] - self.counts[lo], self.amounts[hi] - self.amounts[lo]
+
+    def points(self, start, end):
+        """(bucket, count, amount) for each bucket with data in [start, end)"""
+        lo, hi = self.span(start, end)
+        counts, amounts = self.counts, self.amounts
+        for k in range(lo, hi):
+            yield self.buckets[k], counts[k + 1] - counts[k], amounts[k + 1] - amounts[k]
+
+    @property
+    def nbytes(self):
+        return sum(len(a) * a.itemsize for a in (self.buckets, self.counts, self.amounts))
+
+
+class _Axis:
+    """Evenly spaced time buckets starting at first"""
+
+    def __init__(self, first, step, count):
+        self.first = first
+        self.step = step
+        self.count = count
+
+    def floor(self, moment):
+        """Index of the bucket holding moment, clamped to [0, count]"""
+        index = (moment - self.first) // self.step
+        return max(0, min(self.count, index))
+
+    def ceil(self, moment):
+        """Index of the first bucket starting at or after moment, clamped"""
+        index = -((self.first - moment) // self.step)
+        return max(0, min(self.count, index))
+
+    def start(self, index):
+        return self.first + index * self.step
+
+
+class ReportCube:
+    """Running totals of the report rollups, one column per series
+
+    Hourly series are keyed by status, daily ones by (status, food_id).
+    """
+
+    def __init__(self, refresh_interval=REPORT_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._version = None
+        self._loaded_at = 0.0
+        self._hours = None    # (_Axis, {status: _Series of orders, revenue})
+        self._days = None     # (_Axis, {(status, food_id): _Series of quantity, revenue})
+        self.loads = 0
+
+    def _ensure_fresh(self):
+        version = get_data_version('orders')
+        if version == self._version:
+            return
+        if self._version is not None and time.monotonic() - self._loaded_at < self.refresh_interval:
+            return
+        with self._lock:
+            version = get_data_version('orders')
+            if version == self._version:
+                return
+            if self._version is not None and time.monotonic() - self._loaded_at < self.refresh_interval:
+                return
+            # Version read before loading: orders placed mid-load trigger another reload
+            self._hours = self._load(REPORT_HOURLY_SQL, HOUR, lambda row: row[1])
+            self._days = self._load(REPORT_FOOD_DAILY_SQL, DAY, lambda row: (row[1], row[4]))
+            self._version = version
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+
+    @staticmethod
+    def _load(sql, step, series_key):
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        rows = cursor.fetchall()
+        conn.close()
+        if not rows:
+            return _Axis(datetime(1970, 1, 1), step, 0), {}
+        axis_first = datetime.fromisoformat(rows[0][0])
+        axis = _Axis(axis_first, step, int((datetime.fromisoformat(rows[-1][0]) - axis_first) / step) + 1)
+        columns = {}
+        indexes = {}  # bucket text -> index; many rows share a bucket
+        for row in rows:
+            if not row[2] and not row[3]:
+                # Left at zero by status changes
+                continue
+            key = series_key(row)
+            series = columns.get(key)
+            if series is None:
+                series = columns[key] = _Series()
+            index = indexes.get(row[0])
+            if index is None:
+                index = indexes[row[0]] = int((datetime.fromisoformat(row[0]) - axis_first) / step)
+            series.add(index, row[2], row[3])
+        return axis, {key: series.freeze() for key, series in columns.items()}
+
+    @staticmethod
+    def _selected(status, statuses):
+        return status in statuses if statuses else status not in EXCLUDED_STATUSES
+
+    def revenue(self, since, until, granularity='day', statuses=None):
+        """Orders and revenue per hour or day; returns (series, totals)"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Invalid granularity: {granularity}")
+        self._ensure_fresh()
+        axis, columns = self._hours
+        selected = [column for status, column in columns.items() if self._selected(status, statuses)]
+        start = axis.floor(datetime.fromisoformat(since))
+        end = axis.ceil(datetime.fromisoformat(until))
+
+        periods = {}  # bucket index -> [orders, revenue]; only buckets with data
+        for column in selected:
+            for index, orders, revenue in column.points(start, end):
+                entry = periods.setdefault(index, [0.0, 0.0])
+                entry[0] += orders
+                entry[1] += revenue
+        merged = {}
+        for index in sorted(periods):
+            period_start = axis.start(index)
+            if granularity == 'hour':
+                period = period_start.strftime('%Y-%m-%d %H:00:00')
+            else:
+                period = period_start.date().isoformat()
+            entry = merged.setdefault(period, [0.0, 0.0])
+            entry[0] += periods[index][0]
+            entry[1] += periods[index][1]
+        series = [
+            {"period": period, "orders": int(round(orders)), "revenue": round(revenue, 2)}
+            for period, (orders, revenue) in merged.items() if orders > 0
+        ]
+        totals = {
+            "orders": sum(point['orders'] for point in series),
+            "revenue": round(sum(point['revenue'] for point in series), 2),
+        }
+        return series, totals
+
+    def _food_totals(self, since, until, statuses):
+        """{food_id: [quantity, revenue]} over the whole days covering the range"""
+        self._ensure_fresh()
+        axis, columns = self._days
+        start = axis.floor(datetime.fromisoformat(since[:10]))
+        end = axis.ceil(datetime.fromisoformat(until))
+        totals = {}
+        for (status, food_id), column in columns.items():
+            if not self._selected(status, statuses):
+                continue
+            quantity, revenue = column.total(start, end)
+            entry = totals.setdefault(food_id, [0.0, 0.0])
+            entry[0] += quantity
+            entry[1] += revenue
+        return {food_id: entry for food_id, entry in totals.items() if entry[0] > 0}
+
+    def top_foods(self, since, until, statuses=None, limit=TOP_FOODS_DEFAULT, menu=None):
+        """Best-selling foods by quantity, with their revenue"""
+        limit = max(1, min(int(limit), TOP_FOODS_MAX))
+        totals = self._food_totals(since, until, statuses)
+        ranked = sorted(totals.items(), key=lambda item: (-item[1][0], -item[1][1], item[0]))[:limit]
+        foods = []
+        for food_id, (quantity, revenue) in ranked:
+            food = menu.food(food_id) if menu is not None else None
+            foods.append({
+                "food_id": food_id,
+                "name": food['name'] if food else None,
+                "category": food['category'] if food else None,
+                "quantity": int(round(quantity)),
+                "revenue": round(revenue, 2),
+            })
+        return foods
+
+    def category_mix(self, since, until, statuses=None, menu=None):
+        """Quantity, revenue and revenue share per food category"""
+        categories = {}
+        for food_id, (quantity, revenue) in self._food_totals(since, until, statuses).items():
+            food = menu.food(food_id) if menu is not None else None
+            category = (food and food['category']) or 'Uncategorized'
+            entry = categories.setdefault(category, [0.0, 0.0])
+            entry[0] += quantity
+            entry[1] += revenue
+        total = sum(revenue for _, revenue in categories.values())
+        return [
+            {"category": category, "quantity": int(round(quantity)), "revenue": round(revenue, 2),
+             "share": round(revenue / total, 4) if total else 0.0}
+            for category, (quantity, revenue) in sorted(categories.items(), key=lambda item: -item[1][1])
+        ]
+
+    def stats(self):
+        hours, days = self._hours, self._days
+        return {
+            "version": self._version,
+            "loads": self.loads,
+            "hours": hours[0].count if hours else 0,
+            "days": days[0].count if days else 0,
+            "series": (len(hours[1]) if hours else 0) + (len(days[1]) if days else 0),
+            "bytes": sum(column.nbytes for cube in (hours, days) if cube for column in cube[1].values()),
+        }
+
+
+def rebuild(include_archive=True):
+    """Recompute the rollups from the hot tables and the order archive"""
+    from archive import ARCHIVE_PATH
+    from migrations import rebuild_reports
+
+    conn = get_db()
+    cursor = conn.cursor()
+    attached = include_archive and ARCHIVE_PATH.exists()
+    if attached:
+        cursor.execute('ATTACH DATABASE ? AS archive', (str(ARCHIVE_PATH),))
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            rebuild_reports(cursor, ('main', 'archive') if attached else ('main',))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        if attached:
+            cursor.execute('DETACH DATABASE archive')
+        conn.close()
+    return attached
+
+
+report_cube = ReportCube()
+
+
+def main(argv):
+    if '--rebuild' not in argv:
+        print(__doc__.strip())
+        return 2
+    from connectiondb import bump_data_version, init_db
+    init_db()
+    attached = rebuild()
+    bump_data_version('orders')
+    print(f"✓ Report rollups rebuilt{' (archive included)' if attached else ''}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,52 @@
+"""
+Foodzz JSON Serialization
+Compact JSON encoding for API responses, with orjson when it is installed
+
+Output is compact with sorted keys, and dates, decimals and dataclasses go
+through Flask's own conversions, so it decodes to the same value as
+jsonify's. Unlike jsonify, non-ASCII text is written as UTF-8 rather than
+\\u escapes. orjson is optional; without it the standard library encoder
+is used with the same settings. The two agree byte for byte on what the
+API returns; they differ only on edge cases such as NaN (null in orjson)
+and the exponent form of very large or small floats.
+"""
+
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+if orjson is not None:
+    _ORJSON_OPTIONS = (
+        orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+
+def dumps(obj, default=DefaultJSONProvider.default):
+    """Serialize to compact JSON bytes with sorted keys"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # Non-string keys (json sorts 2 before 10, orjson would not),
+            # integers beyond 64 bits and the like; let json decide
+            pass
+    return json.dumps(obj, default=default, sort_keys=True, separators=(',', ':'),
+                      ensure_ascii=False).encode('utf-8')
+
+
+class CompactJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with dumps(): no pretty-printing, even in debug"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, self.default).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, self.default), mimetype=self.mimetype)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Foodzz Production Server
+Preforking gunicorn launcher: shared-nothing workers, preloaded app and caches,
+graceful reload and worker recycling
+
+Usage: python serve.py              start the server (writes FOODZZ_PIDFILE)
+       python serve.py --asgi       start the async variant (asgi.py) under uvicorn workers
+       python serve.py --reload     restart workers gracefully (SIGHUP)
+       python serve.py --upgrade    zero-downtime restart onto new code
+
+Settings (environment):
+  PORT                    listen port (8000)
+  FOODZZ_BIND             full bind address, overrides PORT
+  FOODZZ_WORKERS          worker processes (2 x CPU cores + 1)
+  FOODZZ_THREADS          threads per worker (4); each open order stream holds one
+  FOODZZ_MAX_REQUESTS     recycle a worker after this many requests (1000, 0 = never)
+  FOODZZ_GRACEFUL_TIMEOUT seconds a stopping worker may finish requests (30)
+  FOODZZ_PIDFILE          master PID file (foodzz.pid next to this script)
+  FOODZZ_SECRET_KEY       session key shared by all workers (else backend/.secret_key)
+  FOODZZ_CART_STORE       defaults to 'sqlite' here so carts are shared by all workers
+
+Needs gunicorn (POSIX only), and uvicorn for --asgi. Without gunicorn a
+single process is started instead: the development server, or uvicorn
+for --asgi.
+"""
+
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # pragma: no cover - optional dependency
+    BaseApplication = None
+
+try:
+    import uvicorn
+except ImportError:  # pragma: no cover - optional dependency
+    uvicorn = None
+
+UVICORN_WORKER = 'uvicorn.workers.UvicornWorker'
+
+BACKEND_DIR = Path(__file__).parent
+PIDFILE = Path(os.environ.get('FOODZZ_PIDFILE', BACKEND_DIR / 'foodzz.pid'))
+UPGRADE_TIMEOUT = 60
+
+
+def default_workers():
+    return 2 * (os.cpu_count() or 1) + 1
+
+
+def server_options(asgi=False):
+    """gunicorn settings from the environment"""
+    max_requests = int(os.environ.get('FOODZZ_MAX_REQUESTS', '1000'))
+    return {
+        'bind': os.environ.get('FOODZZ_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}"),
+        'workers': int(os.environ.get('FOODZZ_WORKERS', default_workers())),
+        'threads': int(os.environ.get('FOODZZ_THREADS', '4')),
+        # ASGI workers run one event loop each; threads only apply to gthread
+        'worker_class': UVICORN_WORKER if asgi else 'gthread',
+        # Load the app (and warm its caches) once in the master; workers
+        # inherit it copy-on-write instead of each importing it again
+        'preload_app': True,
+        # Recycle workers, staggered so they do not all restart together
+        'max_requests': max_requests,
+        'max_requests_jitter': max_requests // 10,
+        'graceful_timeout': int(os.environ.get('FOODZZ_GRACEFUL_TIMEOUT', '30')),
+        'timeout': 60,
+        'keepalive': 5,
+        'pidfile': str(PIDFILE),
+        'accesslog': '-',
+        'post_worker_init': _post_worker_init,
+        'worker_exit': _worker_exit,
+    }
+
+
+def _post_worker_init(worker):
+    # Threads do not survive fork(), so background work starts per worker
+    from archive import start_archiver
+    from connectiondb import start_checkpointer
+    start_checkpointer()
+    start_archiver()
+
+
+def _worker_exit(server, worker):
+    # Let queued upload jobs finish so their status rows are not left pending
+    from uploads import shutdown
+    shutdown(wait=True)
+
+
+if BaseApplication is not None:
+    class FoodzzServer(BaseApplication):
+        """gunicorn application serving app.app"""
+
+        def __init__(self, options, asgi=False):
+            self.options = options
+            self.asgi = asgi
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import app, prepare
+            prepare()
+            if self.asgi:
+                from asgi import application
+                return application
+            return app
+
+
+def read_pid(path=PIDFILE):
+    try:
+        return int(path.read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def reload_workers():
+    """SIGHUP: start fresh workers, then stop the old ones gracefully
+
+    Workers are forked from the already loaded master, so this picks up
+    new settings but not new code; use upgrade() for that.
+    """
+    pid = read_pid()
+    if pid is None:
+        print(f"⚠ No running server found ({PIDFILE})")
+        return 1
+    os.kill(pid, signal.SIGHUP)
+    print(f"✓ Reloading workers of master {pid}")
+    return 0
+
+
+def upgrade():
+    """SIGUSR2 then SIGTERM: start a new master on the current code and
+    retire the old one once the new one is up, without dropping the socket
+    """
+    old_pid = read_pid()
+    if old_pid is None:
+        print(f"⚠ No running server found ({PIDFILE})")
+        return 1
+    os.kill(old_pid, signal.SIGUSR2)
+    # The new master writes <pidfile>.2 and takes over the name once the
+    # old master has exited
+    new_pidfile = Path(f"{PIDFILE}.2")
+    deadline = time.monotonic() + UPGRADE_TIMEOUT
+    while time.monotonic() < deadline:
+        new_pid = read_pid(new_pidfile)
+        if new_pid not in (None, old_pid):
+            # Give the new master's workers a moment to boot
+            time.sleep(2)
+            os.kill(old_pid, signal.SIGTERM)
+            print(f"✓ Upgraded: master {new_pid} replaced {old_pid}")
+            return 0
+        time.sleep(0.5)
+    print(f"⚠ New master did not start within {UPGRADE_TIMEOUT}s; {old_pid} left running")
+    return 1
+
+
+def main(argv):
+    if '--reload' in argv:
+        return reload_workers()
+    if '--upgrade' in argv:
+        return upgrade()
+    asgi = '--asgi' in argv
+    if asgi and uvicorn is None:
+        print("⚠ uvicorn is required for --asgi")
+        return 1
+
+    if BaseApplication is None and asgi:
+        print("⚠ gunicorn not installed; starting a single uvicorn process")
+        from app import prepare
+        from asgi import application
+        prepare()
+        uvicorn.run(application, host='0.0.0.0', port=int(os.environ.get('PORT', '8000')))
+        return 0
+
+    if BaseApplication is None:
+        print("⚠ gunicorn not installed; starting the single-process development server")
+        from app import app, prepare
+        from archive import start_archiver
+        from connectiondb import start_checkpointer
+        prepare()
+        start_checkpointer()
+        start_archiver()
+        app.run(host='0.0.0.0', port=int(os.environ.get('PORT', '8000')), threaded=True)
+        return 0
+
+    # A per-process memory cart would only be seen by one worker
+    os.environ.setdefault('FOODZZ_CART_STORE', 'sqlite')
+    options = server_options(asgi)
+    mode = "ASGI" if asgi else f"x {options['threads']} threads"
+    print(f"🚀 Foodzz Server starting on {options['bind']} ({options['workers']} workers {mode})")
+    FoodzzServer(options, asgi).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,44 @@
+"""
+Shared fixtures: every test runs against a freshly migrated temporary database
+
+The FOODZZ_* paths are set before any backend module is imported, so the
+tracked foodzz.db is never opened.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+TEST_DIR = Path(tempfile.mkdtemp(prefix='foodzz-tests-'))
+
+os.environ['FOODZZ_DB_PATH'] = str(TEST_DIR / 'foodzz.db')
+os.environ.setdefault('FOODZZ_SECRET_KEY', 'test')
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    from connectiondb import close_pool
+    close_pool()
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    """A migrated, seeded database; the archive starts out missing"""
+    from archive import ARCHIVE_PATH
+    from connectiondb import init_db
+    ARCHIVE_PATH.unlink(missing_ok=True)
+    init_db(reset=True)
+    return TEST_DIR / 'foodzz.db'
+
+
+@pytest.fixture
+def client(db):
+    from app import app
+    app.config['TESTING'] = True
+    return app.test_client()
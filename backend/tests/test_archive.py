@@ -0,0 +1,54 @@
+from archive import ARCHIVE_PATH, archive_orders
+from connectiondb import (
+    create_order, get_admin_stats, get_db, get_order_by_id, reconcile_order_stats, update_order_status
+)
+
+
+def place_order(status, created_at, total=10.0):
+    order_id = create_order('T', 't@example.com', 'A', 'P', subtotal=total, tax=0, delivery_fee=0,
+                            total_price=total, payment_method='card', items=[{'id': 1, 'quantity': 2}])
+    update_order_status(order_id, status)
+    conn = get_db()
+    conn.execute('UPDATE orders SET created_at = ? WHERE id = ?', (created_at, order_id))
+    conn.commit()
+    conn.close()
+    return order_id
+
+
+def hot_order_ids():
+    conn = get_db()
+    ids = {row[0] for row in conn.execute('SELECT id FROM orders')}
+    conn.close()
+    return ids
+
+
+def test_old_finished_orders_move_to_archive(db):
+    old = [place_order('delivered', '2020-01-01 10:00:00', 10.0 + i) for i in range(3)]
+    old.append(place_order('cancelled', '2020-01-02 10:00:00', 5.0))
+    old_pending = place_order('pending', '2020-01-01 10:00:00')
+    recent = place_order('delivered', '2999-01-01 10:00:00')
+    before = get_admin_stats()
+
+    assert archive_orders(days=30, batch_size=2) == len(old)
+    assert ARCHIVE_PATH.exists()
+    assert hot_order_ids() == {old_pending, recent}
+
+    # Dashboard totals still include archived orders; hot stats match the hot table
+    after = get_admin_stats()
+    assert after['total_orders'] == before['total_orders']
+    assert after['total_revenue'] == before['total_revenue']
+    assert after['orders_by_status'] == before['orders_by_status']
+    assert reconcile_order_stats() == {}
+
+    archived = get_order_by_id(old[0])
+    assert archived['status'] == 'delivered'
+    assert [(item['food_id'], item['quantity']) for item in archived['items']] == [(1, 2)]
+    assert archived['items'][0]['food_name']
+
+    assert archive_orders(days=30) == 0
+
+
+def test_nothing_to_archive(db):
+    place_order('delivered', '2999-01-01 10:00:00')
+    assert archive_orders(days=30) == 0
+    assert get_order_by_id(123456) is None
@@ -0,0 +1,68 @@
+import pytest
+
+from cartstore import MemoryCartStore, SQLiteCartStore, cart_lines, new_cart_id
+from menucache import menu_cache
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, db):
+    return MemoryCartStore() if request.param == 'memory' else SQLiteCartStore()
+
+
+def test_add_set_and_clear(store):
+    cart_id = new_cart_id()
+    assert store.add(cart_id, 1, 2) == {1: 2}
+    assert store.add(cart_id, 1, 3) == {1: 5}
+    assert store.add(cart_id, 2, 1) == {1: 5, 2: 1}
+    assert store.set(cart_id, 1, 0) == {2: 1}
+    assert store.add(cart_id, 2, -1) == {}
+    store.add(cart_id, 3, 1)
+    store.clear(cart_id)
+    assert store.get(cart_id) == {}
+
+
+def test_expired_cart_starts_empty(store):
+    cart_id = new_cart_id()
+    store.ttl = -1
+    store.add(cart_id, 1, 2)
+    assert store.get(cart_id) == {}
+    store.ttl = 3600
+    assert store.add(cart_id, 2, 1) == {2: 1}
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryCartStore(max_carts=2)
+    first, second, third = new_cart_id(), new_cart_id(), new_cart_id()
+    store.add(first, 1, 1)
+    store.add(second, 1, 1)
+    store.get(first)
+    store.add(first, 2, 1)
+    store.add(third, 1, 1)
+    assert store.get(second) == {}
+    assert store.get(first) == {1: 1, 2: 1}
+
+
+def test_cart_lines_skip_removed_foods(db):
+    lines = cart_lines({1: 2, 999999: 1}, menu_cache)
+    assert [(line['id'], line['quantity']) for line in lines] == [(1, 2)]
+
+
+def test_add_to_cart_accepts_numeric_string_ids(client):
+    response = client.post('/api/cart/add', json={"food_id": "1", "quantity": 2})
+    assert response.status_code == 200
+    client.post('/api/cart/add', json={"food_id": 1, "quantity": 1})
+    assert [(line['id'], line['quantity']) for line in client.get('/api/cart').get_json()['items']] == [(1, 3)]
+
+    assert client.post('/api/cart/update', json={"food_id": "1", "quantity": 5}).status_code == 200
+    assert client.post('/api/cart/remove', json={"food_id": "1"}).status_code == 200
+    assert client.get('/api/cart').get_json()['count'] == 0
+
+
+@pytest.mark.parametrize('food_id', ['abc', 1.5, True, None, [1]])
+def test_add_to_cart_rejects_invalid_ids(client, food_id):
+    response = client.post('/api/cart/add', json={"food_id": food_id, "quantity": 1})
+    assert response.status_code == 400
+
+
+def test_add_to_cart_unknown_food(client):
+    assert client.post('/api/cart/add', json={"food_id": 999999, "quantity": 1}).status_code == 404
@@ -0,0 +1,77 @@
+import uuid
+
+from connectiondb import get_db
+from idempotency import IDEMPOTENCY_HEADER, idempotency_index
+
+CHECKOUT = {
+    "customer_name": "Test",
+    "customer_email": "test@example.com",
+    "delivery_address": "1 Test St",
+    "phone": "555-0100",
+    "payment_method": "card",
+}
+
+
+def checkout(client, key, **data):
+    return client.post('/api/checkout', json=dict(CHECKOUT, **data), headers={IDEMPOTENCY_HEADER: key})
+
+
+def order_count():
+    conn = get_db()
+    try:
+        return conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_replay_returns_original_order(client):
+    key = uuid.uuid4().hex
+    first = checkout(client, key, items=[{"id": 1, "quantity": 2}])
+    assert first.status_code == 201
+    orders = order_count()
+
+    again = checkout(client, key, items=[{"id": 1, "quantity": 2}])
+    assert again.status_code == 201
+    assert again.headers['Idempotent-Replayed'] == 'true'
+    assert again.get_json() == first.get_json()
+    assert order_count() == orders
+
+
+def test_key_reused_for_other_checkout_keeps_cart(client):
+    key = uuid.uuid4().hex
+    assert checkout(client, key, items=[{"id": 1, "quantity": 1}]).status_code == 201
+    client.post('/api/cart/add', json={"food_id": 2, "quantity": 3})
+
+    response = checkout(client, key)
+    assert response.status_code == 422
+    assert client.get('/api/cart').get_json()['count'] == 1
+
+
+def test_concurrent_winner_is_replayed_without_clearing_cart(client, monkeypatch):
+    key = uuid.uuid4().hex
+    first = checkout(client, key, items=[{"id": 1, "quantity": 1}])
+    client.post('/api/cart/add', json={"food_id": 2, "quantity": 1})
+    # As if the key had not reached this worker yet: create_order finds it
+    monkeypatch.setattr(idempotency_index, 'lookup', lambda key: None)
+
+    response = checkout(client, key, items=[{"id": 1, "quantity": 1}])
+    assert response.status_code == 201
+    assert response.get_json() == first.get_json()
+    assert client.get('/api/cart').get_json()['count'] == 1
+
+
+def test_expired_key_places_new_order(client, monkeypatch):
+    key = uuid.uuid4().hex
+    monkeypatch.setattr(idempotency_index, 'ttl', -1)
+    first = checkout(client, key, items=[{"id": 1, "quantity": 1}])
+    assert first.status_code == 201
+
+    # The expired row is still stored; it must not be replayed
+    monkeypatch.setattr(idempotency_index, 'ttl', 3600)
+    second = checkout(client, key, items=[{"id": 1, "quantity": 1}])
+    assert second.status_code == 201
+    assert 'Idempotent-Replayed' not in second.headers
+    assert second.get_json()['order_id'] != first.get_json()['order_id']
+
+    third = checkout(client, key, items=[{"id": 1, "quantity": 1}])
+    assert third.get_json()['order_id'] == second.get_json()['order_id']
@@ -0,0 +1,42 @@
+import json
+
+from connectiondb import add_food_item, delete_food_item, set_featured, update_food_item
+from menucache import MenuCache
+
+
+def test_reads_are_served_from_memory(db):
+    cache = MenuCache()
+    catalog = cache.catalog()
+    assert cache.catalog() is catalog
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['hits'] >= 1
+
+
+def test_writes_invalidate(db):
+    cache = MenuCache()
+    foods = json.loads(cache.catalog())
+
+    food_id = add_food_item('Test Soup', 'Hot', 4.5, 'Soups', 'soup.jpg')
+    assert not cache.is_fresh()
+    assert len(json.loads(cache.catalog())) == len(foods) + 1
+    assert cache.food(food_id)['name'] == 'Test Soup'
+
+    update_food_item(food_id, 'Cold Soup', 'Cold', 5.0, 'Soups')
+    assert json.loads(cache.item(food_id))['name'] == 'Cold Soup'
+
+    set_featured(food_id)
+    assert food_id in json.loads(cache.featured())['featured']
+
+    delete_food_item(food_id)
+    assert cache.item(food_id) is None
+    assert cache.food(food_id) is None
+
+
+def test_search_pages_are_dropped_on_menu_change(db):
+    cache = MenuCache()
+    before = json.loads(cache.search('soup'))
+    assert cache.search('SOUP!') is cache.search('soup')
+
+    add_food_item('Tomato Soup', 'Hot', 4.5, 'Soups', 'soup.jpg')
+    after = json.loads(cache.search('soup'))
+    assert after['total'] == before['total'] + 1
@@ -0,0 +1,77 @@
+import io
+import json
+
+from connectiondb import get_featured_food_ids, get_food_by_id
+from menucache import menu_cache
+from menuio import export_foods, food_from_record, import_foods
+
+CSV = b'''id,name,description,price,category,image,featured
+,Pho,Beef noodle soup,11.5,Soups,,yes
+,,No name,3,Sides,,
+,Bad Price,Costs a lot,abc,Sides,,
+,Negative,Refund,-1,Sides,,
+999999,Ghost,Not on the menu,4,Sides,,
+1,Renamed,Now with more cheese,9.99,Pizza,,no
+,Odd Flag,Maybe featured,2,Sides,,sometimes
+,Salad,Greens,6,Salads,,
+'''
+
+
+def import_csv(data, tmp_path, **kwargs):
+    return import_foods(io.BytesIO(data), 'csv', upload_dir=tmp_path, **kwargs)
+
+
+def test_import_reports_error_rows(db, tmp_path):
+    summary, new_images = import_csv(CSV, tmp_path, batch_size=2)
+    assert (summary['inserted'], summary['updated'], summary['failed']) == (2, 1, 5)
+    assert summary['batches'] == 2
+    assert new_images == []
+    errors = {error['line']: error['error'] for error in summary['errors']}
+    assert errors == {
+        3: 'Missing required fields: name',
+        4: 'Invalid price: abc',
+        5: 'Invalid price: -1.0',
+        6: 'Food 999999 not found',
+        8: 'Invalid featured flag: sometimes',
+    }
+    assert get_food_by_id(1)['name'] == 'Renamed'
+    names = {food['name'] for food in json.loads(menu_cache.catalog())}
+    assert {'Pho', 'Salad', 'Renamed'} <= names and 'Ghost' not in names
+
+
+def test_import_ndjson_error_rows(db, tmp_path):
+    data = b'{"name": "Tea", "description": "Hot", "price": 2, "category": "Drinks"}\n' \
+           b'not json\n\n[1, 2]\n'
+    summary, _ = import_foods(io.BytesIO(data), 'ndjson', upload_dir=tmp_path)
+    assert (summary['inserted'], summary['failed']) == (1, 2)
+    assert [error['line'] for error in summary['errors']] == [2, 4]
+    assert summary['errors'][1]['error'] == 'Expected a JSON object'
+
+
+def test_import_outside_images_root_is_rejected(db, tmp_path):
+    data = b'name,description,price,category,image\nPie,Apple,4,Desserts,../../etc/passwd\n'
+    summary, _ = import_csv(data, tmp_path)
+    assert summary['failed'] == 1 and summary['inserted'] == 0
+
+
+def test_export_round_trip(db, tmp_path):
+    exported = ''.join(export_foods('csv', batch_size=3)).encode('utf-8')
+    # Image columns name files already in the upload folder
+    for food in json.loads(menu_cache.catalog()):
+        (tmp_path / food['image']).touch()
+    summary, new_images = import_csv(exported, tmp_path)
+    assert new_images == []
+    assert summary['failed'] == 0
+    assert summary['updated'] == len(json.loads(menu_cache.catalog()))
+    assert ''.join(export_foods('csv')).encode('utf-8') == exported
+
+    lines = ''.join(export_foods('ndjson')).splitlines()
+    foods = [json.loads(line) for line in lines]
+    assert [food['id'] for food in foods] == sorted(food['id'] for food in foods)
+    assert {food['id'] for food in foods if food['featured']} == set(get_featured_food_ids())
+
+
+def test_food_from_record_normalizes_fields():
+    food = food_from_record({'id': ' 7 ', 'name': ' Soup ', 'description': 'Hot', 'price': '4.50',
+                             'category': 'Soups', 'featured': 'TRUE'})
+    assert food == (7, 'Soup', 'Hot', 4.5, 'Soups', None, True)
@@ -0,0 +1,45 @@
+from connectiondb import create_order, get_admin_stats, get_db, reconcile_order_stats, update_order_status
+from migrations import main as migrations_main
+
+
+def place_order(total):
+    return create_order('T', 't@example.com', 'A', 'P', subtotal=total, tax=0, delivery_fee=0,
+                        total_price=total, payment_method='card', items=[{'id': 1, 'quantity': 1}])
+
+
+def recount():
+    conn = get_db()
+    rows = conn.execute('SELECT status, COUNT(*), SUM(total_price) FROM orders GROUP BY status').fetchall()
+    conn.close()
+    return {status: (count, round(revenue, 2)) for status, count, revenue in rows}
+
+
+def test_triggers_track_inserts_updates_and_deletes(db):
+    ids = [place_order(total) for total in (10.0, 12.5, 7.25, 30.0)]
+    update_order_status(ids[0], 'delivered')
+    update_order_status(ids[1], 'cancelled')
+    conn = get_db()
+    conn.execute('UPDATE orders SET total_price = 8.0 WHERE id = ?', (ids[2],))
+    conn.execute('DELETE FROM orders WHERE id = ?', (ids[3],))
+    conn.commit()
+    conn.close()
+
+    assert reconcile_order_stats() == {}
+    stats = get_admin_stats()
+    expected = recount()
+    assert stats['orders_by_status'] == {status: count for status, (count, _) in expected.items()}
+    assert stats['total_revenue'] == round(sum(revenue for _, revenue in expected.values()), 2)
+
+
+def test_reconcile_repairs_drift(db, capsys):
+    place_order(10.0)
+    conn = get_db()
+    conn.execute("UPDATE order_stats SET order_count = order_count + 3 WHERE status = 'confirmed'")
+    conn.commit()
+    conn.close()
+
+    drift = reconcile_order_stats()
+    assert drift == {'confirmed': ((4, 10.0), (1, 10.0))}
+    assert migrations_main(['--reconcile-stats']) == 1
+    assert migrations_main(['--reconcile-stats']) == 0
+    assert reconcile_order_stats() == {}
@@ -0,0 +1,23 @@
+import pytest
+
+from connectiondb import get_order_by_id
+
+
+def test_legacy_order_is_placed_pending(client):
+    response = client.post('/api/orders', json={"food_id": "1", "quantity": 3})
+    assert response.status_code == 201
+    body = response.get_json()
+    order = get_order_by_id(body['id'])
+    assert order['status'] == body['status'] == 'pending'
+    assert [(item['food_id'], item['quantity']) for item in order['items']] == [(1, 3)]
+    assert order['total_price'] == pytest.approx(body['total_price'])
+    assert body['total_price'] == pytest.approx(order['items'][0]['price'] * 3)
+
+
+@pytest.mark.parametrize('quantity', ['abc', 0, -2, None, [1]])
+def test_legacy_order_rejects_bad_quantity(client, quantity):
+    assert client.post('/api/orders', json={"food_id": 1, "quantity": quantity}).status_code == 400
+
+
+def test_legacy_order_unknown_food(client):
+    assert client.post('/api/orders', json={"food_id": 999999, "quantity": 1}).status_code == 404
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from connectiondb import (
+    decode_order_cursor, encode_order_cursor, get_db, get_orders_page, get_orders_page_json
+)
+
+
+@pytest.fixture
+def orders(db):
+    """25 orders over five timestamps, so pages split runs of equal created_at"""
+    conn = get_db()
+    for i in range(25):
+        conn.execute('''
+            INSERT INTO orders (customer_name, customer_email, delivery_address, phone,
+                                subtotal, tax, delivery_fee, total_price, status, created_at)
+            VALUES ('T', 't@example.com', 'A', 'P', 10, 0, 0, 10, ?, ?)
+        ''', ('delivered' if i % 2 else 'pending', f'2024-01-0{1 + i // 5} 12:00:00'))
+    conn.commit()
+    rows = conn.execute('SELECT id, created_at, status FROM orders ORDER BY created_at DESC, id DESC').fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def walk(**filters):
+    seen, after = [], None
+    while True:
+        page, after = get_orders_page(limit=4, after=after, **filters)
+        seen.extend(order['id'] for order in page)
+        if after is None:
+            return seen
+
+
+def test_cursor_round_trip():
+    cursor = encode_order_cursor({'created_at': '2024-01-02 12:00:00', 'id': 17})
+    assert decode_order_cursor(cursor) == ('2024-01-02 12:00:00', 17)
+
+
+@pytest.mark.parametrize('cursor', ['!!!', 'bm90IGEgY3Vyc29y', encode_order_cursor({'created_at': 'x', 'id': 1})])
+def test_invalid_cursor(db, cursor):
+    with pytest.raises(ValueError):
+        decode_order_cursor(cursor)
+    with pytest.raises(ValueError):
+        get_orders_page(after=cursor)
+
+
+def test_pages_cover_every_order_once(orders):
+    assert walk() == [order['id'] for order in orders]
+    assert walk(status='pending') == [order['id'] for order in orders if order['status'] == 'pending']
+
+
+def test_date_range_is_half_open(orders):
+    ids = walk(since='2024-01-02', until='2024-01-04')
+    assert ids == [o['id'] for o in orders if '2024-01-02' <= o['created_at'] < '2024-01-04']
+
+
+def test_json_page_matches_rows(orders):
+    rows, cursor = get_orders_page(limit=7, status='delivered')
+    payload, json_cursor = get_orders_page_json(limit=7, status='delivered')
+    assert json.loads(payload) == rows
+    assert json_cursor == cursor
+
+
+def test_admin_orders_endpoint(client, orders):
+    response = client.get('/api/admin/orders?limit=10')
+    assert [order['id'] for order in response.get_json()] == [o['id'] for o in orders[:10]]
+    next_page = client.get(f"/api/admin/orders?limit=10&cursor={response.headers['X-Next-Cursor']}")
+    assert [order['id'] for order in next_page.get_json()] == [o['id'] for o in orders[10:20]]
+    assert client.get('/api/admin/orders?cursor=!!!').status_code == 400
+    assert client.get('/api/admin/orders?status=bogus').status_code == 400
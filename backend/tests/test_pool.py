@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from connectiondb import ConnectionPool
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_import_leaves_database_untouched(tmp_path):
+    db_path = tmp_path / 'untouched.db'
+    env = dict(os.environ, FOODZZ_DB_PATH=str(db_path))
+    subprocess.run([sys.executable, '-c', 'import connectiondb'], cwd=BACKEND_DIR, env=env, check=True)
+    assert not db_path.exists()
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(lambda: sqlite3.connect(str(tmp_path / 'pool.db'), check_same_thread=False), size=2)
+    yield pool
+    pool.close_all()
+
+
+def test_connections_are_reused(pool):
+    first = pool.acquire()
+    raw = first._conn
+    first.close()
+    second = pool.acquire()
+    assert second._conn is raw
+    second.close()
+    assert pool.stats() == {"size": 2, "idle": 1, "in_use": 0, "created": 1}
+
+
+def test_overflow_connections_are_closed_on_release(pool):
+    handles = [pool.acquire() for _ in range(3)]
+    assert pool.stats()['in_use'] == 3
+    for handle in handles:
+        handle.close()
+    assert pool.stats() == {"size": 2, "idle": 2, "in_use": 0, "created": 3}
+
+
+def test_release_rolls_back_open_transaction(pool):
+    conn = pool.acquire()
+    conn.execute('CREATE TABLE t (x)')
+    conn.commit()
+    conn.execute('INSERT INTO t VALUES (1)')
+    conn.close()
+    conn = pool.acquire()
+    assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+    conn.close()
+
+
+def test_closed_handle_and_pool_refuse_use(pool):
+    conn = pool.acquire()
+    conn.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute('SELECT 1')
+    pool.close_all()
+    with pytest.raises(sqlite3.ProgrammingError):
+        pool.acquire()
+
+
+def test_broken_idle_connection_is_replaced(pool):
+    pool.health_check_interval = 0
+    conn = pool.acquire()
+    raw = conn._conn
+    conn.close()
+    raw.close()
+    conn = pool.acquire()
+    assert conn._conn is not raw
+    assert conn.execute('SELECT 1').fetchone() == (1,)
+    conn.close()
+    assert pool.stats()['created'] == 2
+
+
+def test_concurrent_checkouts(pool):
+    errors = []
+
+    def work():
+        try:
+            for _ in range(50):
+                conn = pool.acquire()
+                conn.execute('SELECT 1').fetchone()
+                conn.close()
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    stats = pool.stats()
+    assert stats['in_use'] == 0 and stats['idle'] <= stats['size']
@@ -0,0 +1,26 @@
+import pytest
+
+from pricing import PricingError, pricing_engine
+
+
+@pytest.mark.parametrize('promo_code', [5, ['x'], {'code': 'x'}, True])
+def test_non_string_promo_code_is_rejected(db, promo_code):
+    with pytest.raises(PricingError):
+        pricing_engine.quote([(1, 1)], promo_code)
+
+
+@pytest.mark.parametrize('route', ['/api/checkout/quote', '/api/checkout'])
+def test_non_string_promo_code_is_a_bad_request(client, route):
+    response = client.post(route, json={
+        "items": [{"id": 1, "quantity": 1}], "promo_code": 5,
+        "customer_name": "T", "customer_email": "t@example.com", "delivery_address": "A",
+        "phone": "P", "payment_method": "card",
+    })
+    assert response.status_code == 400
+    assert 'promo code' in response.get_json()['error']
+
+
+def test_unknown_promo_code(db):
+    with pytest.raises(PricingError):
+        pricing_engine.quote([(1, 1)], 'NOPE')
+    assert pricing_engine.quote([(1, 1)], '')['discount'] == 0
@@ -0,0 +1,30 @@
+import sqlite3
+
+from migrations import check_query_plans, migrate, plan_problems, query_plan_checks
+
+
+def test_hot_queries_use_indexes():
+    conn = sqlite3.connect(':memory:')
+    migrate(conn)
+    try:
+        assert check_query_plans(conn) == []
+    finally:
+        conn.close()
+
+
+def test_plan_problems():
+    assert plan_problems('SCAN orders') == 'full table scan'
+    assert plan_problems('USE TEMP B-TREE FOR ORDER BY') == 'temporary sort'
+    assert plan_problems('SEARCH orders USING INDEX idx_orders_status_created_at (status=?)') is None
+    assert plan_problems('SCAN foods_fts VIRTUAL TABLE INDEX 0:M3') is None
+
+
+def test_missing_index_is_reported():
+    conn = sqlite3.connect(':memory:')
+    migrate(conn)
+    conn.execute('DROP INDEX idx_order_items_order_id')
+    try:
+        failures = check_query_plans(conn, query_plan_checks())
+        assert 'order items with food' in {name for name, _, _ in failures}
+    finally:
+        conn.close()
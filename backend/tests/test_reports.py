@@ -0,0 +1,119 @@
+import pytest
+
+from connectiondb import create_order, get_db, update_order_status
+from menucache import menu_cache
+from reports import ReportCube, rebuild, report_range
+
+SINCE, UNTIL = '2024-01-01', '2024-01-04'
+
+
+def place_order(created_at, status, items):
+    order_id = create_order('T', 't@example.com', 'A', 'P', subtotal=0, tax=0, delivery_fee=0,
+                            total_price=0, payment_method='card',
+                            items=[{'id': food_id, 'quantity': quantity} for food_id, quantity in items])
+    conn = get_db()
+    total = conn.execute('SELECT SUM(quantity * price) FROM order_items WHERE order_id = ?',
+                         (order_id,)).fetchone()[0]
+    conn.execute('UPDATE orders SET created_at = ?, total_price = ? WHERE id = ?', (created_at, total, order_id))
+    conn.commit()
+    conn.close()
+    update_order_status(order_id, status)
+    return order_id
+
+
+@pytest.fixture
+def orders(db):
+    place_order('2024-01-01 09:15:00', 'delivered', [(1, 2), (2, 1)])
+    place_order('2024-01-01 09:45:00', 'delivered', [(1, 1)])
+    place_order('2024-01-02 18:00:00', 'cancelled', [(3, 5)])
+    place_order('2024-01-03 23:59:59', 'pending', [(2, 4), (3, 1)])
+    place_order('2024-01-05 12:00:00', 'delivered', [(1, 9)])  # outside the range
+
+
+def query(sql, *params):
+    conn = get_db()
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    return [tuple(row) for row in rows]
+
+
+def rollups():
+    return (query('SELECT bucket, status, order_count, round(revenue, 2) FROM report_hourly '
+                  'WHERE order_count != 0 ORDER BY 1, 2'),
+            query('SELECT day, status, food_id, quantity, round(revenue, 2) FROM report_food_daily '
+                  'WHERE quantity != 0 ORDER BY 1, 2, 3'))
+
+
+def test_revenue_matches_orders(orders):
+    cube = ReportCube(refresh_interval=0)
+    expected = query('''
+        SELECT date(created_at), COUNT(*), round(SUM(total_price), 2) FROM orders
+        WHERE created_at >= ? AND created_at < ? AND status != 'cancelled'
+        GROUP BY 1 ORDER BY 1
+    ''', SINCE, UNTIL)
+    series, totals = cube.revenue(SINCE, UNTIL, 'day')
+    assert [(p['period'], p['orders'], p['revenue']) for p in series] == expected
+    assert totals['orders'] == 3
+
+    hourly, hourly_totals = cube.revenue(SINCE, UNTIL, 'hour')
+    assert hourly_totals == totals
+    assert [p['period'] for p in hourly] == ['2024-01-01 09:00:00', '2024-01-03 23:00:00']
+
+    cancelled, _ = cube.revenue(SINCE, UNTIL, statuses=['cancelled'])
+    assert [(p['period'], p['orders']) for p in cancelled] == [('2024-01-02', 1)]
+
+    with pytest.raises(ValueError):
+        cube.revenue(SINCE, UNTIL, 'week')
+
+
+def test_top_foods_and_category_mix(orders):
+    cube = ReportCube(refresh_interval=0)
+    expected = query('''
+        SELECT oi.food_id, SUM(oi.quantity) FROM order_items oi JOIN orders o ON o.id = oi.order_id
+        WHERE o.created_at >= ? AND o.created_at < ? AND o.status != 'cancelled'
+        GROUP BY oi.food_id ORDER BY 2 DESC, 1
+    ''', SINCE, UNTIL)
+    top = cube.top_foods(SINCE, UNTIL, menu=menu_cache)
+    assert [(food['food_id'], food['quantity']) for food in top] == expected
+    assert top[0]['name'] == menu_cache.food(top[0]['food_id'])['name']
+
+    mix = cube.category_mix(SINCE, UNTIL, menu=menu_cache)
+    assert sum(entry['quantity'] for entry in mix) == sum(quantity for _, quantity in expected)
+    assert sum(entry['share'] for entry in mix) == pytest.approx(1.0, abs=1e-3)
+
+
+def test_cube_reloads_after_new_orders(orders):
+    cube = ReportCube(refresh_interval=0)
+    _, before = cube.revenue(SINCE, UNTIL)
+    place_order('2024-01-02 10:00:00', 'confirmed', [(1, 1)])
+    _, after = cube.revenue(SINCE, UNTIL)
+    assert after['orders'] == before['orders'] + 1
+    assert cube.stats()['loads'] == 2
+
+
+def test_triggers_agree_with_rebuild(orders):
+    maintained = rollups()
+    rebuild(include_archive=False)
+    assert rollups() == maintained
+
+
+def test_report_range():
+    assert report_range('2024-01-01', '2024-01-02T00:00:00Z') == ('2024-01-01 00:00:00', '2024-01-02 00:00:00')
+    with pytest.raises(ValueError):
+        report_range('2024-01-02', '2024-01-01')
+
+
+def test_cube_memory_follows_rows_not_range(db):
+    # Three years apart: a dense per-day layout would hold ~1100 days per series
+    place_order('2024-01-01 10:00:00', 'delivered', [(1, 1), (2, 2), (3, 3)])
+    place_order('2027-01-01 10:00:00', 'delivered', [(1, 1), (2, 2), (3, 3)])
+    cube = ReportCube(refresh_interval=0)
+    series, totals = cube.revenue('2024-01-01', '2027-01-02')
+    assert [point['period'] for point in series] == ['2024-01-01', '2027-01-01']
+    assert totals['orders'] == 2
+    assert [food['quantity'] for food in cube.top_foods('2024-01-01', '2027-01-02')] == [6, 4, 2]
+
+    stats = cube.stats()
+    assert stats['days'] > 1000
+    # Per series: two buckets plus running totals, a few dozen bytes
+    assert stats['bytes'] <= stats['series'] * 64
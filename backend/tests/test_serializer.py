@@ -0,0 +1,58 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+import connectiondb
+import serializer
+from connectiondb import get_db, get_orders_page, get_orders_page_json, init_db, json_object_sql
+
+VALUES = [
+    {"b": 1, "a": [1.5, 12.99, None, True], "ü": "Crème brûlée 🍮"},
+    {"when": datetime(2024, 1, 2, 3, 4, 5), "day": date(2024, 1, 2), "price": Decimal('9.99')},
+    {2: "int keys", 10: {"z": {}, "y": []}},
+]
+
+
+@pytest.mark.parametrize('value', VALUES)
+def test_orjson_and_fallback_agree(value, monkeypatch):
+    fast = serializer.dumps(value)
+    monkeypatch.setattr(serializer, 'orjson', None)
+    assert serializer.dumps(value) == fast
+
+
+@pytest.mark.parametrize('value', VALUES)
+def test_same_value_as_jsonify(value):
+    standard = json.dumps(value, default=DefaultJSONProvider.default, sort_keys=True)
+    assert json.loads(serializer.dumps(value)) == json.loads(standard)
+
+
+def test_text_is_utf8_not_escaped():
+    assert serializer.dumps({"name": "Café"}) == '{"name":"Café"}'.encode('utf-8')
+
+
+def test_json_page_matches_rows_with_non_ascii(db):
+    conn = get_db()
+    conn.execute('''
+        INSERT INTO orders (customer_name, customer_email, delivery_address, phone,
+                            subtotal, tax, delivery_fee, total_price, status)
+        VALUES ('Zoë Ñandú', 'z@example.com', 'Straße 1', 'P', 12.99, 1.04, 2.5, 16.53, 'pending')
+    ''')
+    conn.commit()
+    conn.close()
+    rows, _ = get_orders_page()
+    payload, _ = get_orders_page_json()
+    assert payload == serializer.dumps(rows)
+
+
+def test_json_object_sql_is_cached_until_init_db(db):
+    conn = get_db()
+    cursor = conn.cursor()
+    expression = json_object_sql(cursor, 'orders')
+    assert connectiondb._json_object_sql == {'orders': expression}
+    assert json_object_sql(cursor, 'orders') is expression
+    conn.close()
+    init_db()
+    assert connectiondb._json_object_sql == {}
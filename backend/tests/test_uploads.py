@@ -0,0 +1,27 @@
+from connectiondb import create_upload_job, finish_upload_job, get_db, get_upload_job
+from uploads import fail_stale_jobs
+
+
+def backdate(job_id, minutes):
+    conn = get_db()
+    conn.execute("UPDATE upload_jobs SET created_at = datetime('now', ?) WHERE id = ?", (f'-{minutes} minutes', job_id))
+    conn.commit()
+    conn.close()
+
+
+def test_stale_pending_job_is_failed(db, client):
+    create_upload_job('stale')
+    backdate('stale', 60)
+    create_upload_job('running')
+    create_upload_job('done')
+    backdate('done', 60)
+    finish_upload_job('done', food_id=1)
+
+    assert fail_stale_jobs(max_age=15 * 60) == 1
+
+    stale = client.get('/api/admin/uploads/stale').get_json()
+    assert stale['status'] == 'failed'
+    assert stale['error']
+    assert get_upload_job('running')['status'] == 'pending'
+    assert get_upload_job('done')['status'] == 'done'
+    assert fail_stale_jobs(max_age=15 * 60) == 0
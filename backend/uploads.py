@@ -0,0 +1,219 @@
+"""
+Foodzz Uploads
+Streaming multipart parsing with size caps and magic-byte checks, plus a
+background worker pool for the processing that follows an upload
+"""
+
+import hashlib
+import os
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+from werkzeug.utils import secure_filename
+
+from connectiondb import create_upload_job, fail_stale_upload_jobs, finish_upload_job
+
+# Largest accepted image; form fields are capped separately
+MAX_UPLOAD_BYTES = int(float(os.environ.get('FOODZZ_MAX_UPLOAD_MB', '8')) * 1024 * 1024)
+MAX_FIELD_BYTES = 64 * 1024
+UPLOAD_WORKERS = int(os.environ.get('FOODZZ_UPLOAD_WORKERS', '2'))
+# Jobs still pending after this many seconds lost their worker and are failed at startup
+UPLOAD_JOB_TIMEOUT = float(os.environ.get('FOODZZ_UPLOAD_JOB_TIMEOUT', '900'))
+CHUNK_SIZE = 64 * 1024
+HASH_LENGTH = 16
+
+# Leading bytes that identify each allowed image type
+IMAGE_SIGNATURES = {
+    'png': (b'\x89PNG\r\n\x1a\n',),
+    'jpg': (b'\xff\xd8\xff',),
+    'jpeg': (b'\xff\xd8\xff',),
+    'gif': (b'GIF87a', b'GIF89a'),
+}
+SIGNATURE_BYTES = max(len(sig) for sigs in IMAGE_SIGNATURES.values() for sig in sigs)
+
+
+class UploadError(Exception):
+    """Rejected upload; ``status`` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class StagedUpload:
+    """An uploaded file streamed to a temp file in the upload directory"""
+
+    def __init__(self, directory, field_name, filename, extension):
+        self.directory = directory
+        self.field_name = field_name
+        self.filename = filename
+        self.extension = extension
+        self.size = 0
+        self._digest = hashlib.sha256()
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, data):
+        self.size += len(data)
+        self._digest.update(data)
+        self._file.write(data)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    @property
+    def content_hash(self):
+        return self._digest.hexdigest()[:HASH_LENGTH]
+
+    def commit(self):
+        """Move into place as <sha256-prefix>.<ext>; returns (filename, created)
+
+        created is False when identical content was already stored, in
+        which case the existing file is reused.
+        """
+        self.close()
+        filename = f"{self.content_hash}.{self.extension}"
+        target = os.path.join(self.directory, filename)
+        if os.path.exists(target):
+            self.discard()
+            return filename, False
+        os.replace(self.path, target)
+        return filename, True
+
+    def discard(self):
+        """Delete the temp file"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def check_signature(head, extension):
+    if not any(head.startswith(sig) for sig in IMAGE_SIGNATURES.get(extension, ())):
+        raise UploadError(f"File content is not a valid {extension.upper()} image")
+
+
+def parse_multipart(request, directory, required=(), validate=None, file_field='image',
+                    max_bytes=MAX_UPLOAD_BYTES):
+    """Stream a multipart/form-data body without buffering the file
+
+    Form fields are collected in memory. When the file part starts and all
+    ``required`` fields have arrived (the admin form sends them first),
+    ``validate(fields)`` runs before a single file byte touches disk;
+    otherwise it runs once the body ends. The file is checked against its
+    extension's magic bytes from the first chunk and aborted as soon as it
+    passes ``max_bytes``.
+
+    Returns (fields, upload) where upload is a StagedUpload or None.
+    Raises UploadError; any staged file is deleted first.
+    """
+    mimetype, options = parse_options_header(request.headers.get('Content-Type', ''))
+    if mimetype != 'multipart/form-data' or 'boundary' not in options:
+        raise UploadError("Expected multipart/form-data")
+
+    decoder = MultipartDecoder(options['boundary'].encode('latin-1'), max_form_memory_size=MAX_FIELD_BYTES)
+    fields = {}
+    upload = None
+    validated = False
+    part = None
+    buffer = []
+    head = b''
+    skipping = False
+    stream = request.stream
+
+    try:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            decoder.receive_data(chunk or None)
+            event = decoder.next_event()
+            while not isinstance(event, (NeedData, Epilogue)):
+                if isinstance(event, Field):
+                    part, buffer = event, []
+                elif isinstance(event, File):
+                    part, head = event, b''
+                    skipping = event.name != file_field or upload is not None or not event.filename
+                    if not skipping:
+                        if validate and all(fields.get(name) for name in required):
+                            validate(fields)
+                            validated = True
+                        filename = secure_filename(event.filename)
+                        extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+                        if extension not in IMAGE_SIGNATURES:
+                            raise UploadError("Invalid file type. Only PNG, JPG, JPEG, GIF allowed")
+                        upload = StagedUpload(directory, event.name, filename, extension)
+                elif isinstance(event, Data):
+                    if isinstance(part, Field):
+                        buffer.append(event.data)
+                        if not event.more_data:
+                            fields[part.name] = b''.join(buffer).decode('utf-8', 'replace')
+                    elif not skipping:
+                        if upload.size + len(event.data) > max_bytes:
+                            raise UploadError(
+                                f"Image exceeds {max_bytes // (1024 * 1024)} MB limit", status=413
+                            )
+                        if len(head) < SIGNATURE_BYTES:
+                            head += event.data[:SIGNATURE_BYTES - len(head)]
+                            if len(head) >= SIGNATURE_BYTES or not event.more_data:
+                                check_signature(head, upload.extension)
+                        upload.write(event.data)
+                        if not event.more_data:
+                            upload.close()
+                event = decoder.next_event()
+            if isinstance(event, Epilogue) or not chunk:
+                break
+
+        if upload is not None and upload.size == 0:
+            raise UploadError("No image selected")
+        if validate and not validated:
+            validate(fields)
+        return fields, upload
+    except ValueError as e:
+        # MultipartDecoder reports truncated or malformed bodies as ValueError
+        if upload is not None:
+            upload.discard()
+        raise UploadError(f"Malformed multipart body: {e}") from e
+    except BaseException:
+        if upload is not None:
+            upload.discard()
+        raise
+
+
+_pool = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix='foodzz-upload')
+
+
+def _run_job(job_id, func, args):
+    try:
+        result = func(*args)
+    except Exception as e:
+        finish_upload_job(job_id, error=str(e))
+    else:
+        finish_upload_job(job_id, food_id=result)
+
+
+def submit_job(func, *args):
+    """Run func(*args) on the upload pool; returns a job ID to poll
+
+    func returns the affected food ID; its exception message becomes the
+    job error.
+    """
+    job_id = uuid.uuid4().hex
+    create_upload_job(job_id)
+    _pool.submit(_run_job, job_id, func, args)
+    return job_id
+
+
+def shutdown(wait=True):
+    """Finish queued jobs and stop the worker threads"""
+    _pool.shutdown(wait=wait)
+
+
+def fail_stale_jobs(max_age=UPLOAD_JOB_TIMEOUT):
+    """Fail jobs left pending by a worker that died; returns how many
+
+    Only jobs older than max_age are touched, so jobs still running in
+    the workers of a server being replaced are left alone.
+    """
+    return fail_stale_upload_jobs(max_age)
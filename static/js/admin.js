@@ -3,6 +3,9 @@
 let allOrders = [];
 let filteredOrders = [];
 let selectedOrderForUpdate = null;
+let currentStatusFilter = 'all';
+let nextOrdersCursor = null;
+const ORDERS_PAGE_SIZE = 50;
 
 document.addEventListener('DOMContentLoaded', () => {
     loadStats();
@@ -10,13 +13,51 @@ document.addEventListener('DOMContentLoaded', () => {
     loadFoodItems();
     setupAdminEventListeners();
     setupStatusModal();
-    
-    // Refresh every 5 seconds
-    setInterval(() => {
+    subscribeToOrderFeed();
+});
+
+// Live updates: the server pushes new/changed orders and fresh stats.
+// Falls back to polling every 5 seconds where EventSource is unavailable.
+function subscribeToOrderFeed() {
+    if (!window.EventSource) {
+        setInterval(() => {
+            loadStats();
+            loadAdminOrders();
+        }, 5000);
+        return;
+    }
+
+    const source = new EventSource('/api/admin/orders/stream');
+
+    source.addEventListener('orders', (event) => {
+        const update = JSON.parse(event.data);
+        mergeOrders(update.orders);
+        renderStats(update.stats);
+    });
+
+    // The server could not replay missed events; reload everything
+    source.addEventListener('resync', () => {
         loadStats();
         loadAdminOrders();
-    }, 5000);
-});
+    });
+}
+
+function mergeOrders(changedOrders) {
+    const byId = new Map(allOrders.map(order => [order.id, order]));
+    changedOrders.forEach(order => {
+        if (currentStatusFilter === 'all' || order.status === currentStatusFilter) {
+            byId.set(order.id, order);
+        } else {
+            byId.delete(order.id);
+        }
+    });
+    allOrders = Array.from(byId.values()).sort((a, b) => {
+        if (a.created_at === b.created_at) return b.id - a.id;
+        return a.created_at < b.created_at ? 1 : -1;
+    });
+    filteredOrders = allOrders;
+    displayAdminOrders();
+}
 
 function setupAdminEventListeners() {
     const backBtn = document.getElementById('backToFront');
@@ -37,6 +78,11 @@ function setupAdminEventListeners() {
             filterOrdersByStatus(status);
         });
     });
+
+    const loadMoreBtn = document.getElementById('loadMoreOrders');
+    if (loadMoreBtn) {
+        loadMoreBtn.onclick = () => loadAdminOrders(true);
+    }
 }
 
 function setupStatusModal() {
@@ -66,40 +112,57 @@ async function loadStats() {
     try {
         const response = await fetch('/api/admin/stats');
         const stats = await response.json();
-
-        document.getElementById('totalOrders').textContent = stats.total_orders;
-        document.getElementById('totalRevenue').textContent = `₹${stats.total_revenue.toFixed(2)}`;
-        document.getElementById('pendingOrders').textContent = stats.pending_orders || 0;
-        document.getElementById('deliveredOrders').textContent = stats.orders_by_status['delivered'] || 0;
-        
-        // Display recent orders
-        displayRecentOrders(stats.recent_orders);
+        renderStats(stats);
     } catch (error) {
         console.error('Error loading stats:', error);
     }
 }
 
-async function loadAdminOrders() {
+function renderStats(stats) {
+    document.getElementById('totalOrders').textContent = stats.total_orders;
+    document.getElementById('totalRevenue').textContent = `₹${stats.total_revenue.toFixed(2)}`;
+    document.getElementById('pendingOrders').textContent = stats.pending_orders || 0;
+    document.getElementById('deliveredOrders').textContent = stats.orders_by_status['delivered'] || 0;
+    
+    // Display recent orders
+    displayRecentOrders(stats.recent_orders);
+}
+
+// Orders are filtered and paginated server-side; "Load more" follows the
+// cursor returned in the X-Next-Cursor header.
+async function loadAdminOrders(append = false) {
+    const params = new URLSearchParams({ limit: ORDERS_PAGE_SIZE });
+    if (currentStatusFilter !== 'all') {
+        params.set('status', currentStatusFilter);
+    }
+    if (append && nextOrdersCursor) {
+        params.set('cursor', nextOrdersCursor);
+    }
+
     try {
-        const response = await fetch('/api/admin/orders');
-        allOrders = await response.json();
-        filterOrdersByStatus('all');
+        const response = await fetch(`/api/admin/orders?${params}`);
+        const orders = await response.json();
+        allOrders = append ? allOrders.concat(orders) : orders;
+        nextOrdersCursor = response.headers.get('X-Next-Cursor');
+        filteredOrders = allOrders;
+        displayAdminOrders();
     } catch (error) {
         console.error('Error loading orders:', error);
     }
 }
 
 function filterOrdersByStatus(status) {
-    if (status === 'all') {
-        filteredOrders = allOrders;
-    } else {
-        filteredOrders = allOrders.filter(order => order.status === status);
-    }
-    displayAdminOrders();
+    currentStatusFilter = status;
+    nextOrdersCursor = null;
+    loadAdminOrders();
 }
 
 function displayAdminOrders() {
     const tbody = document.getElementById('ordersTableBody');
+    const loadMoreBtn = document.getElementById('loadMoreOrders');
+    if (loadMoreBtn) {
+        loadMoreBtn.style.display = nextOrdersCursor ? 'inline-block' : 'none';
+    }
 
     if (filteredOrders.length === 0) {
         tbody.innerHTML = '<tr><td colspan="7" class="empty-state">No orders found</td></tr>';
@@ -253,6 +316,26 @@ async function loadFoodItems() {
     }
 }
 
+// Build a <picture> that prefers the AVIF/WebP variants generated on upload
+// and falls back to the original image when a food has none.
+function foodImageHtml(food, className, sizes) {
+    const original = `<img src="/static/images/${food.image}" alt="${food.name}" class="${className}" loading="lazy" decoding="async">`;
+    const variants = food.image_variants;
+    if (!variants) {
+        return original;
+    }
+
+    const sources = ['avif', 'webp'].map(fmt => {
+        const srcset = Object.values(variants)
+            .filter(entry => entry[fmt])
+            .map(entry => `/static/images/${entry[fmt]} ${entry.width}w`)
+            .join(', ');
+        return srcset ? `<source type="image/${fmt}" srcset="${srcset}" sizes="${sizes}">` : '';
+    }).join('');
+
+    return `<picture class="food-picture">${sources}${original}</picture>`;
+}
+
 function displayFoodItems(foods) {
     const container = document.getElementById('foodItemsList');
     
@@ -265,7 +348,7 @@ function displayFoodItems(foods) {
         const isFeatured = featuredIds.has(food.id);
         return `
         <div class="food-item-card">
-            <img src="/static/images/${food.image}" alt="${food.name}" class="food-item-image">
+            ${foodImageHtml(food, 'food-item-image', '300px')}
             <div class="food-item-details">
                 <h4>${food.name} ${isFeatured ? '<span class="badge featured">★ Featured</span>' : ''}</h4>
                 <p>${food.description}</p>
@@ -5,6 +5,10 @@ let filteredFoods = [];
 let cart = [];
 let selectedFood = null;
 let currentOrder = null;
+let activeCategory = 'all';
+let searchTimer = null;
+// The checkout being placed: retrying the same body reuses its Idempotency-Key
+let pendingCheckout = null;
 
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', () => {
@@ -110,6 +114,14 @@ function setupFilterButtons() {
             filterFoods(category);
         });
     });
+
+    const searchInput = document.getElementById('foodSearch');
+    if (searchInput) {
+        searchInput.addEventListener('input', () => {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(() => filterFoods(activeCategory), 200);
+        });
+    }
 }
 
 // Load foods from API
@@ -125,14 +137,68 @@ async function loadFoods() {
     }
 }
 
-// Filter foods by category
-function filterFoods(category) {
-    if (category === 'all') {
+// Filter foods by category and search text; searching is done server-side
+async function filterFoods(category) {
+    activeCategory = category;
+    const searchInput = document.getElementById('foodSearch');
+    const query = searchInput ? searchInput.value.trim() : '';
+    if (category === 'all' && !query) {
         filteredFoods = allFoods;
-    } else {
-        filteredFoods = allFoods.filter(food => food.category === category);
+        displayFoods(filteredFoods);
+        showFacetCounts(null);
+        return;
+    }
+
+    const params = new URLSearchParams({ q: query, limit: 100 });
+    if (category !== 'all') params.set('category', category);
+    try {
+        const response = await fetch(`/api/foods/search?${params}`);
+        const data = await response.json();
+        // Ignore answers to searches the user has already typed past
+        if (category !== activeCategory || (searchInput && searchInput.value.trim() !== query)) return;
+        filteredFoods = data.results;
+        displayFoods(filteredFoods);
+        showFacetCounts(query ? data.facets.category : null);
+    } catch (error) {
+        console.error('Error searching foods:', error);
+        showError('Failed to search foods');
+    }
+}
+
+// Show how many matches each category filter has (null clears the counts)
+function showFacetCounts(counts) {
+    document.querySelectorAll('.filters .filter-btn').forEach(btn => {
+        const category = btn.getAttribute('data-category');
+        if (!btn.dataset.label) btn.dataset.label = btn.textContent;
+        if (!counts) {
+            btn.textContent = btn.dataset.label;
+        } else if (category === 'all') {
+            const total = Object.values(counts).reduce((sum, n) => sum + n, 0);
+            btn.textContent = `${btn.dataset.label} (${total})`;
+        } else {
+            btn.textContent = `${btn.dataset.label} (${counts[category] || 0})`;
+        }
+    });
+}
+
+// Build a <picture> that prefers the AVIF/WebP variants generated on upload
+// and falls back to the original image when a food has none.
+function foodImageHtml(food, className, sizes) {
+    const original = `<img src="/static/images/${food.image}" alt="${food.name}" class="${className}" loading="lazy" decoding="async">`;
+    const variants = food.image_variants;
+    if (!variants) {
+        return original;
     }
-    displayFoods(filteredFoods);
+
+    const sources = ['avif', 'webp'].map(fmt => {
+        const srcset = Object.values(variants)
+            .filter(entry => entry[fmt])
+            .map(entry => `/static/images/${entry[fmt]} ${entry.width}w`)
+            .join(', ');
+        return srcset ? `<source type="image/${fmt}" srcset="${srcset}" sizes="${sizes}">` : '';
+    }).join('');
+
+    return `<picture class="food-picture">${sources}${original}</picture>`;
 }
 
 // Display foods in grid
@@ -147,7 +213,7 @@ function displayFoods(foods) {
     grid.innerHTML = foods.map(food => `
         <div class="food-card" onclick="openFoodModal(${food.id})">
             <div class="food-image-container">
-                <img src="/static/images/${food.image}" alt="${food.name}" class="food-image">
+                ${foodImageHtml(food, 'food-image', '(max-width: 600px) 100vw, 320px')}
             </div>
             <h3>${food.name}</h3>
             <p>${food.description}</p>
@@ -158,7 +224,7 @@ function displayFoods(foods) {
 
 // Open food details modal
 function openFoodModal(foodId) {
-    const food = allFoods.find(f => f.id === foodId);
+    const food = allFoods.find(f => f.id === foodId) || filteredFoods.find(f => f.id === foodId);
     if (!food) return;
 
     selectedFood = food;
@@ -336,20 +402,28 @@ async function processCheckout() {
         }
     }
 
+    const body = JSON.stringify({
+        customer_name: customerName,
+        customer_email: customerEmail,
+        phone: customerPhone,
+        delivery_address: customerAddress,
+        payment_method: paymentMethod,
+        items: cart
+    });
+    if (!pendingCheckout || pendingCheckout.body !== body) {
+        pendingCheckout = { body, key: newIdempotencyKey() };
+    }
+
+    const placeOrderBtn = document.getElementById('placeOrder');
+    if (placeOrderBtn) placeOrderBtn.disabled = true;
     try {
         const response = await fetch('/api/checkout', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'Idempotency-Key': pendingCheckout.key,
             },
-            body: JSON.stringify({
-                customer_name: customerName,
-                customer_email: customerEmail,
-                phone: customerPhone,
-                delivery_address: customerAddress,
-                payment_method: paymentMethod,
-                items: cart
-            })
+            body
         });
 
         if (!response.ok) {
@@ -357,6 +431,7 @@ async function processCheckout() {
         }
 
         const result = await response.json();
+        pendingCheckout = null;
         
         // Redirect to standalone confirmation page with order id
         // Clear local cart first
@@ -371,9 +446,16 @@ async function processCheckout() {
     } catch (error) {
         console.error('Error processing checkout:', error);
         showError('Failed to process order. Please try again.');
+    } finally {
+        if (placeOrderBtn) placeOrderBtn.disabled = false;
     }
 }
 
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+}
+
 // Admin Setup
 function setupAdmin() {
     // Admin setup will be in separate admin.js file